@@ -0,0 +1,7 @@
+"""
+Benchmarks e servidor local que imita o cnvsweb.stream / playcnvs.stream
+
+Rodar a partir da raiz do repositório, ex:
+    python -m benchmarks.stub_upstream --port 8099
+    python -m benchmarks.bench_e2e --requests 200 --concurrency 8
+"""
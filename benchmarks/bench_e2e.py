@@ -0,0 +1,208 @@
+"""
+Benchmark ponta a ponta contra o servidor local (benchmarks.stub_upstream)
+
+Aponta o CNVSWebScraper e o app Flask (main.py) para o servidor local e mede
+vazão e percentis de latência por endpoint.
+
+Uso:
+    python -m benchmarks.bench_e2e --requests 100 --concurrency 8 --latency-ms 40
+    python -m benchmarks.bench_e2e --only scraper --json bench_e2e.json
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_upstream import StubUpstream, build_parser as stub_parser, config_from_args
+
+
+def percentile(sorted_values, pct):
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def run_case(name, func, requests_count, concurrency):
+    """Executa func(i) requests_count vezes com concurrency threads e resume as latências"""
+    latencies = []
+    errors = 0
+
+    def one(i):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            ok = func(i)
+        except Exception:
+            ok = False
+        return (time.perf_counter() - t0) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ms, ok in pool.map(one, range(requests_count)):
+            latencies.append(ms)
+            if not ok:
+                errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'endpoint': name,
+        'requests': requests_count,
+        'errors': errors,
+        'throughput_rps': round(requests_count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p90_ms': round(percentile(latencies, 90), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def scraper_cases(stub):
+    from cnvsweb_scraper import CNVSWebScraper, scrape_all_catalog, iter_catalog
+
+    scraper = CNVSWebScraper('BENCH', base_url=stub.base_url, player_base_url=stub.player_url)
+    if not scraper.login():
+        raise RuntimeError('login no servidor local falhou')
+
+    series_link = f'{stub.base_url}/watch/serie-1'
+    season_id = None
+    seasons = scraper.get_series_episodes(series_link)
+    if seasons:
+        season_id = seasons[0]['season_id']
+
+    def login(i):
+        return CNVSWebScraper('BENCH', base_url=stub.base_url).login()
+
+    def catalog(i):
+        return bool(scrape_all_catalog(base_url=stub.base_url))
+
+    def catalog_first_item(i):
+        # Tempo até o primeiro card chegar (parser incremental)
+        return next(iter_catalog('movie', base_url=stub.base_url), None) is not None
+
+    def most_watched(i):
+        return bool(scraper.get_most_watched_today(get_video_urls=False))
+
+    def search(i):
+        return bool(scraper.search_movies('exemplo 1', get_video_urls=False))
+
+    def player_url(i):
+        return bool(scraper.get_player_url(f'/watch/filme-{i % 50}'))
+
+    def mp4_url(i):
+        return bool(scraper.get_video_mp4_url(f'{stub.player_url}/s/{100000 + i}'))
+
+    def series_episodes(i):
+        return bool(scraper.get_series_episodes(series_link))
+
+    def season_episodes(i):
+        return bool(scraper.get_season_episodes(series_link, season_id))
+
+    return [
+        ('scraper.login', login),
+        ('scraper.catalog', catalog),
+        ('scraper.catalog_first_item', catalog_first_item),
+        ('scraper.most_watched', most_watched),
+        ('scraper.search', search),
+        ('scraper.get_player_url', player_url),
+        ('scraper.get_video_mp4_url', mp4_url),
+        ('scraper.get_series_episodes', series_episodes),
+        ('scraper.get_season_episodes', season_episodes),
+    ]
+
+
+def flask_cases(stub):
+    # main.py lê o host do upstream das variáveis de ambiente na importação
+    import main
+    # Importar o app não inicia mais nada (user-041): login e refresher sobem aqui
+    main.start_background_services()
+    client = main.app.test_client()
+    deadline = time.time() + 15
+    while not main.scraper_ready and time.time() < deadline:
+        time.sleep(0.05)
+    if not main.scraper_ready:
+        raise RuntimeError('app não ficou pronto contra o servidor local')
+
+    series_link = f'{stub.base_url}/watch/serie-2'
+    season_id = main.scraper.get_series_episodes(series_link)[0]['season_id']
+
+    def get(path):
+        return lambda i: client.get(path).status_code == 200
+
+    def post(path, body_fn):
+        return lambda i: client.post(path, json=body_fn(i)).status_code == 200
+
+    return [
+        ('GET /health', get('/health')),
+        ('GET /api/catalog', get('/api/catalog')),
+        ('GET /api/search-fast', get('/api/search-fast?q=exemplo')),
+        ('GET /api/search', get('/api/search?q=exemplo+11&max_episodes=1')),
+        ('GET /api/most-watched', get('/api/most-watched?max_episodes=1')),
+        ('POST /api/video-url', post('/api/video-url', lambda i: {'player_url': f'/watch/filme-{i % 50}'})),
+        ('POST /api/series-episodes', post('/api/series-episodes', lambda i: {'watch_link': series_link})),
+        ('POST /api/season-episodes', post('/api/season-episodes',
+                                           lambda i: {'watch_link': series_link, 'season_id': season_id})),
+    ]
+
+
+def print_table(results):
+    header = f"{'endpoint':<34}{'reqs':>6}{'err':>5}{'req/s':>10}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<34}{r['requests']:>6}{r['errors']:>5}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p90_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}")
+
+
+def main():
+    parser = stub_parser()
+    parser.description = 'Benchmark ponta a ponta contra o servidor local'
+    parser.set_defaults(port=0)
+    parser.add_argument('--requests', type=int, default=50, help='Requisições por endpoint')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--only', choices=('scraper', 'flask'), default=None)
+    parser.add_argument('--endpoint', default=None, help='Filtra endpoints pelo nome (substring)')
+    parser.add_argument('--json', dest='json_path', default=None, help='Salva os resultados em JSON')
+    parser.add_argument('--verbose', action='store_true', help='Não esconde os prints do scraper')
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.host, args.port, config=config_from_args(args)).start()
+    os.environ['CNVSWEB_BASE_URL'] = stub.base_url
+    os.environ['CNVSWEB_PLAYER_URL'] = stub.player_url
+    print(f"🧪 Servidor local em {stub.base_url}", file=sys.stderr)
+
+    results = []
+    sink = sys.stdout if args.verbose else io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sink):
+            cases = []
+            if args.only in (None, 'scraper'):
+                cases += scraper_cases(stub)
+            if args.only in (None, 'flask'):
+                cases += flask_cases(stub)
+            for name, func in cases:
+                if args.endpoint and args.endpoint not in name:
+                    continue
+                print(f"⏱  {name}", file=sys.stderr)
+                results.append(run_case(name, func, args.requests, args.concurrency))
+                if not args.verbose:
+                    sink.seek(0)
+                    sink.truncate()
+    finally:
+        stub.stop()
+
+    print_table(results)
+    print(f"\nRequisições ao upstream: {json.dumps(stub.requests, sort_keys=True)}")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"✓ Resultados salvos em {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
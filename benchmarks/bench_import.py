@@ -0,0 +1,106 @@
+"""
+Tempo de import do app (cold start) com gate de regressão
+
+Roda `import main` em interpretadores novos e mede só o import (sem o boot
+do Python), comparando com o piso inevitável `import flask, flask_cors`.
+Falha se:
+  - o import iniciar alguma thread ou criar arquivos (login, SQLite...);
+  - algum módulo pesado (requests, bs4, lxml, sqlite3) for carregado;
+  - o custo acima do Flask passar de --max-overhead-ms (mediana).
+
+Uso:
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --runs 15 --max-overhead-ms 40 --json bench_import.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('requests', 'bs4', 'lxml', 'sqlite3')
+
+_PROBE = '''
+import json, os, sys, threading, time
+before = set(os.listdir('.'))
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'ms': elapsed * 1000,
+    'threads': [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+    'heavy': [m for m in {heavy!r} if m in sys.modules],
+    'new_files': sorted(set(os.listdir('.')) - before),
+}}))
+'''
+
+
+def probe(statement, workdir):
+    """Import num processo novo; retorna o dict medido pelo _PROBE"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1',
+               SERIES_INDEX_PATH=os.path.join(workdir, 'series_index.db'))
+    code = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env,
+                         capture_output=True, text=True, check=True, timeout=60)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(statement, runs, workdir):
+    samples = [probe(statement, workdir) for _ in range(runs)]
+    return {
+        'median_ms': round(statistics.median(s['ms'] for s in samples), 1),
+        'min_ms': round(min(s['ms'] for s in samples), 1),
+        'threads': samples[-1]['threads'],
+        'heavy': samples[-1]['heavy'],
+        'new_files': samples[-1]['new_files'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de import do app com gate de regressão')
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--max-overhead-ms', type=float, default=60.0,
+                        help='Máximo (mediana) acima de import flask, flask_cors')
+    parser.add_argument('--json', dest='json_path', default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"🧪 {args.runs} imports por caso (processo novo a cada um)")
+        floor = measure('import flask, flask_cors', args.runs, workdir)
+        app = measure('import main', args.runs, workdir)
+        eager = measure('import main, cnvsweb_scraper, series_index', args.runs, workdir)
+
+    overhead = round(app['median_ms'] - floor['median_ms'], 1)
+    print(f"  flask + flask_cors      {floor['median_ms']:>7.1f} ms")
+    print(f"  import main             {app['median_ms']:>7.1f} ms  (+{overhead:.1f} ms acima do Flask)")
+    print(f"  + scraper e índice      {eager['median_ms']:>7.1f} ms  (o que o import custaria sem o lazy)")
+
+    problems = []
+    if app['threads']:
+        problems.append(f"import main iniciou threads: {app['threads']}")
+    if app['heavy']:
+        problems.append(f"import main carregou módulos pesados: {app['heavy']}")
+    if app['new_files']:
+        problems.append(f"import main criou arquivos: {app['new_files']}")
+    if overhead > args.max_overhead_ms:
+        problems.append(f"import main custa {overhead:.1f} ms acima do Flask (máx {args.max_overhead_ms:.0f} ms)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'flask': floor, 'main': app, 'main_eager': eager, 'overhead_ms': overhead,
+                       'problems': problems}, f, ensure_ascii=False, indent=2)
+
+    if problems:
+        print("\n✗ Import do app regrediu:")
+        for problem in problems:
+            print(f"  - {problem}")
+        return 1
+    print("\n✓ Import sem efeitos colaterais e dentro do orçamento")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
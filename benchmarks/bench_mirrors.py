@@ -0,0 +1,128 @@
+"""
+Failover de mirrors contra vários servidores locais (benchmarks.stub_upstream)
+
+Sobe um StubUpstream canônico e dois mirrors com latências diferentes,
+registra os três no pool 'site' (mirrors.py) e confere, fase a fase:
+
+  1. depois do probe, o mirror mais rápido vira o atual;
+  2. o tráfego real vai para ele, e os links extraídos das páginas voltam
+     para o host canônico (URL reescrita nos dois sentidos);
+  3. derrubando o mirror atual, as requisições seguem sem erro no próximo e
+     ele sai de rotação;
+  4. derrubando também esse, tudo volta para o canônico.
+
+Sai com código 1 se alguma verificação falhar.
+
+Uso:
+    python -m benchmarks.bench_mirrors
+    python -m benchmarks.bench_mirrors --requests 40 --verbose
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+# O prober em background não deve trocar o mirror no meio de uma fase
+os.environ.setdefault('MIRROR_PROBE_SECONDS', '3600')
+
+from benchmarks.stub_upstream import StubUpstream  # noqa: E402
+
+
+def run_phase(scraper, stub_url, count):
+    """count chamadas de get_player_url; retorna (erros, links fora do host canônico, ms por chamada)"""
+    errors, foreign = 0, 0
+    started = time.perf_counter()
+    for i in range(count):
+        try:
+            player_url = scraper.get_player_url(f'/watch/filme-{i % 50}')
+        except Exception:
+            player_url = None
+        if not player_url:
+            errors += 1
+        elif not player_url.startswith(stub_url):
+            foreign += 1
+    elapsed = (time.perf_counter() - started) * 1000
+    return errors, foreign, elapsed / max(1, count)
+
+
+def watch_requests(stubs):
+    return {name: stub.requests.get('/watch', 0) for name, stub in stubs.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Failover de mirrors contra servidores locais')
+    parser.add_argument('--requests', type=int, default=20, help='Chamadas por fase')
+    parser.add_argument('--verbose', action='store_true', help='Não esconde os prints do scraper')
+    args = parser.parse_args()
+
+    stubs = {
+        'canonical': StubUpstream(latency_ms=60).start(),
+        'fast': StubUpstream(latency_ms=5).start(),
+        'medium': StubUpstream(latency_ms=25).start(),
+    }
+    canonical = stubs['canonical'].base_url
+    print("🧪 Mirrors locais: " + ', '.join(f"{name}={stub.base_url}" for name, stub in stubs.items()),
+          file=sys.stderr)
+
+    import mirrors
+    from cnvsweb_scraper import CNVSWebScraper
+
+    pool = mirrors.register('site', [stub.base_url for stub in stubs.values()])
+    by_url = {stub.base_url: name for name, stub in stubs.items()}
+    scraper = CNVSWebScraper('BENCH', base_url=canonical, player_base_url=canonical)
+
+    rows, failures = [], []
+
+    def check(ok, message):
+        if not ok:
+            failures.append(message)
+
+    def phase(title, expected):
+        before = watch_requests(stubs)
+        errors, foreign, ms = run_phase(scraper, canonical, args.requests)
+        after = watch_requests(stubs)
+        served = {name: after[name] - before[name] for name in stubs}
+        current = by_url[pool.current().base_url]
+        rows.append((title, current, errors, foreign, ms, served))
+        check(errors == 0, f"{title}: {errors} chamadas sem player_url")
+        check(foreign == 0, f"{title}: {foreign} links fora do host canônico")
+        check(current == expected, f"{title}: mirror atual {current}, esperado {expected}")
+        check(served[expected] >= args.requests, f"{title}: {expected} atendeu {served[expected]} de {args.requests}")
+
+    sink = sys.stdout if args.verbose else io.StringIO()
+    try:
+        with contextlib.redirect_stdout(sink):
+            if not scraper.login():
+                raise RuntimeError('login no servidor local falhou')
+            pool.probe()
+            phase('1. depois do probe', 'fast')
+            stubs['fast'].stop()
+            phase('2. sem o mais rápido', 'medium')
+            check(not pool.stats()['mirrors'][stubs['fast'].base_url]['healthy'],
+                  'mirror derrubado continua em rotação')
+            stubs['medium'].stop()
+            phase('3. só o canônico', 'canonical')
+    finally:
+        stubs['canonical'].stop()
+
+    header = f"{'fase':<24}{'atual':>11}{'erros':>7}{'links':>7}{'ms/req':>9}   /watch por servidor"
+    print(header)
+    print('-' * len(header))
+    for title, current, errors, foreign, ms, served in rows:
+        spread = ' '.join(f"{name}={n}" for name, n in served.items())
+        print(f"{title:<24}{current:>11}{errors:>7}{foreign:>7}{ms:>9.1f}   {spread}")
+    print(f"\nTrocas de mirror: {pool.switches}")
+
+    if failures:
+        print("\n✗ Failover com problemas:")
+        for line in failures:
+            print(f"  - {line}")
+        return 1
+    print("\n✓ Failover e reescrita de URLs ok")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Micro-benchmark das funções de parsing com gate de regressão
+
+Mede ops/s e pico de memória (tracemalloc) de:
+  - _parse_full_page / _parse_section_items (catálogo normal e catálogo sintético grande)
+  - parser incremental das listagens (_ListingStream, bytes em pedaços de STREAM_CHUNK_SIZE)
+  - loop de cards do get_most_watched_today (_parse_listing_card)
+  - loop de episódios do get_season_episodes (_parse_episode)
+  - extração do .mp4 (_find_mp4_url com soup vs. só regex vs. janela deslizante do streaming)
+para cada backend do BeautifulSoup disponível.
+
+O gate compara os ops/s crus com a baseline: mediana de várias rodadas de
+cada caso, --threshold de margem para o ruído, e o caso que fica abaixo do
+limite é medido de novo (--retries) antes de contar como regressão. A carga
+de calibração em Python puro que normalizava os números não acompanhava a
+velocidade dos parsers e deixava o gate vermelho e instável; a baseline vale
+para a máquina em que foi gravada (regrave com --save-baseline ao trocar de
+máquina).
+
+Uso:
+    python -m benchmarks.bench_parsers                  # compara com a baseline
+    python -m benchmarks.bench_parsers --save-baseline  # grava nova baseline
+    python -m benchmarks.bench_parsers --filter mp4 --threshold 0.3
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+import cnvsweb_scraper
+from cnvsweb_scraper import (
+    CNVSWebScraper, _parse_full_page, _parse_section_items, _parse_listing_card, _match_mp4_patterns,
+    _ListingStream, STREAM_CHUNK_SIZE, _scan_mp4_stream, MP4_STREAM_CHUNK_SIZE,
+)
+from benchmarks import pages
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_baseline.json')
+BASE = 'https://cnvsweb.stream'
+PLAYER = 'http://www.playcnvs.stream'
+
+
+def available_backends():
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        pass
+    return backends
+
+
+def build_corpus():
+    """Páginas usadas nos casos (sintéticas + gravadas em fixtures/ quando existirem)"""
+    corpus = {
+        'catalog': pages.catalog_page('movie', 120, BASE),
+        'catalog_large': pages.catalog_page('movie', 2000, BASE),
+        'home': pages.home_page(40, BASE),
+        'episodes': f'<div id="episodes-view">{pages.episodes_html("78300", 200, PLAYER)}</div>',
+        'player': pages.player_page('123456', PLAYER),
+    }
+    for name in ('movies', 'tvseries', 'animes', 'home', 'player'):
+        recorded = pages.load_fixture(name, BASE, PLAYER)
+        if recorded:
+            corpus[f'recorded_{name}'] = recorded
+    return corpus
+
+
+def build_cases(corpus, backends):
+    """Lista de (nome, função sem argumentos)"""
+    scraper = CNVSWebScraper('BENCH', base_url=BASE, player_base_url=PLAYER)
+    cases = []
+
+    catalog_pages = [k for k in corpus if k.startswith('catalog') or k.startswith('recorded_') and
+                     k[len('recorded_'):] in ('movies', 'tvseries', 'animes')]
+    for backend in backends:
+        for page in catalog_pages:
+            html = corpus[page]
+            cases.append((f'parse_full_page/{page}/{backend}',
+                          lambda html=html, backend=backend: _parse_full_page(
+                              BeautifulSoup(html, backend), 'movie', rename_queridos=True)))
+
+        # Só a extração, sobre a maior seção de uma árvore já parseada
+        soup = BeautifulSoup(corpus['catalog_large'], backend)
+        biggest = max(soup.select('section.listContent'), key=lambda s: len(s.contents))
+        cases.append((f'parse_section_items/catalog_large/{backend}',
+                      lambda section=biggest: _parse_section_items(section)))
+
+        home = corpus.get('recorded_home', corpus['home'])
+        cases.append((f'most_watched_cards/{backend}',
+                      lambda html=home, backend=backend: [
+                          _parse_listing_card(item)
+                          for item in BeautifulSoup(html, backend).find_all('div', class_='swiper-slide')]))
+
+        episodes = corpus['episodes']
+        cases.append((f'season_episodes/{backend}',
+                      lambda html=episodes, backend=backend: [
+                          scraper._parse_episode(ep, idx, 'T1', '78300')
+                          for idx, ep in enumerate(BeautifulSoup(html, backend).find_all('div', class_='ep'), 1)]))
+
+        player = corpus.get('recorded_player', corpus['player'])
+        cases.append((f'mp4_url/soup/{backend}',
+                      lambda html=player, backend=backend: scraper._find_mp4_url(html, BeautifulSoup(html, backend))))
+
+    for page in catalog_pages:
+        data = corpus[page].encode('utf-8')
+        cases.append((f'parse_stream/{page}/lxml', lambda data=data: stream_listing(data)))
+
+    player = corpus.get('recorded_player', corpus['player'])
+    cases.append(('mp4_url/regex', lambda html=player: _match_mp4_patterns(html)))
+    chunks = [player.encode('utf-8')[i:i + MP4_STREAM_CHUNK_SIZE]
+              for i in range(0, len(player.encode('utf-8')), MP4_STREAM_CHUNK_SIZE)]
+    cases.append(('mp4_url/stream', lambda chunks=chunks: _scan_mp4_stream(iter(chunks))))
+    return cases
+
+
+def stream_listing(data):
+    """Alimenta o parser incremental como o iter_content faria"""
+    stream = _ListingStream('movie', rename_queridos=True)
+    items = []
+    for i in range(0, len(data), STREAM_CHUNK_SIZE):
+        items.extend(stream.feed(data[i:i + STREAM_CHUNK_SIZE]))
+    items.extend(stream.close())
+    return items
+
+
+def measure_ops(fn, min_time, repeats=5):
+    """ops/s pela mediana de `repeats` rodadas de pelo menos min_time segundos"""
+    fn()  # aquecimento
+    per_op = []
+    for _ in range(repeats):
+        n = 0
+        t0 = time.perf_counter()
+        while True:
+            fn()
+            n += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        per_op.append(elapsed / n)
+    return 1.0 / statistics.median(per_op)
+
+
+def measure_peak(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(cases, min_time, name_filter=None, repeats=5):
+    results = {}
+    for name, fn in cases:
+        if name_filter and name_filter not in name:
+            continue
+        ops = measure_ops(fn, min_time, repeats)
+        peak = measure_peak(fn)
+        results[name] = {'ops_per_sec': round(ops, 2), 'peak_kb': round(peak / 1024, 1)}
+        print(f"  {name:<48} {ops:>10.1f} ops/s {peak / 1024:>10.1f} KiB", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold, mem_threshold):
+    """Regressões (strings) de ops/s e pico de memória, e o conjunto dos casos lentos"""
+    regressions = []
+    slow = set()
+    for name, current in results.items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        ratio = current['ops_per_sec'] / base['ops_per_sec'] if base['ops_per_sec'] else 1.0
+        current['vs_baseline'] = round(ratio, 3)
+        if ratio < 1 - threshold:
+            slow.add(name)
+            regressions.append(f"{name}: {ratio:.0%} da velocidade da baseline "
+                               f"(limite {1 - threshold:.0%})")
+        if base['peak_kb'] and current['peak_kb'] > base['peak_kb'] * (1 + mem_threshold):
+            regressions.append(f"{name}: pico de memória {current['peak_kb']:.0f} KiB "
+                               f"vs {base['peak_kb']:.0f} KiB na baseline")
+    return regressions, slow
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark dos parsers com gate de regressão')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.30,
+                        help='Queda máxima aceita de ops/s (0.30 = 30%%; margem para o ruído)')
+    parser.add_argument('--mem-threshold', type=float, default=0.15,
+                        help='Aumento máximo aceito do pico de memória (0.15 = 15%%)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Segundos por rodada de cada caso')
+    parser.add_argument('--repeats', type=int, default=5, help='Rodadas por caso (vale a mediana)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Vezes que um caso abaixo do limite é medido de novo antes de contar como regressão')
+    parser.add_argument('--filter', default=None, help='Roda só casos cujo nome contém o texto')
+    parser.add_argument('--json', dest='json_path', default=None)
+    args = parser.parse_args()
+
+    backends = available_backends()
+    print(f"🧪 Backends: {', '.join(backends)} (padrão do scraper: {cnvsweb_scraper.HTML_PARSER})", file=sys.stderr)
+
+    # _find_mp4_url imprime o progresso; não queremos isso na medição
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases = build_cases(build_corpus(), backends)
+        results = run(cases, args.min_time, args.filter, max(1, args.repeats))
+
+    report = {'cases': results}
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"✓ Baseline salva em {args.baseline}")
+        return 0
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions, slow = compare(results, baseline, args.threshold, args.mem_threshold)
+        # Um caso lento numa rodada pode ser só a máquina ocupada: mede de novo e
+        # fica com a melhor medição antes de acusar regressão
+        for _ in range(max(0, args.retries)):
+            if not slow:
+                break
+            print(f"   Medindo de novo: {', '.join(sorted(slow))}", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                retry = run([case for case in cases if case[0] in slow], args.min_time,
+                            repeats=max(1, args.repeats))
+            for name, r in retry.items():
+                if r['ops_per_sec'] > results[name]['ops_per_sec']:
+                    results[name]['ops_per_sec'] = r['ops_per_sec']
+            regressions, slow = compare(results, baseline, args.threshold, args.mem_threshold)
+    else:
+        print(f"⚠ Baseline {args.baseline} não existe; rode com --save-baseline", file=sys.stderr)
+
+    for name, r in results.items():
+        vs = f"{r['vs_baseline']:.2f}x" if 'vs_baseline' in r else '   -'
+        print(f"{name:<48} {r['ops_per_sec']:>10.1f} ops/s {r['peak_kb']:>10.1f} KiB  {vs}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        print("\n✗ Regressões em relação à baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n✓ Nenhuma regressão acima do limite")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark de memória: dicts vs registros compactos (records.py)
+
+Monta N itens de catálogo e N episódios das duas formas e mede a memória
+retida (tracemalloc) por item. Cada valor é uma string nova, como as que o
+BeautifulSoup devolve no scraping, então a medição inclui o efeito do
+sys.intern nos campos repetidos. Também confere que to_dict() gera o mesmo
+JSON do dict antigo.
+
+Uso:
+    python -m benchmarks.bench_records                # 50k itens
+    python -m benchmarks.bench_records --items 200000 --json bench_records.json
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from records import CatalogItem, Episode
+from benchmarks import pages
+
+BASE = 'https://cnvsweb.stream'
+PLAYER = 'http://www.playcnvs.stream'
+
+
+def _fresh(text):
+    """Cópia nova da string (o parser não compartilha objetos entre cards)"""
+    return text.encode('utf-8').decode('utf-8')
+
+
+def catalog_values(count):
+    """Valores dos itens como saem de _parse_full_page, misturando os três tipos"""
+    per_kind = count // 3 + 1
+    rows = []
+    for kind in ('movie', 'series', 'anime'):
+        for item in pages.catalog_items(kind, per_kind):
+            section = item['section']
+            if section == 'Queridinhos do VisionCine':
+                section = 'Queridinhos do BLUECINE'
+            slug = item['slug']
+            rows.append({
+                'title': _fresh(item['title']),
+                'slug': _fresh(slug),
+                'url': _fresh(f'{BASE}/watch/{slug}'),
+                'poster': _fresh(f'https://cdn.example.com/posters/{slug}.jpg'),
+                'year': _fresh(item['year']),
+                'duration': _fresh(item['duration']),
+                'imdb': _fresh(item['imdb']),
+                'type': _fresh(kind),
+                'section': _fresh(section),
+            })
+    return rows[:count]
+
+
+def episode_values(count, per_season=20):
+    rows = []
+    for i in range(count):
+        season = i // per_season % 10 + 1
+        player_id = pages.stable_id(f'ep-{i}')
+        rows.append({
+            'episode_id': _fresh(f'ep-{i}'),
+            'season': _fresh(f'{season}ª Temporada'),
+            'season_id': _fresh(str(78300 + season)),
+            'title': _fresh(f'Episódio {i % per_season + 1}'),
+            'duration': _fresh(f'{40 + i % 20} min'),
+            'published_date': _fresh(f'{1 + i % 28:02d}/0{1 + season % 9}/2023'),
+            'player_url': _fresh(f'{PLAYER}/s/{player_id}'),
+            'video_url': None,
+        })
+    return rows
+
+
+def retained(build):
+    """(objeto construído, bytes retidos) medidos com tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = build()
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def measure(name, record_cls, make_rows, count):
+    """Compara dicts e registros para count itens; retorna o dict do relatório"""
+    as_dicts, dict_bytes = retained(lambda: make_rows(count))
+    as_records, record_bytes = retained(lambda: [record_cls(**row) for row in make_rows(count)])
+
+    same_json = (json.dumps(as_dicts[:100], sort_keys=True) ==
+                 json.dumps([r.to_dict() for r in as_records[:100]], sort_keys=True))
+    report = {
+        'items': count,
+        'dict_bytes_per_item': round(dict_bytes / count, 1),
+        'record_bytes_per_item': round(record_bytes / count, 1),
+        'saving_per_item': round((dict_bytes - record_bytes) / count, 1),
+        'saving_pct': round(100 * (1 - record_bytes / dict_bytes), 1),
+        'same_json': same_json,
+    }
+    print(f"  {name:<10} dict {report['dict_bytes_per_item']:>7.1f} B/item   "
+          f"registro {report['record_bytes_per_item']:>7.1f} B/item   "
+          f"economia {report['saving_per_item']:>6.1f} B ({report['saving_pct']:.0f}%)   "
+          f"JSON igual: {'sim' if same_json else 'NÃO'}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memória por item: dicts vs registros compactos')
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--json', dest='json_path', default=None)
+    args = parser.parse_args()
+
+    print(f"🧪 {args.items} itens por caso")
+    report = {
+        'catalog': measure('catálogo', CatalogItem, catalog_values, args.items),
+        'episodes': measure('episódios', Episode, episode_values, args.items),
+    }
+    total = sum(r['saving_per_item'] * r['items'] for r in report.values())
+    print(f"\n✓ Economia total: {total / 1024 / 1024:.1f} MiB")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if all(r['same_json'] for r in report.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Páginas HTML com a mesma marcação do cnvsweb.stream / playcnvs.stream
+
+Usadas pelo servidor local e pelos benchmarks. Se existir um HTML gravado do
+site em benchmarks/fixtures/<nome>.html ele tem prioridade sobre a página
+sintética (veja load_fixture). Nos arquivos gravados, {{BASE}} e {{PLAYER}}
+são trocados pelos hosts do servidor local.
+"""
+import os
+import zlib
+from html import escape
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SECTIONS = {
+    'movie': ['Queridinhos do VisionCine', 'Lançamentos', 'Ação', 'Comédia', 'Terror', 'Drama'],
+    'series': ['Queridinhos do VisionCine', 'Séries em Alta', 'Netflix', 'HBO Max', 'Drama'],
+    'anime': ['Animes em Alta', 'Dublados', 'Legendados', 'Shounen'],
+}
+
+_SLUG_PREFIX = {'movie': 'filme', 'series': 'serie', 'anime': 'anime'}
+
+# Bloco de script repetido para dar ao player o peso de uma página real
+_SCRIPT_FILLER = (
+    '<script>!function(e,t){"object"==typeof exports&&"undefined"!=typeof module?'
+    'module.exports=t():"function"==typeof define&&define.amd?define(t):'
+    '(e=e||self).Player=t()}(this,function(){"use strict";var e={version:"8.24.0",'
+    'edition:"enterprise",analytics:!1,autostart:!1,preload:"metadata"};'
+    'return e});</script>\n'
+)
+
+
+def stable_id(text, modulo=900000):
+    """Id numérico determinístico a partir de um texto"""
+    return 100000 + zlib.crc32(text.encode('utf-8')) % modulo
+
+
+def load_fixture(name, base_url, player_url):
+    """Retorna o HTML gravado em fixtures/<name>.html ou None"""
+    path = os.path.join(FIXTURES_DIR, f'{name}.html')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    return html.replace('{{BASE}}', base_url).replace('{{PLAYER}}', player_url)
+
+
+def catalog_items(kind, count):
+    """Itens determinísticos de um tipo: dicts com slug, title, year, duration, section"""
+    sections = SECTIONS[kind]
+    items = []
+    for i in range(count):
+        is_series = kind != 'movie'
+        items.append({
+            'slug': f'{_SLUG_PREFIX[kind]}-{i}',
+            'title': f'{kind.title()} Exemplo {i}',
+            'year': str(1990 + i % 35),
+            'duration': f'{1 + i % 9} Temporadas' if is_series else f'{80 + i % 70} Min',
+            'imdb': f'{5 + i % 5}.{i % 10}',
+            'section': sections[i % len(sections)],
+        })
+    return items
+
+
+def card_html(item, base_url, css_class='swiper-slide item poster'):
+    slug = item['slug']
+    return (
+        f'<div class="{css_class}">'
+        f'<div class="content" style="background-image: url(\'https://cdn.example.com/posters/{slug}.jpg\');"></div>'
+        f'<div class="info">'
+        f'<h6>{escape(item["title"])}</h6>'
+        f'<p class="tags"><span>{item["duration"]}</span><span>{item["year"]}</span>'
+        f'<span><em>IMDb</em> {item["imdb"]}</span></p>'
+        f'<div class="buttons"><a class="btn" href="{base_url}/watch/{slug}" data-tippy-content="Assistir">'
+        f'<i class="fas fa-play"></i></a>'
+        f'<a class="btn" href="#" data-tippy-content="Minha lista"><i class="fas fa-plus"></i></a></div>'
+        f'</div></div>'
+    )
+
+
+def layout(body, title='CNVSWeb'):
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f'<title>{title}</title><link rel="stylesheet" href="/assets/css/app.css"></head>'
+        f'<body><header class="navbar"><a href="/">Início</a><a href="/movies">Filmes</a>'
+        f'<a href="/tvseries">Séries</a><a href="/animes">Animes</a></header>'
+        f'<main class="container-fluid"><div class="row">{body}</div></main>'
+        + _SCRIPT_FILLER * 3 +
+        '</body></html>'
+    )
+
+
+def catalog_page(kind, count, base_url):
+    """Página /movies, /tvseries ou /animes com as seções em div.col-12"""
+    by_section = {}
+    for item in catalog_items(kind, count):
+        by_section.setdefault(item['section'], []).append(item)
+    blocks = []
+    for section, items in by_section.items():
+        cards = ''.join(card_html(i, base_url) for i in items)
+        blocks.append(
+            f'<div class="col-12"><div class="topList"><h6>{escape(section)}</h6>'
+            f'<a href="#">Ver todos</a></div>'
+            f'<section class="listContent"><div class="swiper"><div class="swiper-wrapper">'
+            f'{cards}</div></div></section></div>'
+        )
+    return layout(''.join(blocks))
+
+
+def home_page(count, base_url):
+    """Página inicial com a seção 'Mais Visto do Dia' (filmes e séries alternados)"""
+    movies = catalog_items('movie', count)
+    series = catalog_items('series', count)
+    mixed = [movies[i // 2] if i % 2 == 0 else series[i // 2] for i in range(count)]
+    cards = ''.join(card_html(i, base_url) for i in mixed)
+    body = (
+        '<div class="col-12"><div class="topList"><h5>Mais Visto do Dia</h5></div>'
+        f'<section class="listContent"><div class="swiper-wrapper">{cards}</div></section></div>'
+    )
+    return layout(body)
+
+
+def search_page(query, base_url, pool_size=300):
+    """Resultado de /search.php: cards 'item poster' cujo título contém a busca"""
+    q = query.lower().strip()
+    pool = catalog_items('movie', pool_size) + catalog_items('series', pool_size // 2)
+    hits = [i for i in pool if q and q in i['title'].lower()][:60]
+    cards = ''.join(card_html(i, base_url, css_class='item poster') for i in hits)
+    return layout(f'<div class="col-12"><div class="listSearch">{cards}</div></div>')
+
+
+def season_ids(slug, seasons):
+    base = stable_id(slug, 90000) * 10
+    return [str(base + n) for n in range(1, seasons + 1)]
+
+
+def episodes_html(season_id, count, player_url, start=0):
+    """Bloco <div class="ep"> de uma temporada, como devolvido pelo ajax/episodes.php"""
+    eps = []
+    for n in range(start, start + count):
+        ep_id = f'{season_id}{n:03d}'
+        player_id = stable_id(ep_id)
+        eps.append(
+            f'<div class="ep" id="{ep_id}">'
+            f'<div class="thumb" style="background-image:url(https://cdn.example.com/ep/{ep_id}.jpg)"></div>'
+            f'<div class="info"><h5 class="fw-bold">Episódio {n + 1}</h5>'
+            f'<p class="small">Duração: {40 + n % 20} Min</p>'
+            f'<p class="small">Publicado: 2023-{1 + n % 12:02d}-{1 + n % 28:02d}</p></div>'
+            f'<div class="buttons"><a class="btn free" href="{player_url}/s/{player_id}">Assistir</a></div>'
+            f'<!-- loadEpisode({season_id}, {player_id}) -->'
+            f'</div>'
+        )
+    return ''.join(eps)
+
+
+def watch_page(slug, base_url, player_url, seasons=3, episodes_per_season=12):
+    """Página /watch/<slug>: player com âncora para filmes, temporadas para séries/animes"""
+    if slug.startswith(('serie-', 'anime-')):
+        ids = season_ids(slug, seasons)
+        options = ''.join(
+            f'<option value="{sid}"{" selected" if n == 0 else ""}>{n + 1}ª Temporada</option>'
+            for n, sid in enumerate(ids)
+        )
+        body = (
+            f'<div class="col-12"><h1>{escape(slug)}</h1>'
+            f'<select id="seasons-view" class="form-select">{options}</select>'
+            f'<div id="episodes-view">{episodes_html(ids[0], episodes_per_season, player_url)}</div></div>'
+        )
+    else:
+        player_id = stable_id(slug)
+        body = (
+            f'<div class="col-12"><h1>{escape(slug)}</h1>'
+            f'<p class="tags"><span>120 Min</span><span>2021</span><span>IMDb 7.0</span></p>'
+            f'<div class="buttons"><a class="btn free" href="#playerframe">ASSISTIR</a>'
+            f'<a class="btn" href="#trailer">TRAILER</a></div>'
+            f'<div id="playerframe" class="player"><iframe src="{player_url}/s/{player_id}" '
+            f'allowfullscreen></iframe></div></div>'
+        )
+    return layout(body, title=slug)
+
+
+def player_page(player_id, player_url, filler_blocks=40):
+    """Página do player: muito script e o .mp4 na configuração do jwplayer perto do fim"""
+    video = f'{player_url}/media/{player_id}.mp4?cnvs_token=stub{player_id}'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Player</title>'
+        + _SCRIPT_FILLER * filler_blocks +
+        '</head><body><div id="player" class="jw-wrapper"></div>'
+        '<script>jwplayer("player").setup({'
+        f'"file":"{video}","image":"https://cdn.example.com/thumb/{player_id}.jpg",'
+        '"width":"100%","aspectratio":"16:9"});</script>'
+        + _SCRIPT_FILLER * (filler_blocks // 4) +
+        '</body></html>'
+    )
@@ -0,0 +1,311 @@
+"""
+Servidor HTTP local que faz o papel do cnvsweb.stream e do playcnvs.stream
+
+Rotas: /, /login, /ajax/login.php, /movies, /tvseries, /animes, /search.php,
+/watch/<slug>, /ajax/episodes.php e /s/<id> (player). Latência, jitter,
+erros e travamentos podem ser injetados globalmente ou por prefixo de rota.
+
+Uso:
+    python -m benchmarks.stub_upstream --port 8099 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks import pages
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    # Fração das requisições que ficam paradas por stall_ms (simula upstream travado)
+    stall_rate: float = 0.0
+    stall_ms: float = 30000.0
+    # Latência específica por prefixo de rota, ex: {'/s/': 250}
+    route_latency_ms: dict = field(default_factory=dict)
+    catalog_size: int = 120
+    home_size: int = 12
+    seasons: int = 3
+    episodes_per_season: int = 12
+    episodes_page_size: int = 0  # 0 = todos os episódios na página 1
+    # Inclui a barra de paginação (data-pages) nas respostas paginadas
+    episodes_pagination: bool = True
+    player_filler_blocks: int = 40
+    # Velocidade de envio do corpo em KiB/s (0 = tudo de uma vez); simula link lento
+    body_kbps: float = 0.0
+    seed: int = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'cnvsweb-stub/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        stub = self.server.stub
+        parsed = urlparse(self.path)
+        path = parsed.path
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        stub.count(path)
+
+        if not stub.inject_delay(path):
+            return self._send(stub.config.error_status, 'Service Unavailable', 'text/plain')
+
+        base, player = stub.base_url, stub.player_url
+        cfg = stub.config
+
+        if path == '/' and method == 'GET':
+            body = pages.load_fixture('home', base, player) or pages.home_page(cfg.home_size, base)
+            return self._send(200, body)
+        if path == '/login':
+            return self._send(200, pages.layout('<div class="col-12"><form id="login"></form></div>'),
+                              cookie='PHPSESSID=stub-session; Path=/')
+        if path == '/ajax/login.php' and method == 'POST':
+            return self._send(200, json.dumps({'status': 'success', 'redirect': f'{base}/'}),
+                              'application/json', cookie='cnvs_auth=stub; Path=/')
+        if path in ('/movies', '/tvseries', '/animes'):
+            kind = {'/movies': 'movie', '/tvseries': 'series', '/animes': 'anime'}[path]
+            body = (pages.load_fixture(path.strip('/'), base, player)
+                    or pages.catalog_page(kind, cfg.catalog_size, base))
+            return self._send(200, body)
+        if path == '/search.php':
+            return self._send(200, pages.search_page(query.get('q', ''), base))
+        if path.startswith('/watch/'):
+            slug = path[len('/watch/'):].strip('/')
+            body = (pages.load_fixture(f'watch_{slug}', base, player)
+                    or pages.watch_page(slug, base, player, cfg.seasons, cfg.episodes_per_season))
+            return self._send(200, body)
+        if path == '/ajax/episodes.php':
+            return self._send(200, stub.episodes_body(query.get('season', ''), query.get('page', '1')))
+        if path.startswith('/s/'):
+            player_id = path[len('/s/'):].strip('/')
+            body = (pages.load_fixture('player', base, player)
+                    or pages.player_page(player_id, player, cfg.player_filler_blocks))
+            return self._send(200, body)
+        return self._send(404, 'Not Found', 'text/plain')
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', cookie=None):
+        data = body.encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            if cookie:
+                self.send_header('Set-Cookie', cookie)
+            self.end_headers()
+            if self.command != 'HEAD':
+                self._write_body(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu (ex: leitura parcial do player)
+            pass
+
+
+    def _write_body(self, data, chunk=8192):
+        kbps = self.server.stub.config.body_kbps
+        if kbps <= 0:
+            self.wfile.write(data)
+            return
+        for i in range(0, len(data), chunk):
+            self.wfile.write(data[i:i + chunk])
+            self.wfile.flush()
+            time.sleep(chunk / 1024 / kbps)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        # Uma chamada por conexão TCP aceita (keep-alive reaproveita sem passar aqui)
+        with self.stub._lock:
+            self.stub.connections += 1
+            self.stub._open.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self.stub._lock:
+            self.stub._open.discard(request)
+        super().shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        # Cliente fechou a conexão no meio (hedge perdedor, leitura parcial): não é erro do stub
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubUpstream:
+    """Servidor local em uma thread daemon. base_url e player_url apontam para ele."""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None, **overrides):
+        self.config = config or StubConfig()
+        for key, value in overrides.items():
+            setattr(self.config, key, value)
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.connections = 0
+        self._open = set()
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def player_url(self):
+        return self.base_url
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        # Derruba também as conexões keep-alive abertas, como um host que caiu de verdade
+        with self._lock:
+            sockets, self._open = list(self._open), set()
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, path):
+        route = '/' + path.strip('/').split('/')[0] if path != '/' else '/'
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def inject_delay(self, path):
+        """Aplica latência/travamento. Retorna False se a requisição deve falhar."""
+        cfg = self.config
+        with self._lock:
+            roll_error = self._random.random()
+            roll_stall = self._random.random()
+            jitter = self._random.uniform(-cfg.jitter_ms, cfg.jitter_ms) if cfg.jitter_ms else 0.0
+        latency = cfg.latency_ms
+        for prefix, ms in cfg.route_latency_ms.items():
+            if path.startswith(prefix):
+                latency = ms
+                break
+        delay = max(0.0, latency + jitter)
+        if roll_stall < cfg.stall_rate:
+            delay = cfg.stall_ms
+        if delay:
+            time.sleep(delay / 1000)
+        return roll_error >= cfg.error_rate
+
+    def episodes_body(self, season_id, page):
+        cfg = self.config
+        total = cfg.episodes_per_season
+        if not cfg.episodes_page_size:
+            if page not in ('', '1'):
+                return ''
+            return f'<div id="episodes-view">{pages.episodes_html(season_id, total, self.player_url)}</div>'
+        try:
+            page_num = max(1, int(page))
+        except ValueError:
+            page_num = 1
+        start = (page_num - 1) * cfg.episodes_page_size
+        count = max(0, min(cfg.episodes_page_size, total - start))
+        if not count:
+            return ''
+        nav = ''
+        if cfg.episodes_pagination:
+            page_count = -(-total // cfg.episodes_page_size)
+            links = ''.join(f'<a href="#" data-page="{n}">{n}</a>' for n in range(1, page_count + 1))
+            nav = f'<nav class="pagination" data-pages="{page_count}">{links}</nav>'
+        return (f'<div id="episodes-view">{pages.episodes_html(season_id, count, self.player_url, start)}</div>'
+                + nav)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Servidor local que imita o cnvsweb.stream')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--stall-rate', type=float, default=0.0)
+    parser.add_argument('--stall-ms', type=float, default=30000.0)
+    parser.add_argument('--player-latency-ms', type=float, default=None,
+                        help='Latência específica das rotas /s/ (player)')
+    parser.add_argument('--catalog-size', type=int, default=120)
+    parser.add_argument('--episodes-per-season', type=int, default=12)
+    parser.add_argument('--episodes-page-size', type=int, default=0)
+    parser.add_argument('--no-episodes-pagination', dest='episodes_pagination', action='store_false',
+                        help='Não envia a barra de paginação (o scraper precisa ir até a página vazia)')
+    parser.add_argument('--body-kbps', type=float, default=0.0,
+                        help='Envia o corpo a essa velocidade (KiB/s) em vez de tudo de uma vez')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser
+
+
+def config_from_args(args):
+    route_latency = {}
+    if args.player_latency_ms is not None:
+        route_latency['/s/'] = args.player_latency_ms
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        route_latency_ms=route_latency,
+        catalog_size=args.catalog_size,
+        episodes_per_season=args.episodes_per_season,
+        episodes_page_size=args.episodes_page_size,
+        episodes_pagination=args.episodes_pagination,
+        body_kbps=args.body_kbps,
+        seed=args.seed,
+    )
+
+
+def main():
+    args = build_parser().parse_args()
+    stub = StubUpstream(args.host, args.port, config=config_from_args(args))
+    print(f"🧪 Servidor local em {stub.base_url}")
+    print(f"   CNVSWEB_BASE_URL={stub.base_url} CNVSWEB_PLAYER_URL={stub.player_url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Bulkheads por classe de endpoint (fast / slow / batch)
+
+Uma rajada de /api/most-watched (cada chamada resolve dezenas de vídeos)
+ocupava todas as threads do Flask, e /api/catalog, /api/suggest e as outras
+rotas baratas ficavam esperando atrás dela. Aqui cada rota pertence a uma
+classe, e cada classe tem seu próprio limite de requisições em andamento e
+uma fila curta na frente:
+
+  - fast:  catálogo, sugestões, busca sem vídeo, consulta de jobs;
+  - slow:  busca com vídeo, /api/video-url, temporada;
+  - batch: Mais Visto do Dia e série inteira (dezenas de players cada).
+
+Quem chega com a classe cheia espera na fila (FIFO) até BULKHEAD_QUEUE_TIMEOUT.
+Com a fila cheia, ou passado o timeout, a requisição é recusada na hora
+(BulkheadFull -> 429 com Retry-After estimado pelo tempo médio de serviço).
+Uma classe lotada não toma as vagas das outras.
+
+Limites por classe: BULKHEAD_<CLASSE>_CONCURRENCY e BULKHEAD_<CLASSE>_QUEUE.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+BULKHEAD_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_QUEUE_TIMEOUT', 10))
+# Amostras de espera na fila guardadas por classe (para p50/p95)
+_WAIT_SAMPLES = 512
+# Peso da nova amostra na média móvel do tempo de serviço
+_EWMA_ALPHA = 0.2
+
+# classe: (em andamento, fila)
+_DEFAULT_LIMITS = {
+    'fast': (16, 64),
+    'slow': (6, 12),
+    'batch': (2, 4),
+}
+
+
+class BulkheadFull(Exception):
+    """Classe sem vaga e sem lugar na fila; retry_after em segundos"""
+
+    def __init__(self, name, retry_after, timed_out=False):
+        self.name = name
+        self.retry_after = retry_after
+        self.timed_out = timed_out
+        super().__init__(f"bulkhead {name} cheio")
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Bulkhead:
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout=BULKHEAD_QUEUE_TIMEOUT):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self.counts = {'admitted': 0, 'waited': 0, 'rejected': 0, 'timed_out': 0}
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+        self._max_wait = 0.0
+        self._service_time = None
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """Estimativa (s) para a fila atual andar: fila / vagas × tempo médio de serviço"""
+        service = self._service_time or 1.0
+        return max(1, min(60, math.ceil((self.queued + 1) / self.max_in_flight * service)))
+
+    def acquire(self):
+        """Ocupa uma vaga (esperando na fila se preciso); retorna o instante da admissão"""
+        started = time.monotonic()
+        with self._cond:
+            if self.in_flight >= self.max_in_flight or self.queued:
+                if self.queued >= self.max_queue:
+                    self.counts['rejected'] += 1
+                    raise BulkheadFull(self.name, self.retry_after())
+                self.queued += 1
+                self.counts['waited'] += 1
+                deadline = started + self.queue_timeout
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counts['timed_out'] += 1
+                            raise BulkheadFull(self.name, self.retry_after(), timed_out=True)
+                        self._cond.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.in_flight += 1
+            self.counts['admitted'] += 1
+            admitted = time.monotonic()
+            wait = admitted - started
+            self._waits.append(wait)
+            self._max_wait = max(self._max_wait, wait)
+        return admitted
+
+    def release(self, admitted):
+        now = time.monotonic()
+        with self._cond:
+            self.in_flight -= 1
+            service = now - admitted
+            self._service_time = service if self._service_time is None else (
+                _EWMA_ALPHA * service + (1 - _EWMA_ALPHA) * self._service_time)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            waits = list(self._waits)
+            return dict(
+                self.counts,
+                max_in_flight=self.max_in_flight,
+                max_queue=self.max_queue,
+                in_flight=self.in_flight,
+                queued=self.queued,
+                queue_wait_ms={
+                    'p50': round(_percentile(waits, 0.5) * 1000, 1),
+                    'p95': round(_percentile(waits, 0.95) * 1000, 1),
+                    'max': round(self._max_wait * 1000, 1),
+                },
+                service_ms=round(self._service_time * 1000, 1) if self._service_time is not None else None,
+            )
+
+
+def _from_env(name, concurrency, queue):
+    prefix = f"BULKHEAD_{name.upper()}"
+    return Bulkhead(name,
+                    int(os.environ.get(f"{prefix}_CONCURRENCY", concurrency)),
+                    int(os.environ.get(f"{prefix}_QUEUE", queue)))
+
+
+bulkheads = {name: _from_env(name, *limits) for name, limits in _DEFAULT_LIMITS.items()}
+
+
+def stats():
+    return {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
@@ -0,0 +1,170 @@
+"""
+Feed de mudanças do catálogo (/api/catalog/changes via Server-Sent Events)
+
+O refresher em background re-scrapeia o catálogo e o "Mais Visto do Dia" a
+cada CATALOG_REFRESH_SECONDS e publica só a diferença contra o snapshot
+anterior: slugs adicionados, removidos, mudanças de seção e mudanças de
+posição no ranking. O cliente pega a cópia completa uma vez em /api/catalog
+e depois só aplica os diffs.
+
+Cada evento tem um id sequencial; quem reconecta com Last-Event-ID recebe os
+eventos perdidos (enquanto estiverem no buffer) ou um evento "reset" pedindo
+para recarregar o catálogo inteiro.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from records import json_default
+
+CATALOG_REFRESH_SECONDS = float(os.environ.get('CATALOG_REFRESH_SECONDS', 300))
+# Eventos guardados para quem reconecta com Last-Event-ID
+CHANGES_BUFFER = int(os.environ.get('CATALOG_CHANGES_BUFFER', 100))
+# Comentário enviado de tempos em tempos para proxies não derrubarem a conexão
+HEARTBEAT_SECONDS = float(os.environ.get('CATALOG_HEARTBEAT_SECONDS', 15))
+
+
+def slug_from_link(watch_link):
+    """https://cnvsweb.stream/watch/breaking-bad -> breaking-bad"""
+    return (watch_link or '').rstrip('/').rsplit('/', 1)[-1]
+
+
+def catalog_index(items):
+    """{(type, slug): item} do catálogo"""
+    return {(item.get('type'), item.get('slug')): item for item in items if item.get('slug')}
+
+
+def ranking_index(most_watched):
+    """{slug: posição (1..n)} do Mais Visto do Dia"""
+    ranks = {}
+    for rank, item in enumerate(most_watched, 1):
+        slug = slug_from_link(item.get('watch_link'))
+        if slug and slug not in ranks:
+            ranks[slug] = rank
+    return ranks
+
+
+def diff_snapshots(old_catalog, new_catalog, old_ranks, new_ranks):
+    """
+    Compara dois snapshots. Retorna o dict do evento "changes" ou None se nada mudou.
+    old_catalog/new_catalog vêm de catalog_index(), old_ranks/new_ranks de ranking_index().
+    """
+    added = [new_catalog[key] for key in new_catalog if key not in old_catalog]
+    removed = [{'type': t, 'slug': s} for (t, s) in old_catalog if (t, s) not in new_catalog]
+    moved = []
+    for key, item in new_catalog.items():
+        old = old_catalog.get(key)
+        if old is not None and old.get('section') != item.get('section'):
+            moved.append({'type': key[0], 'slug': key[1],
+                          'from': old.get('section'), 'to': item.get('section')})
+
+    rank_changes = []
+    for slug in sorted(set(old_ranks) | set(new_ranks), key=lambda s: new_ranks.get(s, len(new_ranks) + 1)):
+        before, after = old_ranks.get(slug), new_ranks.get(slug)
+        if before != after:
+            rank_changes.append({'slug': slug, 'from': before, 'to': after})
+
+    if not (added or removed or moved or rank_changes):
+        return None
+    return {
+        'added': added,
+        'removed': removed,
+        'moved': moved,
+        'most_watched': rank_changes,
+    }
+
+
+class ChangeFeed:
+    """Snapshot atual + fan-out dos diffs para os assinantes SSE"""
+
+    def __init__(self, buffer_size=CHANGES_BUFFER):
+        self.catalog = None
+        self.ranks = None
+        self.last_id = 0
+        self.updated_at = None
+        self._events = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def update(self, items, most_watched):
+        """
+        Recebe o catálogo e o ranking recém-scrapeados e publica o diff.
+        A primeira chamada só grava o snapshot de referência. most_watched=None
+        (scraper sem login) mantém o ranking anterior. Retorna o evento ou None.
+        """
+        catalog = catalog_index(items)
+        with self._lock:
+            ranks = self.ranks if most_watched is None else ranking_index(most_watched)
+            # Ranking visto pela primeira vez também é só referência
+            old_ranks = ranks if self.ranks is None else self.ranks
+            first = self.catalog is None
+            changes = None if first else diff_snapshots(self.catalog, catalog, old_ranks or {}, ranks or {})
+            self.catalog, self.ranks = catalog, ranks
+            self.updated_at = time.time()
+            if changes is None:
+                return None
+            self.last_id += 1
+            event = dict(changes, id=self.last_id, timestamp=self.updated_at)
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            q.put(event)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registra um assinante. Retorna (fila, eventos_perdidos, precisa_reset).
+        precisa_reset é True quando o Last-Event-ID já saiu do buffer.
+        """
+        q = queue.Queue()
+        with self._lock:
+            self._subscribers.add(q)
+            missed, reset = [], False
+            if last_event_id is not None and last_event_id < self.last_id:
+                missed = [e for e in self._events if e['id'] > last_event_id]
+                oldest = self._events[0]['id'] if self._events else self.last_id + 1
+                reset = last_event_id + 1 < oldest
+        return q, ([] if reset else missed), reset
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'last_event_id': self.last_id,
+                'updated_at': self.updated_at,
+                'items': len(self.catalog) if self.catalog is not None else None,
+                'subscribers': len(self._subscribers),
+            }
+
+
+def sse_event(event, name='changes'):
+    """Formata um evento no protocolo text/event-stream"""
+    data = json.dumps(event, ensure_ascii=False, default=json_default)
+    return f"id: {event['id']}\nevent: {name}\ndata: {data}\n\n"
+
+
+def stream(feed, last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    """Gerador com os eventos SSE de um assinante (perdidos + novos + heartbeats)"""
+    q, missed, reset = feed.subscribe(last_event_id)
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        if reset:
+            yield sse_event({'id': feed.last_id, 'reason': 'Last-Event-ID fora do buffer; recarregue /api/catalog'},
+                            name='reset')
+        for event in missed:
+            yield sse_event(event)
+        while True:
+            try:
+                event = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield sse_event(event)
+    finally:
+        feed.unsubscribe(q)
@@ -1,13 +1,54 @@
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
+import codecs
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import re
-from urllib.parse import urljoin, urlparse, parse_qs
+from urllib.parse import urljoin, urlparse
+import atexit
 import json
+import hashlib
 import logging
+import os
+import sys
+
+import mirrors
+import scheduler
+import timings
+import transport
+import upstream
+from negative_cache import NegativeCache
+from records import CatalogItem, Episode
+from upstream import UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
+# Hosts do site e do player (configuráveis para apontar para um servidor local)
+BASE_URL = os.environ.get('CNVSWEB_BASE_URL', 'https://cnvsweb.stream').rstrip('/')
+PLAYER_BASE_URL = os.environ.get('CNVSWEB_PLAYER_URL', 'http://www.playcnvs.stream').rstrip('/')
+
+# Mirrors equivalentes ao BASE_URL / PLAYER_BASE_URL (URLs separadas por vírgula);
+# upstream.request manda cada requisição ao mais saudável (veja mirrors.py)
+SITE_MIRRORS = mirrors.parse_list(os.environ.get('CNVSWEB_MIRRORS'))
+PLAYER_MIRRORS = mirrors.parse_list(os.environ.get('CNVSWEB_PLAYER_MIRRORS'))
+site_mirrors = mirrors.register('site', [BASE_URL] + SITE_MIRRORS)
+player_mirrors = mirrors.register('player', [PLAYER_BASE_URL] + PLAYER_MIRRORS)
+
+# Backend do BeautifulSoup ('html.parser' ou 'lxml'); compare com benchmarks/bench_parsers.py
+HTML_PARSER = os.environ.get('CNVSWEB_HTML_PARSER', 'html.parser')
+
+# Listagens (/movies, /tvseries, /animes) parseadas enquanto baixam, card a card
+STREAM_PARSING = os.environ.get('CNVSWEB_STREAM_PARSING', '1').lower() in ('1', 'true')
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Cookies + horário do login salvos em disco: um restart reaproveita a sessão
+# (validada com um GET) em vez de refazer o login inteiro. Vazio desliga.
+SESSION_FILE = os.environ.get('CNVSWEB_SESSION_FILE', '.cnvsweb_session.json')
+# Sessão mais velha que isso é descartada sem nem testar
+SESSION_MAX_AGE = float(os.environ.get('CNVSWEB_SESSION_MAX_AGE', 12 * 3600))
+
 # =============================================================================
 # SCRAPING DIRETO POR PÁGINA (sem login) - filmes, séries, animes
 # =============================================================================
@@ -21,14 +62,24 @@ _PAGE_HEADERS = {
 }
 
 
-def _page_fetch(url: str):
-    """Busca e parseia uma página HTML sem autenticação."""
+def _soup(markup):
+    """Parseia HTML com o backend configurado em HTML_PARSER."""
+    return BeautifulSoup(markup, HTML_PARSER)
+
+
+def _page_fetch(url: str, strict: bool = False):
+    """Busca e parseia uma página HTML sem autenticação (strict: propaga o erro em vez de None)."""
     try:
-        response = requests.get(url, headers=_PAGE_HEADERS, timeout=30)
+        response = upstream.request(transport.shared_session(), 'GET', url, headers=_PAGE_HEADERS,
+                                    timeout=(upstream.CONNECT_TIMEOUT, 30))
         response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
+        return _soup(response.text)
+    except UpstreamUnavailable:
+        raise
     except requests.RequestException as e:
         logger.error(f"Erro ao buscar {url}: {e}")
+        if strict:
+            raise
         return None
 
 
@@ -70,20 +121,79 @@ def _parse_section_items(section_tag) -> list:
                 slug = _extract_slug(watch_url)
 
             if title and slug:
-                items.append({
-                    'title': title,
-                    'slug': slug,
-                    'url': watch_url,
-                    'poster': poster,
-                    'year': year,
-                    'duration': duration,
-                    'imdb': imdb,
-                })
+                items.append(CatalogItem(
+                    title=title,
+                    slug=slug,
+                    url=watch_url,
+                    poster=poster,
+                    year=year,
+                    duration=duration,
+                    imdb=imdb,
+                ))
         except Exception as e:
             logger.debug(f"Erro ao parsear card: {e}")
     return items
 
 
+def _parse_listing_card(item):
+    """Parseia um card de listagem (Mais Visto do Dia / busca) no formato da API."""
+    info_div = item.find('div', class_='info')
+    
+    if not info_div:
+        return None
+    
+    # Título
+    title_tag = info_div.find('h6')
+    title = title_tag.text.strip() if title_tag else "Sem título"
+    
+    # Link para assistir
+    watch_btn = info_div.find('a', href=True)
+    watch_link = watch_btn['href'] if watch_btn else ""
+    
+    # Tags (duração/temporadas, ano, IMDb)
+    tags = info_div.find('p', class_='tags')
+    duration_or_seasons = ""
+    year = ""
+    imdb = ""
+    
+    if tags:
+        spans = tags.find_all('span')
+        if len(spans) > 0:
+            duration_or_seasons = spans[0].text.strip()
+        if len(spans) > 1:
+            year = spans[1].text.strip()
+        if len(spans) > 2:
+            imdb_text = spans[2].text.strip()
+            # Remove "IMDb" do texto
+            imdb = imdb_text.replace('IMDb', '').strip()
+    
+    # Imagem de fundo
+    content_div = item.find('div', class_='content')
+    image_url = ""
+    if content_div:
+        bg_style = content_div.get('style', '')
+        image_match = re.search(r'url\((.*?)\)', bg_style)
+        if image_match:
+            image_url = image_match.group(1).strip('"\'')
+    
+    # Detecta se é série ou filme
+    is_series = 'Temporada' in duration_or_seasons
+    
+    return {
+        'title': title,
+        'type': 'series' if is_series else 'movie',  # NOVO: identifica o tipo
+        'watch_link': watch_link,
+        'duration_or_seasons': duration_or_seasons,
+        'year': year,
+        'imdb': imdb,
+        'image_url': image_url,
+        'player_url': None,
+        'video_url': None,
+        'is_series': is_series,
+        'episodes': []
+    }
+
+
 def _parse_full_page(soup, forced_type: str, rename_queridos: bool = False) -> list:
     """
     Percorre TODAS as secoes da pagina e coleta os itens.
@@ -114,84 +224,624 @@ def _parse_full_page(soup, forced_type: str, rename_queridos: bool = False) -> l
     return all_items
 
 
-def scrape_movies(limit: int = None) -> list:
+def _has_class(el, name):
+    return name in (el.get('class') or '').split()
+
+
+def _first_descendant(el, tag, css_class):
+    for child in el.iterdescendants(tag):
+        if _has_class(child, css_class):
+            return child
+    return None
+
+
+def _element_text(el, strip=True):
+    """Equivalente ao get_text(strip=True) do BeautifulSoup"""
+    if strip:
+        return ''.join(t.strip() for t in el.itertext())
+    return ''.join(el.itertext())
+
+
+def _card_from_element(slide):
+    """Mesmo resultado de _parse_section_items para um card já parseado pelo lxml"""
+    poster = ''
+    content_div = _first_descendant(slide, 'div', 'content')
+    if content_div is not None and content_div.get('style'):
+        m = re.search(r'url\(([^)]+)\)', content_div.get('style'))
+        if m:
+            poster = m.group(1).strip("'\"")
+
+    info_div = _first_descendant(slide, 'div', 'info')
+    title_tag = next(info_div.iterdescendants('h6'), None) if info_div is not None else None
+    title = _element_text(title_tag) if title_tag is not None else ''
+
+    duration, year, imdb = '', '', ''
+    for tags in slide.iterdescendants('p'):
+        if not _has_class(tags, 'tags'):
+            continue
+        for span in tags.iterdescendants('span'):
+            text = _element_text(span)
+            inner = _element_text(span, strip=False)
+            if 'Min' in text or 'Temporada' in text:
+                duration = text
+            elif re.match(r'^\d{4}$', text):
+                year = text
+            elif 'IMDb' in inner:
+                imdb = inner.replace('IMDb', '').strip()
+
+    watch_url, slug = '', ''
+    buttons = _first_descendant(slide, 'div', 'buttons')
+    watch_a = _first_descendant(buttons, 'a', 'btn') if buttons is not None else None
+    if watch_a is not None and watch_a.get('href'):
+        watch_url = watch_a.get('href')
+        slug = _extract_slug(watch_url)
+
+    if title and slug:
+        return CatalogItem(title=title, slug=slug, url=watch_url, poster=poster,
+                           year=year, duration=duration, imdb=imdb)
+    return None
+
+
+class _ListingStream:
+    """
+    Parser incremental de uma página de listagem (lxml HTMLPullParser).
+    feed() recebe bytes e devolve os cards das section.listContent que já
+    terminaram de chegar; cada subárvore terminada é descartada em seguida,
+    então a árvore em memória fica do tamanho de um card, não da página.
+    Segue as mesmas regras de _parse_full_page: seção = primeiro h6 do
+    div.topList da div.col-12, só a primeira section.listContent da coluna,
+    slugs repetidos ignorados.
+    """
+
+    def __init__(self, forced_type, rename_queridos=False):
+        self.forced_type = forced_type
+        self.rename_queridos = rename_queridos
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+        self._cols = []       # [nome da seção, listContents vistas] por div.col-12 aberta
+        self._sections = []   # True se a section.listContent aberta é a primeira da coluna
+        self._toplist_depth = 0
+        self._seen = set()
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self):
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self):
+        items = []
+        for event, el in self._parser.read_events():
+            tag = el.tag
+            if not isinstance(tag, str):
+                continue
+            if event == 'start':
+                if tag == 'div' and _has_class(el, 'col-12'):
+                    self._cols.append([None, 0])
+                elif tag == 'div' and _has_class(el, 'topList'):
+                    self._toplist_depth += 1
+                elif tag == 'section' and _has_class(el, 'listContent'):
+                    first = bool(self._cols) and self._cols[-1][1] == 0
+                    if self._cols:
+                        self._cols[-1][1] += 1
+                    self._sections.append(first)
+                continue
+
+            if tag == 'h6' and self._toplist_depth and self._cols and self._cols[-1][0] is None:
+                name = _element_text(el)
+                if self.rename_queridos and name == 'Queridinhos do VisionCine':
+                    name = 'Queridinhos do BLUECINE'
+                self._cols[-1][0] = name
+            elif tag == 'div' and _has_class(el, 'topList'):
+                self._toplist_depth -= 1
+            elif tag == 'div' and _has_class(el, 'swiper-slide') and _has_class(el, 'item') \
+                    and _has_class(el, 'poster'):
+                if self._sections and self._sections[-1] and self._cols and self._cols[-1][0]:
+                    item = self._card(el)
+                    if item is not None:
+                        items.append(item)
+                self._discard(el)
+            elif tag == 'section' and _has_class(el, 'listContent'):
+                self._sections.pop()
+                self._discard(el)
+            elif tag == 'div' and _has_class(el, 'col-12'):
+                self._cols.pop()
+                self._discard(el)
+        return items
+
+    def _card(self, el):
+        try:
+            item = _card_from_element(el)
+        except Exception as e:
+            logger.debug(f"Erro ao parsear card: {e}")
+            return None
+        if item is None or item['slug'] in self._seen:
+            return None
+        self._seen.add(item['slug'])
+        item['type'] = self.forced_type
+        item['section'] = self._cols[-1][0]
+        return item
+
+    @staticmethod
+    def _discard(el):
+        """Libera a subárvore terminada (e os irmãos anteriores já processados)"""
+        el.clear(keep_tail=True)
+        parent = el.getparent()
+        if parent is not None:
+            while el.getprevious() is not None:
+                del parent[0]
+
+
+def _iter_page_items(url: str, forced_type: str, rename_queridos: bool = False):
+    """
+    Gera os itens de uma página de listagem conforme o HTML chega
+    (download e parse sobrepostos). Erros de rede sobem para quem chamou.
+    """
+    stream = _ListingStream(forced_type, rename_queridos)
+    response = upstream.request(transport.shared_session(), 'GET', url, headers=_PAGE_HEADERS,
+                                timeout=(upstream.CONNECT_TIMEOUT, 30), stream=True)
+    with response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            yield from stream.feed(chunk)
+    yield from stream.close()
+
+
+def _scrape_listing(url: str, forced_type: str, rename_queridos: bool = False, strict: bool = False) -> list:
+    """
+    Itens de uma página de listagem (streaming ou página inteira, conforme STREAM_PARSING).
+    Erro de rede vira [] ou, com strict=True, é propagado (quem compara snapshots
+    não pode confundir falha com "a seção ficou vazia").
+    """
+    if not STREAM_PARSING:
+        soup = _page_fetch(url, strict=strict)
+        if not soup:
+            return []
+        return _parse_full_page(soup, forced_type=forced_type, rename_queridos=rename_queridos)
+    try:
+        return list(_iter_page_items(url, forced_type, rename_queridos))
+    except UpstreamUnavailable:
+        raise
+    except requests.RequestException as e:
+        logger.error(f"Erro ao buscar {url}: {e}")
+        if strict:
+            raise
+        return []
+
+
+_CATALOG_PAGES = (
+    ('movie', 'movies', True),
+    ('series', 'tvseries', True),
+    ('anime', 'animes', False),
+)
+
+
+def iter_catalog(content_type: str = 'all', base_url: str = None):
+    """
+    Versão em streaming do scrape_all_catalog: gera cada item assim que o card
+    termina de chegar, sem esperar as páginas inteiras.
+    """
+    base_url = base_url or BASE_URL
+    for kind, path, rename in _CATALOG_PAGES:
+        if content_type in (kind, 'all'):
+            yield from _iter_page_items(f'{base_url}/{path}', forced_type=kind, rename_queridos=rename)
+
+
+def scrape_movies(limit: int = None, base_url: str = None, strict: bool = False) -> list:
     """
     Scraping de https://cnvsweb.stream/movies
     Retorna todos os filmes sem limite por padrao.
     Queridinhos do VisionCine vira Queridinhos do BLUECINE.
     """
-    logger.info('Scraping filmes: cnvsweb.stream/movies')
-    soup = _page_fetch('https://cnvsweb.stream/movies')
-    if not soup:
-        return []
-    items = _parse_full_page(soup, forced_type='movie', rename_queridos=True)
+    base_url = base_url or BASE_URL
+    logger.info(f'Scraping filmes: {base_url}/movies')
+    items = _scrape_listing(f'{base_url}/movies', forced_type='movie', rename_queridos=True, strict=strict)
     return items[:limit] if limit else items
 
 
-def scrape_series(limit: int = None) -> list:
+def scrape_series(limit: int = None, base_url: str = None, strict: bool = False) -> list:
     """
     Scraping de https://cnvsweb.stream/tvseries
     Retorna todas as series sem limite por padrao.
     Queridinhos do VisionCine vira Queridinhos do BLUECINE.
     """
-    logger.info('Scraping series: cnvsweb.stream/tvseries')
-    soup = _page_fetch('https://cnvsweb.stream/tvseries')
-    if not soup:
-        return []
-    items = _parse_full_page(soup, forced_type='series', rename_queridos=True)
+    base_url = base_url or BASE_URL
+    logger.info(f'Scraping series: {base_url}/tvseries')
+    items = _scrape_listing(f'{base_url}/tvseries', forced_type='series', rename_queridos=True, strict=strict)
     return items[:limit] if limit else items
 
 
-def scrape_animes(limit: int = None) -> list:
+def scrape_animes(limit: int = None, base_url: str = None, strict: bool = False) -> list:
     """
     Scraping de https://cnvsweb.stream/animes
     Retorna todos os animes sem limite por padrao.
     """
-    logger.info('Scraping animes: cnvsweb.stream/animes')
-    soup = _page_fetch('https://cnvsweb.stream/animes')
-    if not soup:
-        return []
-    items = _parse_full_page(soup, forced_type='anime', rename_queridos=False)
+    base_url = base_url or BASE_URL
+    logger.info(f'Scraping animes: {base_url}/animes')
+    items = _scrape_listing(f'{base_url}/animes', forced_type='anime', rename_queridos=False, strict=strict)
     return items[:limit] if limit else items
 
 
-def scrape_all_catalog(content_type: str = 'all', limit: int = None) -> list:
+def scrape_all_catalog(content_type: str = 'all', limit: int = None, base_url: str = None,
+                       strict: bool = False) -> list:
     """
     Scraping completo ou filtrado por tipo.
 
     Parametros:
         content_type: 'movie' | 'series' | 'anime' | 'all'  (padrao: 'all')
         limit: numero maximo de resultados. None = sem limite (padrao)
+        base_url: host do site (padrao: BASE_URL / CNVSWEB_BASE_URL)
+        strict: se True, falha ao buscar qualquer página levanta a exceção em
+                vez de devolver o catálogo sem aquele tipo
 
     Retorno:
         Lista de dicts com: title, slug, url, poster, year, duration, imdb, type, section
     """
     results = []
     if content_type in ('movie', 'all'):
-        results.extend(scrape_movies())
+        results.extend(scrape_movies(base_url=base_url, strict=strict))
     if content_type in ('series', 'all'):
-        results.extend(scrape_series())
+        results.extend(scrape_series(base_url=base_url, strict=strict))
     if content_type in ('anime', 'all'):
-        results.extend(scrape_animes())
+        results.extend(scrape_animes(base_url=base_url, strict=strict))
     return results[:limit] if limit else results
 
 
+# Padrão: https://server-amz.playmycnvs.com/...mp4?cnvs_token=...
+_MP4_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'https?://server[^"\s]*?\.mp4[^"\s]*',                    # server...mp4
+        r'https?://[^"\s]*playmycnvs[^"\s]*?\.mp4[^"\s]*',         # playmycnvs...mp4
+        r'src["\s]*[:=]["\s]*([^"\s]+\.mp4[^"\s]*)',               # src="...mp4"
+        r'"file"["\s]*:["\s]*"([^"]+\.mp4[^"]*)"',                 # "file":"...mp4"
+        r'"src"["\s]*:["\s]*"([^"]+\.mp4[^"]*)"',                  # "src":"...mp4"
+        r'https?://[^"\s<>]+\.mp4[^\s<>"\']*',                     # qualquer URL .mp4
+    )
+]
+# Só os padrões do servidor do site (#1/#2) encerram o download do player
+# antes do fim; os outros esperam a página inteira (a tag <video> vem antes deles)
+_MP4_EARLY_EXIT_PATTERNS = 2
+
+
+def _match_mp4_patterns(html: str, final: bool = True, limit: int = None):
+    """
+    Procura a URL .mp4 no HTML com os padrões em ordem de prioridade.
+    Retorna (indice_do_padrao, url) ou (None, None).
+    Com final=False (trecho de um download em andamento) um casamento que
+    encosta no fim do texto pode estar cortado: devolve (None, None) para
+    esperar o próximo pedaço. limit: usa só os `limit` primeiros padrões.
+    """
+    for idx, pattern in enumerate(_MP4_PATTERNS[:limit]):
+        match = pattern.search(html)
+        if not match:
+            continue
+        if not final and match.end() >= len(html):
+            return None, None
+        # Se tiver grupo de captura, usa o grupo
+        video_url = match.group(1) if pattern.groups else match.group(0)
+        # Remove aspas e espaços
+        video_url = video_url.strip('"\'\\').strip()
+        # Verifica se é uma URL válida
+        if video_url.startswith('http') and '.mp4' in video_url:
+            return idx, video_url
+    return None, None
+
+
+def organize_listing(movies: list) -> dict:
+    """Separa uma lista de cards em {movies, series, summary} (organize_output=True)"""
+    movie_items = [m for m in movies if m['type'] == 'movie']
+    series_items = [m for m in movies if m['type'] == 'series']
+    return {
+        'movies': movie_items,
+        'series': series_items,
+        'summary': {
+            'total': len(movies),
+            'movies': len(movie_items),
+            'series': len(series_items)
+        }
+    }
+
+
+# Paginação do ajax/episodes.php: páginas buscadas em paralelo e limite de segurança
+EPISODE_PAGE_WORKERS = int(os.environ.get('EPISODE_PAGE_WORKERS', 4))
+EPISODE_MAX_PAGES = int(os.environ.get('EPISODE_MAX_PAGES', 50))
+
+_PAGE_NUMBER_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'data-pages?=["\']?(\d+)',                     # <nav data-pages="5"> / <a data-page="3">
+        r'[?&]page=(\d+)',                               # href="...?page=3"
+        # loadEpisodes(season, 3); loadEpisode(season, player_id) é o player, não a página
+        r'loadEpisodes\(\s*\d+\s*,\s*(\d+)\s*\)',
+    )
+]
+
+
+def _episode_page_count(soup):
+    """Maior número de página citado na paginação da resposta do AJAX (None se não houver)"""
+    html = str(soup)
+    pages = [int(n) for pattern in _PAGE_NUMBER_PATTERNS for n in pattern.findall(html)]
+    return max(pages) if pages and max(pages) > 1 else None
+
+
+# =============================================================================
+# EXTRAÇÃO DO PLAYER (get_player_url)
+# =============================================================================
+
+# Estratégias na ordem histórica (desempate do ranking); 'first_iframe' é o
+# último recurso e não entra no ranking (sempre "acerta" se houver iframe)
+PLAYER_STRATEGIES = ('btn_free', 'button_text', 'tippy', 'iframe_play')
+PLAYER_FALLBACK_STRATEGY = 'first_iframe'
+# Contadores de acerto por estratégia, mantidos entre restarts (vazio desliga)
+PLAYER_STRATEGY_STATS_PATH = os.environ.get('CNVSWEB_PLAYER_STRATEGY_STATS', '.player_strategies.json')
+_PLAYER_DATA_ATTRS = ('data-src', 'data-player', 'data-url', 'data-iframe')
+
+
+class _PlayerPage:
+    """
+    Tudo o que as estratégias do player usam, coletado numa única passada:
+    primeiro botão de cada tipo, elementos por id (para href="#...") e iframes.
+    """
+
+    def __init__(self, soup, base_url):
+        self.base_url = base_url
+        self.buttons = {'btn_free': None, 'button_text': None, 'tippy': None}
+        self.ids = {}
+        self.iframes = []
+        for tag in soup.find_all(True):
+            tag_id = tag.get('id')
+            if tag_id and tag_id not in self.ids:
+                self.ids[tag_id] = tag
+            if tag.name == 'iframe':
+                self.iframes.append(tag)
+            elif tag.name == 'a':
+                self._check_button(tag)
+
+    def _check_button(self, tag):
+        buttons = self.buttons
+        if buttons['btn_free'] is None and ' '.join(tag.get('class') or ()) == 'btn free':
+            buttons['btn_free'] = tag
+        if buttons['button_text'] is None:
+            text = tag.get_text(strip=True).upper()
+            if 'ASSISTIR' in text or 'PLAY' in text:
+                buttons['button_text'] = tag
+        if buttons['tippy'] is None and 'Assistir' in (tag.get('data-tippy-content') or ''):
+            buttons['tippy'] = tag
+
+    def _absolute(self, url):
+        return url if url.startswith('http') else urljoin(self.base_url, url)
+
+    def resolve(self, strategy):
+        """URL do player segundo a estratégia, ou None"""
+        if strategy in self.buttons:
+            button = self.buttons[strategy]
+            return self._from_button(button) if button is not None else None
+        if strategy == 'iframe_play':
+            for iframe in self.iframes:
+                src = iframe.get('src', '')
+                if src and ('play' in src.lower() or 'stream' in src.lower()):
+                    return self._absolute(src)
+            return None
+        if strategy == 'first_iframe':
+            src = self.iframes[0].get('src') if self.iframes else None
+            return self._absolute(src) if src else None
+        raise ValueError(f"estratégia desconhecida: {strategy}")
+
+    def _from_button(self, button):
+        """href do botão ASSISTIR: player direto, âncora (#id -> iframe/data-*) ou caminho relativo"""
+        href = button.get('href', '')
+        if href.startswith('http'):
+            return href if ('play' in href.lower() or 'stream' in href.lower()) else None
+        if href.startswith('#'):
+            element = self.ids.get(href[1:])
+            if element is None:
+                return None
+            iframe = element.find('iframe')
+            if iframe is not None and iframe.get('src'):
+                return self._absolute(iframe['src'])
+            for attr in _PLAYER_DATA_ATTRS:
+                found = element.find(attrs={attr: True})
+                if found is not None and found.get(attr):
+                    return self._absolute(found.get(attr))
+            return None
+        if href.startswith('/'):
+            return urljoin(self.base_url, href)
+        return None
+
+
+class PlayerStrategyStats:
+    """Tentativas/acertos de cada estratégia do player; ordena pela taxa de acerto"""
+
+    SAVE_INTERVAL = 30
+
+    def __init__(self, path=PLAYER_STRATEGY_STATS_PATH):
+        self.path = path
+        self.counts = {name: {'attempts': 0, 'hits': 0}
+                       for name in PLAYER_STRATEGIES + (PLAYER_FALLBACK_STRATEGY,)}
+        self.misses = 0
+        self._dirty = False
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+        if path:
+            atexit.register(self.save)
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠ Contadores do player ilegíveis ({self.path}): {e}")
+            return
+        for name, counts in (data.get('strategies') or {}).items():
+            if name in self.counts:
+                self.counts[name] = {'attempts': int(counts.get('attempts', 0)), 'hits': int(counts.get('hits', 0))}
+        self.misses = int(data.get('misses', 0))
+
+    def _score(self, name):
+        counts = self.counts[name]
+        # Suavização de Laplace: estratégia nunca tentada vale 0.5
+        return (counts['hits'] + 1) / (counts['attempts'] + 2)
+
+    def ranked(self):
+        with self._lock:
+            order = sorted(PLAYER_STRATEGIES, key=lambda n: (-self._score(n), PLAYER_STRATEGIES.index(n)))
+        return order + [PLAYER_FALLBACK_STRATEGY]
+
+    def record(self, tried, hit):
+        """tried: estratégias avaliadas nesta página; hit: a que resolveu (None = nenhuma)"""
+        with self._lock:
+            for name in tried:
+                self.counts[name]['attempts'] += 1
+            if hit is None:
+                self.misses += 1
+            else:
+                self.counts[hit]['hits'] += 1
+            self._dirty = True
+            due = time.time() - self._saved_at >= self.SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'strategies': {n: dict(c) for n, c in self.counts.items()}, 'misses': self.misses}
+            self._dirty = False
+            self._saved_at = time.time()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠ Não foi possível salvar os contadores do player: {e}")
+
+    def snapshot(self):
+        order = self.ranked()
+        with self._lock:
+            return {
+                'order': order,
+                'misses': self.misses,
+                'strategies': {
+                    name: dict(counts, hit_rate=round(counts['hits'] / counts['attempts'], 3)
+                               if counts['attempts'] else None)
+                    for name, counts in self.counts.items()
+                },
+            }
+
+
+player_strategy_stats = PlayerStrategyStats()
+
+
+# Leitura do player em pedaços; o fim do trecho anterior entra na próxima
+# busca para achar URLs cortadas entre dois pedaços
+MP4_STREAM_CHUNK_SIZE = 8 * 1024
+MP4_WINDOW_OVERLAP = 4 * 1024
+
+
+def _scan_mp4_stream(chunks, encoding='utf-8'):
+    """
+    Roda os padrões do servidor do site (#1/#2) numa janela deslizante conforme
+    os pedaços chegam. Retorna (indice_do_padrao, url, bytes_lidos, terminou):
+    terminou=False quando achou a URL antes do fim (o resto da página nem
+    precisa ser baixado). Sem casamento, lê até o fim e devolve url=None: a
+    página inteira segue para _find_mp4_url, na ordem de prioridade original.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    raw = []
+    window = ''
+    for chunk in chunks:
+        raw.append(chunk)
+        window += decoder.decode(chunk)
+        idx, url = _match_mp4_patterns(window, final=False, limit=_MP4_EARLY_EXIT_PATTERNS)
+        if url:
+            return idx, url, b''.join(raw), False
+        window = window[-MP4_WINDOW_OVERLAP:]
+    window += decoder.decode(b'', final=True)
+    idx, url = _match_mp4_patterns(window, limit=_MP4_EARLY_EXIT_PATTERNS)
+    if url:
+        return idx, url, b''.join(raw), True
+    return None, None, b''.join(raw), True
+
+
 class CNVSWebScraper:
-    def __init__(self, token):
-        self.base_url = "https://cnvsweb.stream"
+    def __init__(self, token, base_url=None, player_base_url=None):
+        self.base_url = (base_url or BASE_URL).rstrip('/')
+        self.player_base_url = (player_base_url or PLAYER_BASE_URL).rstrip('/')
         self.token = token
-        self.session = requests.Session()
+        # Mesmos pools de conexão das listagens do catálogo (transport.py)
+        self.session = transport.session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Referer': 'https://cnvsweb.stream/',
+            'Referer': f'{self.base_url}/',
         })
         self.last_activity = time.time()
         self.logged_in = False
-        # OTIMIZAÇÃO: Timeout para evitar travamento
-        self.timeout = 15
+        self.logged_in_at = None
+        # True quando a sessão veio do SESSION_FILE (restore_session)
+        self.session_restored = False
+        # OTIMIZAÇÃO: Timeout para evitar travamento (leitura; conexão em upstream.CONNECT_TIMEOUT)
+        self.timeout = upstream.READ_TIMEOUT
+        # Bytes lidos/economizados pela leitura em streaming do player (get_video_mp4_url)
+        self.mp4_stream_stats = {'calls': 0, 'early_exits': 0, 'bytes_read': 0, 'bytes_saved': 0}
+        self._stats_lock = threading.Lock()
+        # Títulos sem player / players sem .mp4 vistos há pouco (negative_cache.py)
+        self.negative_cache = NegativeCache()
     
+    def negative_key(self, url):
+        """Chave do negative_cache: URL absoluta no host canônico"""
+        if url and not url.startswith('http'):
+            url = urljoin(self.base_url, url)
+        return mirrors.canonical(url)
+
+    def negative_result(self, url):
+        """NegativeResult ainda válido para um watch_link/player_url (None se não houver)"""
+        return self.negative_cache.get(self.negative_key(url))
+
+    def _cached_negative(self, url):
+        cached = self.negative_result(url)
+        if cached is not None:
+            print(f"       ⏭ {cached.reason} em cache para {url[:60]} (expira em {cached.retry_after()}s)")
+        return cached
+
+    def _record_negative(self, url, reason, response):
+        """
+        Guarda o "não encontrado" só quando é resposta de verdade do site: 2xx
+        (página sem player/.mp4) ou 404/410 (*_not_found). 5xx, 403, 429 e
+        afins ficam com o breaker e as retentativas; a tela de login (sessão
+        caiu) também não conta.
+        """
+        status = response.status_code
+        if not (200 <= status < 300 or (status in (404, 410) and reason.endswith('not_found'))):
+            return
+        if urlparse(response.url or '').path.rstrip('/').endswith('/login'):
+            return
+        self.negative_cache.record(self.negative_key(url), reason)
+
+    def _get(self, url, **kwargs):
+        """GET pelo caminho central (timeouts de conexão/leitura + circuit breaker por host)"""
+        kwargs.setdefault('timeout', (upstream.CONNECT_TIMEOUT, self.timeout))
+        return upstream.request(self.session, 'GET', url, **kwargs)
+
+    def _post(self, url, **kwargs):
+        """POST pelo caminho central (timeouts de conexão/leitura + circuit breaker por host)"""
+        kwargs.setdefault('timeout', (upstream.CONNECT_TIMEOUT, self.timeout))
+        return upstream.request(self.session, 'POST', url, **kwargs)
+
+    def _get_resilient(self, url, hedge=None, **kwargs):
+        """GET idempotente com retentativas e, opcionalmente, hedging (upstream.request_resilient)"""
+        kwargs.setdefault('timeout', (upstream.CONNECT_TIMEOUT, self.timeout))
+        return upstream.request_resilient(self.session, 'GET', url, hedge=hedge, **kwargs)
+
     def login(self):
         """Faz login no site usando o token"""
         try:
@@ -200,8 +850,7 @@ class CNVSWebScraper:
             
             # Primeiro GET para pegar cookies
             print("🔑 Acessando página de login...")
-            response = self.session.get(login_page_url, timeout=self.timeout)
-            time.sleep(0.5)  # OTIMIZAÇÃO: Reduzido de 1s
+            response = self._get(login_page_url)
             
             # POST para o endpoint AJAX com o token
             payload = {
@@ -225,12 +874,11 @@ class CNVSWebScraper:
             }
             
             print(f"🔑 Fazendo login com token: {self.token}")
-            response = self.session.post(
+            response = self._post(
                 login_ajax_url, 
                 data=payload, 
                 headers=ajax_headers,
-                allow_redirects=False,
-                timeout=self.timeout  # OTIMIZAÇÃO
+                allow_redirects=False
             )
             
             print(f"📊 Status do login: {response.status_code}")
@@ -247,13 +895,16 @@ class CNVSWebScraper:
                         print(f"↪️  Redirecionando para: {redirect_url}")
                         
                         # Acessa a página de redirecionamento para completar o login
-                        response = self.session.get(redirect_url, timeout=self.timeout)
+                        response = self._get(redirect_url)
                         
                         # Verifica se está realmente logado
                         if response.status_code == 200 and '/login' not in response.url:
                             print("✓ Login confirmado - sessão ativa")
                             self.last_activity = time.time()
                             self.logged_in = True
+                            self.logged_in_at = self.last_activity
+                            self.session_restored = False
+                            self.save_session()
                             return True
                         else:
                             print(f"⚠ Redirecionamento falhou")
@@ -263,7 +914,7 @@ class CNVSWebScraper:
                         print(f"✗ Erro no login: {error_msg}")
                         return False
                         
-                except ValueError as e:
+                except ValueError:
                     print(f"✗ Resposta não é JSON válido: {response.text[:200]}")
                     return False
             else:
@@ -277,6 +928,95 @@ class CNVSWebScraper:
             traceback.print_exc()
             return False
     
+    def _token_fingerprint(self):
+        """Identifica o token no arquivo de sessão sem gravá-lo em texto puro"""
+        return hashlib.sha256(f"{self.base_url}|{self.token}".encode('utf-8')).hexdigest()[:16]
+
+    def save_session(self, path=None):
+        """Grava os cookies e o horário do login em SESSION_FILE (escrita atômica, modo 600)"""
+        path = SESSION_FILE if path is None else path
+        if not path or not self.logged_in:
+            return False
+        data = {
+            'token': self._token_fingerprint(),
+            'logged_in_at': self.logged_in_at,
+            'saved_at': time.time(),
+            'cookies': [
+                {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path,
+                 'expires': c.expires, 'secure': c.secure}
+                for c in self.session.cookies
+            ],
+        }
+        tmp_path = f"{path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"⚠ Não foi possível salvar a sessão em {path}: {e}")
+            return False
+
+    def restore_session(self, path=None):
+        """
+        Carrega os cookies salvos e confere com um GET da home (sem seguir
+        redirect, sem baixar o corpo). Se a sessão ainda vale, dispensa o login().
+        """
+        path = SESSION_FILE if path is None else path
+        if not path:
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"⚠ Arquivo de sessão ilegível ({path}): {e}")
+            return False
+
+        logged_in_at = data.get('logged_in_at') or 0
+        if data.get('token') != self._token_fingerprint():
+            print("⚠ Sessão salva é de outro token/site - ignorando")
+            return False
+        if time.time() - logged_in_at > SESSION_MAX_AGE:
+            print("⚠ Sessão salva expirou - novo login")
+            return False
+
+        now = time.time()
+        for c in data.get('cookies') or []:
+            if c.get('expires') and c['expires'] < now:
+                continue
+            self.session.cookies.set(c['name'], c['value'], domain=c.get('domain'), path=c.get('path') or '/',
+                                     expires=c.get('expires'), secure=bool(c.get('secure')))
+        if not self.session.cookies:
+            return False
+
+        try:
+            with timings.stage('session_check'):
+                with self._get(self.base_url, allow_redirects=False, stream=True) as response:
+                    status = response.status_code
+                    location = response.headers.get('Location', '')
+        except Exception as e:
+            print(f"⚠ Não foi possível validar a sessão salva: {e}")
+            status, location = None, ''
+        # Deslogado, o site manda para /login
+        if status != 200 or '/login' in location:
+            print(f"⚠ Sessão salva não vale mais (status={status}) - novo login")
+            self.session.cookies.clear()
+            return False
+
+        print(f"✓ Sessão restaurada de {path} (login de {int((now - logged_in_at) / 60)} min atrás)")
+        self.last_activity = time.time()
+        self.logged_in = True
+        self.logged_in_at = logged_in_at
+        self.session_restored = True
+        return True
+
+    def ensure_login(self):
+        """Reaproveita a sessão salva quando possível; senão faz o login completo"""
+        return self.restore_session() or self.login()
+
     def keep_alive(self):
         """Atualiza a sessão para não deslogar"""
         if not self.logged_in:
@@ -287,13 +1027,17 @@ class CNVSWebScraper:
         if current_time - self.last_activity > 180:  # 3 minutos
             print("⟳ Atualizando sessão...")
             try:
-                response = self.session.get(self.base_url, timeout=self.timeout)
+                with timings.stage('keepalive'):
+                    self._get(self.base_url)
                 self.last_activity = time.time()
+                # O site pode renovar os cookies; o arquivo acompanha
+                self.save_session()
                 print("✓ Sessão atualizada")
             except Exception as e:
                 print(f"Erro ao atualizar sessão: {e}")
     
-    def get_most_watched_today(self, get_video_urls=True, max_episodes_per_series=5, organize_output=True):
+    def get_most_watched_today(self, get_video_urls=True, max_episodes_per_series=5, organize_output=True,
+                               progress=None):
         """
         Pega os filmes/séries mais assistidos do dia
         
@@ -301,14 +1045,15 @@ class CNVSWebScraper:
             get_video_urls: Se True, extrai URLs dos vídeos
             max_episodes_per_series: Máximo de episódios para extrair por série (0 = todos)
             organize_output: Se True, retorna dados organizados em {movies: [], series: []}
+            progress: Opcional - chamado como progress(feitos, total, item) a cada item processado
         """
         self.keep_alive()
         
         try:
             print("📡 Acessando página principal...")
-            response = self.session.get(self.base_url)
+            response = self._get(self.base_url)
             self.last_activity = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = _soup(response.content)
             
             # Procura pela seção "Mais Visto do Dia"
             most_watched_section = None
@@ -347,117 +1092,21 @@ class CNVSWebScraper:
             
             for idx, item in enumerate(items, 1):
                 try:
-                    # Extrai informações do item
-                    info_div = item.find('div', class_='info')
-                    
-                    if not info_div:
+                    movie_data = _parse_listing_card(item)
+                    if not movie_data:
                         continue
-                    
-                    # Título
-                    title_tag = info_div.find('h6')
-                    title = title_tag.text.strip() if title_tag else "Sem título"
-                    
-                    # Link para assistir
-                    watch_btn = info_div.find('a', href=True)
-                    watch_link = watch_btn['href'] if watch_btn else ""
-                    
-                    # Tags (duração/temporadas, ano, IMDb)
-                    tags = info_div.find('p', class_='tags')
-                    duration_or_seasons = ""
-                    year = ""
-                    imdb = ""
-                    
-                    if tags:
-                        spans = tags.find_all('span')
-                        if len(spans) > 0:
-                            duration_or_seasons = spans[0].text.strip()
-                        if len(spans) > 1:
-                            year = spans[1].text.strip()
-                        if len(spans) > 2:
-                            imdb_text = spans[2].text.strip()
-                            # Remove "IMDb" do texto
-                            imdb = imdb_text.replace('IMDb', '').strip()
-                    
-                    # Imagem de fundo
-                    content_div = item.find('div', class_='content')
-                    image_url = ""
-                    if content_div:
-                        bg_style = content_div.get('style', '')
-                        image_match = re.search(r'url\((.*?)\)', bg_style)
-                        if image_match:
-                            image_url = image_match.group(1).strip('"\'')
-                    
-                    # Detecta se é série ou filme
-                    is_series = 'Temporada' in duration_or_seasons
-                    
-                    movie_data = {
-                        'title': title,
-                        'type': 'series' if is_series else 'movie',  # NOVO: identifica o tipo
-                        'watch_link': watch_link,
-                        'duration_or_seasons': duration_or_seasons,
-                        'year': year,
-                        'imdb': imdb,
-                        'image_url': image_url,
-                        'player_url': None,
-                        'video_url': None,
-                        'is_series': is_series,
-                        'episodes': []
-                    }
+                    title = movie_data['title']
+                    watch_link = movie_data['watch_link']
                     
                     print(f"  {idx}. {title}")
                     
                     # Se solicitado, extrai URLs do player e vídeo
                     if get_video_urls and watch_link:
-                        if is_series:
-                            print(f"     📺 Série detectada - extraindo episódios...")
-                            try:
-                                episodes = self.get_series_episodes(watch_link)
-                                
-                                # NOVO: Limita número de episódios se configurado
-                                if max_episodes_per_series > 0:
-                                    episodes = episodes[:max_episodes_per_series]
-                                    print(f"     ⚠ Limitado a {max_episodes_per_series} episódios")
-                                
-                                movie_data['episodes'] = episodes
-                                
-                                # Opcionalmente, extrai URLs de vídeo dos episódios
-                                if episodes:
-                                    print(f"     🎬 Extraindo URLs de vídeo dos episódios...")
-                                    for ep in episodes[:10000000]:  # Primeiros 10000000 episódios como exemplo
-                                        if ep.get('player_url'):
-                                            try:
-                                                video_url = self.get_video_mp4_url(ep['player_url'])
-                                                ep['video_url'] = video_url
-                                                if video_url:
-                                                    print(f"        ✓ {ep['title']}: {video_url[:60]}...")
-                                            except Exception as e:
-                                                print(f"        ✗ Erro: {e}")
-                            except Exception as e:
-                                print(f"     ✗ Erro ao extrair episódios: {e}")
-                        else:
-                            print(f"     🎬 Filme detectado - extraindo vídeo...")
-                            try:
-                                player_url = self.get_player_url(watch_link)
-                                movie_data['player_url'] = player_url
-                                
-                                if player_url:
-                                    print(f"     ✓ Player: {player_url[:60]}...")
-                                    video_url = self.get_video_mp4_url(player_url)
-                                    movie_data['video_url'] = video_url
-                                    if video_url:
-                                        print(f"     ✓ Vídeo: {video_url[:80]}...")
-                                    else:
-                                        print(f"     ⚠ URL do vídeo não encontrada")
-                                else:
-                                    print(f"     ⚠ URL do player não encontrada")
-                            except Exception as e:
-                                print(f"     ✗ Erro ao extrair vídeo: {e}")
+                        self.resolve_most_watched_item(movie_data, max_episodes_per_series)
                     
                     movies.append(movie_data)
-                    
-                    # Delay para não sobrecarregar o servidor
-                    if get_video_urls and idx < len(items):
-                        time.sleep(0.3)
+                    if progress:
+                        progress(idx, len(items), movie_data)
                     
                 except Exception as e:
                     print(f"  ✗ Erro ao processar item {idx}: {e}")
@@ -467,184 +1116,190 @@ class CNVSWebScraper:
             
             # NOVO: Retorna dados organizados se solicitado
             if organize_output:
-                organized_data = {
-                    'movies': [m for m in movies if m['type'] == 'movie'],
-                    'series': [m for m in movies if m['type'] == 'series'],
-                    'summary': {
-                        'total': len(movies),
-                        'movies': len([m for m in movies if m['type'] == 'movie']),
-                        'series': len([m for m in movies if m['type'] == 'series'])
-                    }
-                }
+                organized_data = organize_listing(movies)
                 print(f"📊 Organizado: {organized_data['summary']['movies']} filmes, {organized_data['summary']['series']} séries")
                 return organized_data
             
             return movies
             
+        except UpstreamUnavailable:
+            # Host fora do ar: deixa a API responder 503 em vez de "não encontrado"
+            raise
         except Exception as e:
             print(f"✗ Erro ao buscar filmes mais assistidos: {e}")
             import traceback
             traceback.print_exc()
             return []
     
-    def search_movies(self, query, get_video_urls=True, max_episodes_per_series=5, organize_output=True):
+    def resolve_most_watched_item(self, movie_data, max_episodes_per_series=5):
         """
-        Busca filmes/séries no site
-        
-        Args:
-            query: Termo de busca
-            get_video_urls: Se True, extrai URLs dos vídeos
-            max_episodes_per_series: Máximo de episódios para extrair por série (0 = todos)
-            organize_output: Se True, retorna dados organizados em {movies: [], series: []}
+        Preenche player_url/video_url (filme) ou episodes (série) de um card do
+        Mais Visto do Dia. Usado por get_most_watched_today e pelo MostWatchedTracker.
+        """
+        watch_link = movie_data['watch_link']
+        if not watch_link:
+            return movie_data
+        if movie_data['is_series']:
+            print(f"     📺 Série detectada - extraindo episódios...")
+            try:
+                episodes = self.get_series_episodes(watch_link)
+
+                # NOVO: Limita número de episódios se configurado
+                if max_episodes_per_series > 0:
+                    episodes = episodes[:max_episodes_per_series]
+                    print(f"     ⚠ Limitado a {max_episodes_per_series} episódios")
+
+                movie_data['episodes'] = episodes
+
+                # Opcionalmente, extrai URLs de vídeo dos episódios
+                if episodes:
+                    print(f"     🎬 Extraindo URLs de vídeo dos episódios...")
+                    for ep in episodes[:10000000]:  # Primeiros 10000000 episódios como exemplo
+                        if ep.get('player_url'):
+                            try:
+                                video_url = self.get_video_mp4_url(ep['player_url'])
+                                ep['video_url'] = video_url
+                                if video_url:
+                                    print(f"        ✓ {ep['title']}: {video_url[:60]}...")
+                            except Exception as e:
+                                print(f"        ✗ Erro: {e}")
+            except Exception as e:
+                print(f"     ✗ Erro ao extrair episódios: {e}")
+        else:
+            print(f"     🎬 Filme detectado - extraindo vídeo...")
+            try:
+                player_url = self.get_player_url(watch_link)
+                movie_data['player_url'] = player_url
+
+                if player_url:
+                    print(f"     ✓ Player: {player_url[:60]}...")
+                    video_url = self.get_video_mp4_url(player_url)
+                    movie_data['video_url'] = video_url
+                    if video_url:
+                        print(f"     ✓ Vídeo: {video_url[:80]}...")
+                    else:
+                        print(f"     ⚠ URL do vídeo não encontrada")
+                else:
+                    print(f"     ⚠ URL do player não encontrada")
+            except Exception as e:
+                print(f"     ✗ Erro ao extrair vídeo: {e}")
+        return movie_data
+
+    def search_listing(self, query):
+        """
+        Cards de /search.php para a query, sem resolver player/vídeo.
+        Usado por search_movies e pelo SearchCache (search_cache.py).
         """
         self.keep_alive()
-        
+
         try:
             search_url = f"{self.base_url}/search.php"
             params = {'q': query}
-            
+
             print(f"🔍 Buscando: {query}")
-            response = self.session.get(search_url, params=params)
+            response = self._get(search_url, params=params)
             self.last_activity = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
+            soup = _soup(response.content)
+
             movies = []
             items = soup.find_all('div', class_='item poster')
-            
+
             print(f"📊 Encontrados {len(items)} resultados")
-            
+
             for idx, item in enumerate(items, 1):
                 try:
-                    info_div = item.find('div', class_='info')
-                    if not info_div:
-                        continue
-                    
-                    title_tag = info_div.find('h6')
-                    title = title_tag.text.strip() if title_tag else "Sem título"
-                    
-                    watch_btn = info_div.find('a', href=True)
-                    watch_link = watch_btn['href'] if watch_btn else ""
-                    
-                    tags = info_div.find('p', class_='tags')
-                    duration_or_seasons = ""
-                    year = ""
-                    imdb = ""
-                    
-                    if tags:
-                        spans = tags.find_all('span')
-                        if len(spans) > 0:
-                            duration_or_seasons = spans[0].text.strip()
-                        if len(spans) > 1:
-                            year = spans[1].text.strip()
-                        if len(spans) > 2:
-                            imdb_text = spans[2].text.strip()
-                            imdb = imdb_text.replace('IMDb', '').strip()
-                    
-                    content_div = item.find('div', class_='content')
-                    image_url = ""
-                    if content_div:
-                        bg_style = content_div.get('style', '')
-                        image_match = re.search(r'url\((.*?)\)', bg_style)
-                        if image_match:
-                            image_url = image_match.group(1).strip('"\'')
-                    
-                    movie_data = {
-                        'title': title,
-                        'type': 'series' if 'Temporada' in duration_or_seasons else 'movie',  # NOVO
-                        'watch_link': watch_link,
-                        'duration_or_seasons': duration_or_seasons,
-                        'year': year,
-                        'imdb': imdb,
-                        'image_url': image_url,
-                        'player_url': None,
-                        'video_url': None,
-                        'is_series': 'Temporada' in duration_or_seasons,
-                        'episodes': []
-                    }
-                    
-                    print(f"  {idx}. {title}")
-                    
-                    # Detecta se é série ou filme
-                    is_series = 'Temporada' in duration_or_seasons
-                    
-                    if get_video_urls and watch_link:
-                        if is_series:
-                            print(f"     📺 Série detectada - extraindo episódios...")
-                            try:
-                                episodes = self.get_series_episodes(watch_link)
-                                
-                                # NOVO: Limita número de episódios se configurado
-                                if max_episodes_per_series > 0:
-                                    episodes = episodes[:max_episodes_per_series]
-                                    print(f"     ⚠ Limitado a {max_episodes_per_series} episódios")
-                                
-                                movie_data['episodes'] = episodes
-                                
-                                # Opcionalmente, extrai URLs de vídeo dos primeiros episódios
-                                if episodes:
-                                    print(f"     🎬 Extraindo URLs de vídeo dos primeiros episódios...")
-                                    for ep in episodes[:3]:  # Primeiros 3 como exemplo
-                                        if ep.get('player_url'):
-                                            try:
-                                                video_url = self.get_video_mp4_url(ep['player_url'])
-                                                ep['video_url'] = video_url
-                                                if video_url:
-                                                    print(f"        ✓ {ep['title']}: {video_url[:60]}...")
-                                            except Exception as e:
-                                                print(f"        ✗ Erro: {e}")
-                            except Exception as e:
-                                print(f"     ✗ Erro ao extrair episódios: {e}")
-                        else:
-                            print(f"     🎬 Filme detectado - extraindo vídeo...")
-                            try:
-                                player_url = self.get_player_url(watch_link)
-                                movie_data['player_url'] = player_url
-                                
-                                if player_url:
-                                    print(f"     ✓ Player: {player_url[:60]}...")
-                                    video_url = self.get_video_mp4_url(player_url)
-                                    movie_data['video_url'] = video_url
-                                    if video_url:
-                                        print(f"     ✓ Vídeo: {video_url[:80]}...")
-                                    else:
-                                        print(f"     ⚠ Vídeo não encontrado")
-                                else:
-                                    print(f"     ⚠ Player não encontrado")
-                            except Exception as e:
-                                print(f"     ✗ Erro: {e}")
-                    
-                    movies.append(movie_data)
-                    
-                    if get_video_urls and idx < len(items):
-                        time.sleep(0.3)
-                    
+                    movie_data = _parse_listing_card(item)
+                    if movie_data:
+                        movies.append(movie_data)
                 except Exception as e:
                     print(f"  ✗ Erro ao processar item {idx}: {e}")
-                    continue
-            
-            print(f"\n✓ Total: {len(movies)} resultados para '{query}'")
-            
-            # NOVO: Retorna dados organizados se solicitado
-            if organize_output:
-                organized_data = {
-                    'movies': [m for m in movies if m['type'] == 'movie'],
-                    'series': [m for m in movies if m['type'] == 'series'],
-                    'summary': {
-                        'total': len(movies),
-                        'movies': len([m for m in movies if m['type'] == 'movie']),
-                        'series': len([m for m in movies if m['type'] == 'series'])
-                    }
-                }
-                print(f"📊 Organizado: {organized_data['summary']['movies']} filmes, {organized_data['summary']['series']} séries")
-                return organized_data
-            
             return movies
-            
+
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"✗ Erro na busca: {e}")
             import traceback
             traceback.print_exc()
             return []
+
+    def resolve_search_item(self, movie_data, max_episodes_per_series=5):
+        """Preenche player_url/video_url (filme) ou episodes (série) de um card da busca"""
+        watch_link = movie_data['watch_link']
+        if not watch_link:
+            return movie_data
+        if movie_data['is_series']:
+            print(f"     📺 Série detectada - extraindo episódios...")
+            try:
+                episodes = self.get_series_episodes(watch_link)
+
+                # NOVO: Limita número de episódios se configurado
+                if max_episodes_per_series > 0:
+                    episodes = episodes[:max_episodes_per_series]
+                    print(f"     ⚠ Limitado a {max_episodes_per_series} episódios")
+
+                movie_data['episodes'] = episodes
+
+                # Opcionalmente, extrai URLs de vídeo dos primeiros episódios
+                if episodes:
+                    print(f"     🎬 Extraindo URLs de vídeo dos primeiros episódios...")
+                    for ep in episodes[:3]:  # Primeiros 3 como exemplo
+                        if ep.get('player_url'):
+                            try:
+                                video_url = self.get_video_mp4_url(ep['player_url'])
+                                ep['video_url'] = video_url
+                                if video_url:
+                                    print(f"        ✓ {ep['title']}: {video_url[:60]}...")
+                            except Exception as e:
+                                print(f"        ✗ Erro: {e}")
+            except Exception as e:
+                print(f"     ✗ Erro ao extrair episódios: {e}")
+        else:
+            print(f"     🎬 Filme detectado - extraindo vídeo...")
+            try:
+                player_url = self.get_player_url(watch_link)
+                movie_data['player_url'] = player_url
+
+                if player_url:
+                    print(f"     ✓ Player: {player_url[:60]}...")
+                    video_url = self.get_video_mp4_url(player_url)
+                    movie_data['video_url'] = video_url
+                    if video_url:
+                        print(f"     ✓ Vídeo: {video_url[:80]}...")
+                    else:
+                        print(f"     ⚠ Vídeo não encontrado")
+                else:
+                    print(f"     ⚠ Player não encontrado")
+            except Exception as e:
+                print(f"     ✗ Erro: {e}")
+        return movie_data
+
+    def search_movies(self, query, get_video_urls=True, max_episodes_per_series=5, organize_output=True):
+        """
+        Busca filmes/séries no site
+        
+        Args:
+            query: Termo de busca
+            get_video_urls: Se True, extrai URLs dos vídeos
+            max_episodes_per_series: Máximo de episódios para extrair por série (0 = todos)
+            organize_output: Se True, retorna dados organizados em {movies: [], series: []}
+        """
+        movies = self.search_listing(query)
+
+        for idx, movie_data in enumerate(movies, 1):
+            print(f"  {idx}. {movie_data['title']}")
+            if get_video_urls:
+                self.resolve_search_item(movie_data, max_episodes_per_series)
+
+        print(f"\n✓ Total: {len(movies)} resultados para '{query}'")
+
+        # NOVO: Retorna dados organizados se solicitado
+        if organize_output:
+            organized_data = organize_listing(movies)
+            print(f"📊 Organizado: {organized_data['summary']['movies']} filmes, {organized_data['summary']['series']} séries")
+            return organized_data
+
+        return movies
     
     def get_movie_details(self, movie_url):
         """Extrai TODAS as informações detalhadas de um filme"""
@@ -655,9 +1310,9 @@ class CNVSWebScraper:
                 movie_url = urljoin(self.base_url, movie_url)
             
             print(f"📄 Acessando página do filme: {movie_url}")
-            response = self.session.get(movie_url)
+            response = self._get(movie_url)
             self.last_activity = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = _soup(response.content)
             
             movie_info = {
                 'title': '',
@@ -731,6 +1386,8 @@ class CNVSWebScraper:
             
             return movie_info
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"✗ Erro ao obter detalhes do filme: {e}")
             import traceback
@@ -738,17 +1395,28 @@ class CNVSWebScraper:
             return None
     
     def get_player_url(self, movie_url, save_debug_html=False):
-        """Extrai a URL do player do filme"""
+        """Extrai a URL do player do filme (sempre no host canônico, mesmo vinda de um mirror)"""
+        return mirrors.canonical(self._extract_player_url(movie_url, save_debug_html))
+
+    def _extract_player_url(self, movie_url, save_debug_html=False):
         self.keep_alive()
         
         try:
             if not movie_url.startswith('http'):
                 movie_url = urljoin(self.base_url, movie_url)
+            if self._cached_negative(movie_url):
+                return None
             
             print(f"       🌐 Acessando: {movie_url}")
-            response = self.session.get(movie_url)
+            with timings.stage('player_fetch'):
+                response = self._get_resilient(movie_url, hedge=False)
             self.last_activity = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            if response.status_code in (404, 410):
+                print(f"       ✗ Página do título respondeu {response.status_code}")
+                self._record_negative(movie_url, 'page_not_found', response)
+                return None
+            with timings.stage('player_parse'):
+                soup = _soup(response.content)
             
             # Opção de salvar HTML para debug
             if save_debug_html:
@@ -757,140 +1425,39 @@ class CNVSWebScraper:
                     f.write(soup.prettify())
                 print(f"       💾 HTML salvo em: {filename}")
             
-            # DEBUG: Mostra todos os botões/links encontrados
-            all_buttons = soup.find_all('a', class_=lambda x: x and 'btn' in str(x))
-            print(f"       📊 Encontrados {len(all_buttons)} botões na página")
-            
-            for i, btn in enumerate(all_buttons[:5], 1):  # Primeiros 5
-                text = btn.get_text(strip=True)[:30]
-                href = btn.get('href', 'N/A')
-                classes = btn.get('class', [])
-                print(f"       🔘 Botão {i}: '{text}' | href='{href}' | class={classes}")
-            
-            # MÉTODO 1: Procura botão "ASSISTIR" - várias tentativas
-            assistir_btn = None
-            
-            # Tentativa 1: classe "btn free"
-            assistir_btn = soup.find('a', class_='btn free')
-            if assistir_btn:
-                print(f"       ✓ Encontrado com classe 'btn free'")
-            
-            # Tentativa 2: classe contendo "btn" e texto "ASSISTIR"
-            if not assistir_btn:
-                all_links = soup.find_all('a')
-                for link in all_links:
-                    text = link.get_text(strip=True).upper()
-                    if 'ASSISTIR' in text or 'PLAY' in text:
-                        assistir_btn = link
-                        print(f"       ✓ Encontrado por texto: '{link.get_text(strip=True)}'")
-                        break
-            
-            # Tentativa 3: procura por data-tippy-content com "Assistir"
-            if not assistir_btn:
-                assistir_btn = soup.find('a', attrs={'data-tippy-content': lambda x: x and 'Assistir' in x})
-                if assistir_btn:
-                    print(f"       ✓ Encontrado por data-tippy-content")
-            
-            if assistir_btn:
-                href = assistir_btn.get('href', '')
-                print(f"       🎯 Botão ASSISTIR encontrado com href: '{href}'")
-                
-                # CASO 1: Se o href é uma URL completa (http://...), é o player direto!
-                if href.startswith('http'):
-                    if 'play' in href.lower() or 'stream' in href.lower():
-                        print(f"       ✓ URL do player encontrada diretamente!")
-                        return href
-                    else:
-                        print(f"       ⚠ URL não parece ser um player: {href}")
-                
-                # CASO 2: Se o href começa com #, é uma âncora para um elemento na mesma página
-                elif href.startswith('#'):
-                    element_id = href[1:]  # Remove o #
-                    print(f"       🔍 Procurando elemento com ID: '{element_id}'")
-                    
-                    # Procura o elemento com esse ID
-                    player_element = soup.find(id=element_id)
-                    
-                    if player_element:
-                        print(f"       ✓ Elemento encontrado: {element_id}")
-                        print(f"       📝 Tag: {player_element.name}, Classes: {player_element.get('class', [])}")
-                        
-                        # Procura por iframe dentro desse elemento
-                        iframe = player_element.find('iframe')
-                        
-                        if iframe:
-                            src = iframe.get('src', '')
-                            if src:
-                                player_url = src if src.startswith('http') else urljoin(self.base_url, src)
-                                print(f"       ✓ iframe encontrado: {player_url[:80]}...")
-                                return player_url
-                            else:
-                                print(f"       ⚠ iframe sem src")
-                        else:
-                            print(f"       ⚠ Nenhum iframe dentro do elemento {element_id}")
-                            
-                            # Debug: mostra o conteúdo do elemento
-                            print(f"       📝 Conteúdo do elemento (primeiros 200 chars):")
-                            print(f"           {str(player_element)[:200]}")
-                        
-                        # Se não encontrou iframe, procura por data-src ou data-player
-                        for attr in ['data-src', 'data-player', 'data-url', 'data-iframe']:
-                            elem_with_attr = player_element.find(attrs={attr: True})
-                            if elem_with_attr:
-                                data_src = elem_with_attr.get(attr)
-                                if data_src:
-                                    player_url = data_src if data_src.startswith('http') else urljoin(self.base_url, data_src)
-                                    print(f"       ✓ URL encontrada em {attr}: {player_url[:80]}...")
-                                    return player_url
-                    else:
-                        print(f"       ⚠ Elemento com ID '{element_id}' não encontrado")
-                        
-                        # Debug: lista todos os IDs disponíveis
-                        all_ids = [elem.get('id') for elem in soup.find_all(id=True)]
-                        print(f"       📝 IDs disponíveis na página: {all_ids[:10]}")
-                
-                # CASO 3: Se for URL relativa, converte para absoluta
-                elif href.startswith('/'):
-                    full_url = urljoin(self.base_url, href)
-                    print(f"       ✓ URL relativa convertida: {full_url}")
-                    return full_url
-                else:
-                    print(f"       ⚠ Formato de href não reconhecido: '{href}'")
-            else:
-                print(f"       ⚠ Botão ASSISTIR não encontrado")
-            
-            # MÉTODO 2: Procura por iframes na página com "play" no src
-            print(f"       🔍 Procurando iframes na página...")
-            iframes = soup.find_all('iframe')
-            print(f"       📊 Encontrados {len(iframes)} iframes")
-            
-            for idx, iframe in enumerate(iframes):
-                src = iframe.get('src', '')
-                iframe_id = iframe.get('id', 'N/A')
-                print(f"       🔍 iframe {idx+1}: id='{iframe_id}' src='{src[:60] if src else 'sem src'}...'")
-                
-                if src and ('play' in src.lower() or 'stream' in src.lower()):
-                    player_url = src if src.startswith('http') else urljoin(self.base_url, src)
-                    print(f"       ✓ iframe com 'play' ou 'stream' encontrado")
-                    return player_url
-            
-            # MÉTODO 3: Pega o primeiro iframe disponível
-            if iframes and iframes[0].get('src'):
-                player_url = iframes[0]['src']
-                if not player_url.startswith('http'):
-                    player_url = urljoin(self.base_url, player_url)
-                print(f"       ⚠ Usando primeiro iframe disponível")
-                return player_url
-            
-            print(f"       ✗ Nenhum player encontrado")
-            return None
+            with timings.stage('player_extract'):
+                player_url = self._find_player_url(soup)
+            if not player_url:
+                self._record_negative(movie_url, 'no_player', response)
+            return player_url
             
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"       ✗ Erro ao extrair player URL: {e}")
             import traceback
             traceback.print_exc()
             return None
     
+    def _find_player_url(self, soup):
+        """
+        Uma passada pela página (_PlayerPage) e as estratégias na ordem do
+        ranking de acertos; no caso comum a primeira já resolve.
+        """
+        page = _PlayerPage(soup, self.base_url)
+        tried = []
+        for name in player_strategy_stats.ranked():
+            tried.append(name)
+            player_url = page.resolve(name)
+            if player_url:
+                player_strategy_stats.record(tried, name)
+                print(f"       ✓ Player via {name}: {player_url[:80]}")
+                return player_url
+        player_strategy_stats.record(tried, None)
+        print(f"       ✗ Nenhum player encontrado "
+              f"({len(page.iframes)} iframes, botões: {[n for n, b in page.buttons.items() if b is not None]})")
+        return None
+
     def get_series_episodes(self, watch_link):
         """Retorna apenas a lista de temporadas de uma série (sem episódios)"""
         self.keep_alive()
@@ -900,9 +1467,11 @@ class CNVSWebScraper:
                 watch_link = urljoin(self.base_url, watch_link)
 
             print(f"       📺 Acessando página da série: {watch_link}")
-            response = self.session.get(watch_link)
+            with timings.stage('series_fetch'):
+                response = self._get(watch_link)
             self.last_activity = time.time()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            with timings.stage('series_parse'):
+                soup = _soup(response.content)
 
             seasons_select = soup.find('select', id='seasons-view')
             if not seasons_select:
@@ -926,15 +1495,22 @@ class CNVSWebScraper:
 
             return seasons_list
 
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"       ✗ Erro ao extrair temporadas: {e}")
             import traceback
             traceback.print_exc()
             return []
 
-    def get_season_episodes(self, watch_link, season_id):
-        """Retorna episódios de uma temporada específica via AJAX autenticado"""
+    def get_season_episodes(self, watch_link, season_id, with_status=False):
+        """
+        Retorna episódios de uma temporada específica via AJAX autenticado.
+        with_status=True: retorna (episódios, completa); completa=False quando
+        alguma página do AJAX falhou e a lista pode estar faltando episódios.
+        """
         self.keep_alive()
+        complete = True
 
         try:
             if not watch_link.startswith('http'):
@@ -942,8 +1518,10 @@ class CNVSWebScraper:
 
             # Pega nome da temporada acessando a página principal
             print(f"       📺 Buscando temporada {season_id} de: {watch_link}")
-            page_response = self.session.get(watch_link)
-            page_soup = BeautifulSoup(page_response.content, 'html.parser')
+            with timings.stage('season_page_fetch'):
+                page_response = self._get(watch_link)
+            with timings.stage('season_page_parse'):
+                page_soup = _soup(page_response.content)
             seasons_select = page_soup.find('select', id='seasons-view')
             season_name = f"Temporada {season_id}"
             if seasons_select:
@@ -953,38 +1531,22 @@ class CNVSWebScraper:
                         break
 
             # Faz AJAX igual ao browser: GET com season, page e timestamp
-            import time as _time
-            timestamp = int(_time.time() * 1000)
             ajax_url = f"{self.base_url}/ajax/episodes.php"
-            ajax_params = {
-                'season': str(season_id),
-                'page': '1',
-                '_': str(timestamp)
-            }
-            ajax_headers = {
-                'X-Requested-With': 'XMLHttpRequest',
-                'Accept': '*/*',
-                'Referer': watch_link,
-            }
-            ajax_response = self.session.get(
-                ajax_url,
-                params=ajax_params,
-                headers=ajax_headers,
-                timeout=self.timeout
-            )
+            try:
+                with timings.stage('episodes_fetch'):
+                    ajax_soup, episodes = self._fetch_episodes_page(ajax_url, season_id, 1, watch_link)
+            except requests.HTTPError as e:
+                print(f"       ⚠ AJAX dos episódios falhou: {e}")
+                ajax_soup, episodes, complete = None, [], False
             self.last_activity = time.time()
-
-            print(f"       🔍 AJAX status={ajax_response.status_code} len={len(ajax_response.text)} url={ajax_response.url}")
             print(f"       🍪 Cookies da sessão: {list(self.session.cookies.keys())}")
 
-            ajax_soup = BeautifulSoup(ajax_response.content, 'html.parser')
-
-            # O AJAX retorna um <div id="episodes-view"> ou direto as <div class="ep">
-            ep_container = ajax_soup.find('div', id='episodes-view')
-            if ep_container:
-                episodes = ep_container.find_all('div', class_='ep')
-            else:
-                episodes = ajax_soup.find_all('div', class_='ep')
+            # Demais páginas: em paralelo quando a paginação informa o total,
+            # senão em lotes até uma página vir vazia ou sem episódio novo
+            if episodes:
+                with timings.stage('episodes_pages_fetch'):
+                    episodes, complete = self._fetch_remaining_episode_pages(
+                        ajax_url, season_id, watch_link, episodes, _episode_page_count(ajax_soup))
 
             # Fallback: se AJAX vazio, usa os da página principal (só T1)
             if not episodes:
@@ -996,76 +1558,11 @@ class CNVSWebScraper:
             all_episodes = []
             for idx, ep in enumerate(episodes, 1):
                 try:
-                    ep_id = ep.get('id', '')
-                    info_div = ep.find('div', class_='info')
-                    if not info_div:
+                    episode_data = self._parse_episode(ep, idx, season_name, season_id)
+                    if not episode_data:
                         continue
-
-                    title_tag = info_div.find('h5', class_='fw-bold')
-                    ep_title = title_tag.get_text(strip=True) if title_tag else f"Episódio {idx}"
-
-                    duration_tags = info_div.find_all('p', class_='small')
-                    duration = "N/A"
-                    pub_date = "N/A"
-                    for tag in duration_tags:
-                        text = tag.get_text(strip=True)
-                        if 'Duração:' in text:
-                            duration = text.replace('Duração:', '').strip()
-                        elif 'Publicado:' in text:
-                            pub_date = text.replace('Publicado:', '').strip()
-
-                    player_url = None
-
-                    # Método 1: link direto <a href="http://playcnvs...">
-                    buttons_div = ep.find('div', class_='buttons')
-                    if buttons_div:
-                        all_links = buttons_div.find_all('a', href=True)
-                        for link in all_links:
-                            href = link.get('href', '')
-                            if href.endswith('>'):
-                                href = href[:-1]
-                            if href.startswith('http') and ('playcnvs' in href or 'playmycnvs' in href or '/s/' in href):
-                                player_url = href
-                                break
-                        if not player_url:
-                            for link in all_links:
-                                href = link.get('href', '')
-                                if href.endswith('>'):
-                                    href = href[:-1]
-                                if href.startswith('http') and 'cnvsweb' not in href:
-                                    player_url = href
-                                    break
-
-                    # Método 2: extrai do loadEpisode(season_id, player_id) nos comentários HTML
-                    if not player_url:
-                        import re
-                        ep_html = str(ep)
-                        match = re.search(r'loadEpisode\(\s*\d+\s*,\s*(\d+)\s*\)', ep_html)
-                        if match:
-                            player_id = match.group(1)
-                            player_url = f"http://www.playcnvs.stream/s/{player_id}"
-
-                    # Método 3: procura data-id ou onclick com ID numérico
-                    if not player_url:
-                        for tag in ep.find_all(True):
-                            for attr in ['data-id', 'data-player', 'data-episode']:
-                                val = tag.get(attr, '')
-                                if val and val.isdigit():
-                                    player_url = f"http://www.playcnvs.stream/s/{val}"
-                                    break
-                            if player_url:
-                                break
-
-                    episode_data = {
-                        'episode_id': ep_id,
-                        'season': season_name,
-                        'season_id': season_id,
-                        'title': ep_title,
-                        'duration': duration,
-                        'published_date': pub_date,
-                        'player_url': player_url,
-                        'video_url': None
-                    }
+                    ep_title = episode_data['title']
+                    player_url = episode_data['player_url']
 
                     if player_url:
                         print(f"             {idx}. {ep_title}: {player_url[:60]}...")
@@ -1079,228 +1576,307 @@ class CNVSWebScraper:
                     continue
 
             print(f"       ✓ Total de episódios extraídos: {len(all_episodes)}")
-            return all_episodes
+            return (all_episodes, complete) if with_status else all_episodes
 
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"       ✗ Erro ao extrair episódios: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            return ([], False) if with_status else []
     
+    def _fetch_episodes_page(self, ajax_url, season_id, page, referer):
+        """
+        GET de uma página do ajax/episodes.php; retorna (soup, lista de <div class="ep">).
+        Levanta HTTPError se a página falhou (5xx, 403, 429...): erro não é "acabaram
+        os episódios". 404/410 contam como página vazia.
+        """
+        ajax_params = {
+            'season': str(season_id),
+            'page': str(page),
+            '_': str(int(time.time() * 1000))
+        }
+        ajax_headers = {
+            'X-Requested-With': 'XMLHttpRequest',
+            'Accept': '*/*',
+            'Referer': referer,
+        }
+        response = self._get(ajax_url, params=ajax_params, headers=ajax_headers)
+        print(f"       🔍 AJAX status={response.status_code} len={len(response.content)} url={response.url}")
+        if response.status_code >= 400 and response.status_code not in (404, 410):
+            response.raise_for_status()
+        soup = _soup(response.content)
+        # O AJAX retorna um <div id="episodes-view"> ou direto as <div class="ep">
+        ep_container = soup.find('div', id='episodes-view')
+        if ep_container:
+            return soup, ep_container.find_all('div', class_='ep')
+        return soup, soup.find_all('div', class_='ep')
+
+    def _fetch_remaining_episode_pages(self, ajax_url, season_id, referer, first_page, page_count):
+        """
+        Busca as páginas 2..N do ajax/episodes.php em paralelo (o rate limiter do
+        host continua valendo) e junta tudo na ordem das páginas, sem episode_id repetido.
+        Retorna (episódios, completa): completa=False se alguma página falhou.
+        """
+        merged, seen = [], set()
+
+        def add(page_eps):
+            new = 0
+            for ep in page_eps:
+                key = ep.get('id') or str(ep)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(ep)
+                    new += 1
+            return new
+
+        add(first_page)
+        next_page = 2
+        workers = max(1, EPISODE_PAGE_WORKERS)
+        missing = []
+        def fetch_page(page):
+            with timings.stage('episodes_page_fetch'):
+                return self._fetch_episodes_page(ajax_url, season_id, page, referer)[1]
+
+        # bound: as threads do pool herdam a prioridade e o registro de timings de quem pediu
+        fetch = scheduler.bound(fetch_page)
+        # Sem total conhecido, a página 2 vai sozinha (a maioria das temporadas tem
+        # uma página só); se vier cheia, as próximas seguem em lotes de `workers`
+        batch_size = 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='episodes') as pool:
+            while next_page <= min(page_count or EPISODE_MAX_PAGES, EPISODE_MAX_PAGES):
+                last = page_count if page_count else next_page + batch_size - 1
+                batch = list(range(next_page, min(last, EPISODE_MAX_PAGES) + 1))
+                futures = [(page, pool.submit(fetch, page)) for page in batch]
+                exhausted = False
+                failed = False
+                for page, future in futures:
+                    error = future.exception()
+                    if exhausted:
+                        continue
+                    # Página que falhou fica de fora; as que chegaram (e a 1) continuam valendo
+                    if error is not None:
+                        print(f"       ⚠ Página {page} dos episódios falhou: {error}")
+                        missing.append(page)
+                        failed = True
+                        continue
+                    page_eps = future.result()
+                    # Página vazia ou repetida (servidor ignorando ?page=): acabou
+                    if not page_eps or not add(page_eps):
+                        exhausted = True
+                # Sem total conhecido, uma falha não diz se há mais páginas: para aqui
+                if exhausted or page_count or failed:
+                    break
+                next_page = batch[-1] + 1
+                batch_size = workers
+
+        if missing:
+            print(f"       ⚠ Temporada {season_id} incompleta: faltaram as páginas {missing}")
+        if len(merged) > len(first_page):
+            print(f"       📄 {len(merged)} episódios juntando as páginas do AJAX")
+        return merged, not missing
+
+    def _parse_episode(self, ep, idx, season_name, season_id):
+        """Parseia um <div class="ep"> (título, duração, data e player_url)"""
+        ep_id = ep.get('id', '')
+        info_div = ep.find('div', class_='info')
+        if not info_div:
+            return None
+
+        title_tag = info_div.find('h5', class_='fw-bold')
+        ep_title = title_tag.get_text(strip=True) if title_tag else f"Episódio {idx}"
+
+        duration_tags = info_div.find_all('p', class_='small')
+        duration = "N/A"
+        pub_date = "N/A"
+        for tag in duration_tags:
+            text = tag.get_text(strip=True)
+            if 'Duração:' in text:
+                duration = text.replace('Duração:', '').strip()
+            elif 'Publicado:' in text:
+                pub_date = text.replace('Publicado:', '').strip()
+
+        player_url = None
+
+        # Método 1: link direto <a href="http://playcnvs...">
+        buttons_div = ep.find('div', class_='buttons')
+        if buttons_div:
+            all_links = buttons_div.find_all('a', href=True)
+            for link in all_links:
+                href = link.get('href', '')
+                if href.endswith('>'):
+                    href = href[:-1]
+                if href.startswith('http') and ('playcnvs' in href or 'playmycnvs' in href or '/s/' in href):
+                    player_url = href
+                    break
+            if not player_url:
+                for link in all_links:
+                    href = link.get('href', '')
+                    if href.endswith('>'):
+                        href = href[:-1]
+                    if href.startswith('http') and 'cnvsweb' not in href and not site_mirrors.owns(href):
+                        player_url = href
+                        break
+
+        # Método 2: extrai do loadEpisode(season_id, player_id) nos comentários HTML
+        if not player_url:
+            ep_html = str(ep)
+            match = re.search(r'loadEpisode\(\s*\d+\s*,\s*(\d+)\s*\)', ep_html)
+            if match:
+                player_id = match.group(1)
+                player_url = f"{self.player_base_url}/s/{player_id}"
+
+        # Método 3: procura data-id ou onclick com ID numérico
+        if not player_url:
+            for tag in ep.find_all(True):
+                for attr in ['data-id', 'data-player', 'data-episode']:
+                    val = tag.get(attr, '')
+                    if val and val.isdigit():
+                        player_url = f"{self.player_base_url}/s/{val}"
+                        break
+                if player_url:
+                    break
+
+        return Episode(
+            episode_id=ep_id,
+            season=season_name,
+            season_id=season_id,
+            title=ep_title,
+            duration=duration,
+            published_date=pub_date,
+            player_url=mirrors.canonical(player_url),
+            video_url=None
+        )
+
     def get_video_mp4_url(self, player_url):
         """Extrai a URL do vídeo .mp4 do player"""
         self.keep_alive()
         
         try:
+            if self._cached_negative(player_url):
+                return None
             print(f"       🔍 Acessando player: {player_url[:60]}...")
-            response = self.session.get(player_url)
+            with timings.stage('mp4_fetch'):
+                response = self._get_resilient(player_url, stream=True)
             self.last_activity = time.time()
-            html = response.text
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # MÉTODO 1: Procura tag <video> com src
-            video_tags = soup.find_all('video')
-            print(f"       📊 Encontradas {len(video_tags)} tags <video>")
-            
-            for idx, video_tag in enumerate(video_tags):
-                src = video_tag.get('src')
-                if src and '.mp4' in src:
-                    print(f"       ✓ URL encontrada em <video> tag #{idx+1}")
-                    return src
-                
-                # Procura <source> dentro de <video>
-                source_tags = video_tag.find_all('source')
-                for source_tag in source_tags:
-                    src = source_tag.get('src')
-                    if src:
-                        print(f"       ✓ URL encontrada em <source> dentro de <video> #{idx+1}")
-                        return src
-            
-            # MÉTODO 2: Regex mais específico para URLs .mp4 com o padrão do site
-            # Padrão: https://server-amz.playmycnvs.com/...mp4?cnvs_token=...
-            mp4_patterns = [
-                r'https?://server[^"\s]*?\.mp4[^"\s]*',                    # server...mp4
-                r'https?://[^"\s]*playmycnvs[^"\s]*?\.mp4[^"\s]*',         # playmycnvs...mp4
-                r'src["\s]*[:=]["\s]*([^"\s]+\.mp4[^"\s]*)',               # src="...mp4"
-                r'"file"["\s]*:["\s]*"([^"]+\.mp4[^"]*)"',                 # "file":"...mp4"
-                r'"src"["\s]*:["\s]*"([^"]+\.mp4[^"]*)"',                  # "src":"...mp4"
-                r'https?://[^"\s<>]+\.mp4[^\s<>"\']*',                     # qualquer URL .mp4
-            ]
-            
-            for idx, pattern in enumerate(mp4_patterns):
-                matches = re.findall(pattern, html, re.IGNORECASE)
-                if matches:
-                    # Pega a primeira URL encontrada
-                    video_url = matches[0]
-                    
-                    # Se for um grupo de captura, usa o grupo
-                    if isinstance(video_url, tuple):
-                        video_url = video_url[0]
-                    
-                    # Remove aspas e espaços
-                    video_url = video_url.strip('"\'\\').strip()
-                    
-                    # Verifica se é uma URL válida
-                    if video_url.startswith('http') and '.mp4' in video_url:
-                        print(f"       ✓ URL encontrada com pattern #{idx+1}: {video_url[:80]}...")
-                        return video_url
-            
-            # MÉTODO 3: Procura por divs com classe específica do player (jw-media, jw-video, etc)
-            player_divs = soup.find_all(['div', 'video'], class_=re.compile(r'jw-|player|video', re.I))
-            print(f"       📊 Encontrados {len(player_divs)} elementos de player")
-            
-            for div in player_divs:
-                # Procura por data-src ou outros atributos
-                for attr in ['data-src', 'data-url', 'data-file', 'src']:
-                    url = div.get(attr)
-                    if url and '.mp4' in url:
-                        print(f"       ✓ URL encontrada em {attr} de elemento player")
-                        return url
-            
-            # MÉTODO 4: Busca agressiva no HTML por qualquer string que pareça uma URL de vídeo
-            print(f"       🔍 Fazendo busca agressiva no HTML...")
-            all_urls = re.findall(r'https?://[^\s<>"\']+', html)
-            
-            for url in all_urls:
-                url = url.strip('"\'\\,;')
-                if '.mp4' in url and ('server' in url.lower() or 'play' in url.lower() or 'cnvs' in url.lower()):
-                    print(f"       ✓ URL encontrada em busca agressiva")
-                    return url
-            
-            print(f"       ✗ Nenhuma URL de vídeo encontrada")
-            print(f"       📝 Tamanho do HTML: {len(html)} caracteres")
-            
-            # Debug: salva o HTML para análise
-            if len(html) < 10000:  # Só para HTMLs pequenos
-                print(f"       📝 HTML snippet: {html[:500]}...")
-            
-            return None
-            
+            if response.status_code in (404, 410):
+                response.close()
+                print(f"       ✗ Player respondeu {response.status_code}")
+                self._record_negative(player_url, 'player_not_found', response)
+                return None
+
+            # Procura o .mp4 enquanto a página chega e fecha a conexão ao achar
+            encoding = response.encoding or 'utf-8'
+            with response:
+                with timings.stage('mp4_stream'):
+                    idx, video_url, content, finished = _scan_mp4_stream(
+                        response.iter_content(chunk_size=MP4_STREAM_CHUNK_SIZE), encoding)
+                self._record_mp4_stream(response, len(content), finished)
+            if video_url:
+                print(f"       ✓ URL encontrada com pattern #{idx+1}: {video_url[:80]}...")
+                return video_url
+
+            # Sem URL do servidor do site: tag <video>, demais padrões e o resto,
+            # nessa ordem, sobre a página inteira
+            html = content.decode(encoding, errors='replace')
+            with timings.stage('mp4_parse'):
+                soup = _soup(content)
+            
+            with timings.stage('mp4_extract'):
+                video_url = self._find_mp4_url(html, soup)
+            if not video_url:
+                self._record_negative(player_url, 'no_video', response)
+            return video_url
+            
+        except UpstreamUnavailable:
+            raise
         except Exception as e:
             print(f"       ✗ Erro ao extrair vídeo MP4: {e}")
             import traceback
             traceback.print_exc()
             return None
 
-
-def main():
-    """Função de teste"""
-    TOKEN = "2E9RCU0B"
-    
-    print("\n" + "="*70)
-    print("CNVSWeb Scraper - Versão Completa com Organização")
-    print("="*70)
-    
-    scraper = CNVSWebScraper(TOKEN)
-    
-    # Login
-    print("\n" + "="*70)
-    print("ETAPA 1: LOGIN")
-    print("="*70 + "\n")
-    
-    if not scraper.login():
-        print("\n✗ Falha no login. Verifique o token.")
-        return
-    
-    # Filmes mais assistidos
-    print("\n" + "="*70)
-    print("ETAPA 2: FILMES MAIS ASSISTIDOS DO DIA")
-    print("="*70 + "\n")
-    
-    # NOVO: Usa organização de dados
-    result = scraper.get_most_watched_today(
-        get_video_urls=True,
-        max_episodes_per_series=3,  # Limita a 3 episódios por série
-        organize_output=True  # Retorna organizado
-    )
-    
-    # Verifica se retornou dados organizados ou lista simples
-    if isinstance(result, dict) and 'movies' in result:
-        # Dados organizados
-        most_watched_movies = result['movies']
-        most_watched_series = result['series']
-        summary = result['summary']
+    def _record_mp4_stream(self, response, decoded_bytes, finished):
+        """Soma e imprime quantos bytes do player foram lidos e quantos deixaram de ser baixados"""
+        try:
+            read = response.raw.tell()
+        except AttributeError:
+            read = decoded_bytes
+        total = int(response.headers.get('Content-Length') or 0)
+        saved = max(0, total - read) if total and not finished else 0
+        with self._stats_lock:
+            stats = self.mp4_stream_stats
+            stats['calls'] += 1
+            stats['early_exits'] += not finished
+            stats['bytes_read'] += read
+            stats['bytes_saved'] += saved
+        if not finished:
+            print(f"       📉 Player: lidos {read} de {total or '?'} bytes (economia de {saved} bytes)")
+
+    def _find_mp4_url(self, html, soup):
+        """Aplica as estratégias de extração do .mp4 sobre o HTML do player"""
+        # MÉTODO 1: Procura tag <video> com src
+        video_tags = soup.find_all('video')
+        print(f"       📊 Encontradas {len(video_tags)} tags <video>")
         
-        print("\n" + "="*70)
-        print(f"RESULTADOS ORGANIZADOS")
-        print("="*70)
-        print(f"\n📊 Total: {summary['total']} itens")
-        print(f"   🎬 Filmes: {summary['movies']}")
-        print(f"   📺 Séries: {summary['series']}")
+        for idx, video_tag in enumerate(video_tags):
+            src = video_tag.get('src')
+            if src and '.mp4' in src:
+                print(f"       ✓ URL encontrada em <video> tag #{idx+1}")
+                return src
+            
+            # Procura <source> dentro de <video>
+            source_tags = video_tag.find_all('source')
+            for source_tag in source_tags:
+                src = source_tag.get('src')
+                if src:
+                    print(f"       ✓ URL encontrada em <source> dentro de <video> #{idx+1}")
+                    return src
         
-        # Mostra exemplos
-        if most_watched_movies:
-            print(f"\n{'='*70}")
-            print("EXEMPLO DE FILME:")
-            print('='*70)
-            movie = most_watched_movies[0]
-            print(f"\n🎬 {movie['title']}")
-            print(f"   📅 Ano: {movie['year']}")
-            print(f"   ⏱️  Duração: {movie['duration_or_seasons']}")
-            print(f"   ⭐ IMDb: {movie['imdb']}")
-            if movie.get('player_url'):
-                print(f"   🎮 Player: {movie['player_url'][:60]}...")
-            if movie.get('video_url'):
-                print(f"   🎥 Vídeo: {movie['video_url'][:80]}...")
+        # MÉTODO 2: Regex mais específico para URLs .mp4 com o padrão do site
+        idx, video_url = _match_mp4_patterns(html)
+        if video_url:
+            print(f"       ✓ URL encontrada com pattern #{idx+1}: {video_url[:80]}...")
+            return video_url
         
-        if most_watched_series:
-            print(f"\n{'='*70}")
-            print("EXEMPLO DE SÉRIE:")
-            print('='*70)
-            series = most_watched_series[0]
-            print(f"\n📺 {series['title']}")
-            print(f"   📅 Ano: {series['year']}")
-            print(f"   📺 Temporadas: {series['duration_or_seasons']}")
-            print(f"   ⭐ IMDb: {series['imdb']}")
-            print(f"   📼 Episódios extraídos: {len(series['episodes'])}")
-            
-            if series['episodes']:
-                print(f"\n   Primeiro episódio:")
-                ep = series['episodes'][0]
-                print(f"   - {ep['title']}")
-                if ep.get('player_url'):
-                    print(f"     🎮 Player: {ep['player_url'][:60]}...")
-                if ep.get('video_url'):
-                    print(f"     🎥 Vídeo: {ep['video_url'][:80]}...")
+        # MÉTODO 3: Procura por divs com classe específica do player (jw-media, jw-video, etc)
+        player_divs = soup.find_all(['div', 'video'], class_=re.compile(r'jw-|player|video', re.I))
+        print(f"       📊 Encontrados {len(player_divs)} elementos de player")
         
-        # Salva resultados organizados
-        output = {
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'summary': summary,
-            'movies': most_watched_movies,
-            'series': most_watched_series
-        }
-    else:
-        # Formato antigo (lista simples)
-        most_watched = result
+        for div in player_divs:
+            # Procura por data-src ou outros atributos
+            for attr in ['data-src', 'data-url', 'data-file', 'src']:
+                url = div.get(attr)
+                if url and '.mp4' in url:
+                    print(f"       ✓ URL encontrada em {attr} de elemento player")
+                    return url
         
-        if most_watched:
-            print("\n" + "="*70)
-            print(f"RESULTADOS: {len(most_watched)} FILMES")
-            print("="*70)
-            
-            for i, movie in enumerate(most_watched[:3], 1):
-                print(f"\n🎬 {i}. {movie['title']}")
-                print(f"   📅 Ano: {movie['year']}")
-                print(f"   ⏱️  Duração: {movie['duration_or_seasons']}")
-                print(f"   ⭐ IMDb: {movie['imdb']}")
-                if movie.get('player_url'):
-                    print(f"   🎮 Player: {movie['player_url'][:60]}...")
-                if movie.get('video_url'):
-                    print(f"   🎥 Vídeo: {movie['video_url'][:80]}...")
+        # MÉTODO 4: Busca agressiva no HTML por qualquer string que pareça uma URL de vídeo
+        print(f"       🔍 Fazendo busca agressiva no HTML...")
+        all_urls = re.findall(r'https?://[^\s<>"\']+', html)
         
-        # Salva resultados
-        output = {
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'total': len(most_watched),
-            'movies': most_watched
-        }
-    
-    with open('cnvsweb_results.json', 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-    
-    print(f"\n✓ Resultados salvos em cnvsweb_results.json")
+        for url in all_urls:
+            url = url.strip('"\'\\,;')
+            if '.mp4' in url and ('server' in url.lower() or 'play' in url.lower() or 'cnvs' in url.lower()):
+                print(f"       ✓ URL encontrada em busca agressiva")
+                return url
+        
+        print(f"       ✗ Nenhuma URL de vídeo encontrada")
+        print(f"       📝 Tamanho do HTML: {len(html)} caracteres")
+        
+        # Debug: salva o HTML para análise
+        if len(html) < 10000:  # Só para HTMLs pequenos
+            print(f"       📝 HTML snippet: {html[:500]}...")
+        
+        return None
+
+
+def main(argv=None):
+    """Exportação em massa (CLI em exporter.py): python cnvsweb_scraper.py --help"""
+    import exporter
+    return exporter.main(argv)
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
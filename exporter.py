@@ -0,0 +1,359 @@
+"""
+Exportação em massa do catálogo (CLI)
+
+Percorre /movies, /tvseries e /animes e, para cada item, resolve player e
+.mp4 (filmes) ou temporadas, episódios e .mp4 de cada episódio (séries e
+animes), com um pool de workers e teto de req/s por host. Cada item vira uma
+linha no JSONL assim que termina, então nada fica só na memória.
+
+Checkpoint: o próprio JSONL diz o que já foi exportado (campo "key") e o
+<saída>.checkpoint.json guarda os parâmetros da execução. Se o processo
+morrer, rodar o mesmo comando continua de onde parou (a linha cortada no meio
+é descartada). Itens que falharam ficam de fora e são tentados de novo; uma
+etapa que volta vazia (player, .mp4, temporadas, episódios) sem o site dizer
+que aquilo não existe também conta como falha.
+
+Uso:
+    python exporter.py                                   # tudo em export.jsonl
+    python exporter.py --only series --workers 8 --rate 5
+    python exporter.py --since 2024-01-01 -o novos.jsonl # só lançamentos/episódios desde a data
+    python exporter.py --restart                         # ignora o checkpoint e recomeça
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime
+
+import requests
+
+import cnvsweb_scraper
+import ratelimit
+import scheduler
+import upstream
+from records import json_default
+from series_index import SeriesIndex, SERIES_INDEX_PATH
+
+CONTENT_TYPES = ('movie', 'series', 'anime')
+_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%d-%m-%Y')
+
+
+def parse_date(text):
+    """'2024-03-01', '01/03/2024'... -> date (None se não reconhecer)"""
+    text = (text or '').strip()[:10]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def item_key(item):
+    return f"{item['type']}:{item['slug']}"
+
+
+def load_done(path):
+    """Chaves já exportadas no JSONL; corta a última linha se ela ficou pela metade"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        good_size = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                done.add(json.loads(line)['key'])
+            except (ValueError, KeyError):
+                break
+            good_size += len(line)
+        f.truncate(good_size)
+    return done
+
+
+class Checkpoint:
+    """<saída>.checkpoint.json: parâmetros da execução, contadores e se terminou"""
+
+    def __init__(self, path, params):
+        self.path = path
+        self.params = params
+        self.data = None
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.data = json.load(f)
+        except FileNotFoundError:
+            self.data = None
+        return self.data
+
+    def save(self, **fields):
+        data = dict(self.data or {}, params=self.params, updated_at=time.time(), **fields)
+        data.setdefault('started_at', data['updated_at'])
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self.data = data
+
+
+class ItemIncomplete(Exception):
+    """Uma etapa do item voltou vazia sem o site dizer que não existe (falha provavelmente transitória)"""
+
+
+class Exporter:
+    def __init__(self, scraper, index, output, only, since=None, max_episodes=0, progress_every=5.0):
+        self.scraper = scraper
+        self.index = index
+        self.output = output
+        self.only = only
+        self.since = since
+        self.max_episodes = max_episodes
+        self.progress_every = progress_every
+        self.done = set()
+        self.counts = {'exported': 0, 'skipped': 0, 'failed': 0, 'videos': 0}
+        # Erro de rede que cortou a listagem do catálogo no meio (a execução não terminou)
+        self.listing_error = None
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._last_progress = 0.0
+        self._started = time.time()
+
+    # ---------- catálogo ----------
+
+    def iter_items(self):
+        """Itens das listagens pedidas (streaming), sem repetir chave"""
+        seen = set()
+        for content_type in self.only:
+            for item in cnvsweb_scraper.iter_catalog(content_type, base_url=self.scraper.base_url):
+                key = item_key(item)
+                if key not in seen:
+                    seen.add(key)
+                    yield item
+
+    def wanted(self, item):
+        """--since: filmes de anos anteriores ficam de fora (séries são filtradas por episódio)"""
+        if self.since is None or item['type'] != 'movie':
+            return True
+        year = (item.get('year') or '').strip()
+        return not year.isdigit() or int(year) >= self.since.year
+
+    # ---------- resolução de um item ----------
+
+    def require(self, value, url, what):
+        """
+        None/[] do scraper é falha (o item fica fora do JSONL e volta na próxima
+        execução), a menos que o site tenha respondido que aquilo não existe
+        (resultado no negative_cache): aí o vazio é a resposta final.
+        """
+        if value or self.scraper.negative_result(url) is not None:
+            return value
+        raise ItemIncomplete(f"{what} não veio para {url}")
+
+    def export_item(self, item):
+        record = dict(item.to_dict(), key=item_key(item))
+        watch_link = item['url']
+        if item['type'] == 'movie':
+            player_url = self.require(self.scraper.get_player_url(watch_link), watch_link, 'player')
+            record['player_url'] = player_url
+            record['video_url'] = (self.require(self.scraper.get_video_mp4_url(player_url), player_url, 'vídeo')
+                                   if player_url else None)
+            videos = 1 if record['video_url'] else 0
+        else:
+            record['seasons'], videos = self.export_seasons(watch_link)
+            if self.since is not None and not any(s['episodes'] for s in record['seasons']):
+                return None
+        record['exported_at'] = time.time()
+        return record, videos
+
+    def export_seasons(self, watch_link):
+        seasons, _ = self.index.seasons(self.scraper, watch_link)
+        self.require(seasons, watch_link, 'temporadas')
+        result, videos = [], 0
+        for season in seasons:
+            episodes, _ = self.index.season_episodes(self.scraper, watch_link, season['season_id'])
+            self.require(episodes, watch_link, f"episódios da temporada {season['season_id']}")
+            if self.since is not None:
+                episodes = [ep for ep in episodes
+                            if (parse_date(ep['published_date']) or self.since) >= self.since]
+            if self.max_episodes > 0:
+                episodes = episodes[:self.max_episodes]
+            for ep in episodes:
+                if ep['player_url']:
+                    ep['video_url'] = self.require(self.scraper.get_video_mp4_url(ep['player_url']),
+                                                   ep['player_url'], 'vídeo')
+                    videos += bool(ep['video_url'])
+            result.append({'season_id': season['season_id'], 'season_name': season['season_name'],
+                           'episodes': [ep.to_dict() for ep in episodes]})
+        return result, videos
+
+    # ---------- execução ----------
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=json_default) + '\n'
+        with self._write_lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def _task(self, item):
+        try:
+            result = self.export_item(item)
+        except upstream.UpstreamUnavailable as e:
+            return item, None, f"upstream indisponível ({e.host})"
+        except Exception as e:
+            return item, None, f"{type(e).__name__}: {e}"
+        return item, result, None
+
+    def _finish(self, future):
+        item, result, error = future.result()
+        if error:
+            self.counts['failed'] += 1
+            progress(f"  ✗ {item_key(item)}: {error}")
+        elif result is None:
+            self.counts['skipped'] += 1
+        else:
+            record, videos = result
+            self.write(record)
+            self.done.add(record['key'])
+            self.counts['exported'] += 1
+            self.counts['videos'] += videos
+
+    def _report(self, force=False):
+        now = time.time()
+        if not force and now - self._last_progress < self.progress_every:
+            return
+        self._last_progress = now
+        elapsed = now - self._started
+        c = self.counts
+        progress(f"📦 {c['exported']} exportados, {c['skipped']} fora do --since, {c['failed']} falhas, "
+                 f"{c['videos']} vídeos ({c['exported'] / elapsed if elapsed else 0:.1f} itens/s)")
+
+    def run(self, workers, on_progress=None):
+        """Exporta tudo que ainda não está no JSONL; retorna os contadores"""
+        self.done = load_done(self.output)
+        if self.done:
+            progress(f"↻ Retomando: {len(self.done)} itens já em {self.output}")
+        max_pending = workers * 4
+        with open(self.output, 'a', encoding='utf-8') as self._file, \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export') as pool:
+            pending = set()
+            try:
+                for item in self.iter_items():
+                    if item_key(item) in self.done:
+                        continue
+                    if not self.wanted(item):
+                        self.counts['skipped'] += 1
+                        continue
+                    # Segura a listagem para não enfileirar o catálogo inteiro de uma vez
+                    while len(pending) >= max_pending:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            self._finish(future)
+                        self._report()
+                        if on_progress:
+                            on_progress(self.counts)
+                    pending.add(pool.submit(scheduler.bound(self._task, 'batch'), item))
+            except requests.RequestException as e:
+                # Os itens já enfileirados ainda terminam e vão para o JSONL
+                self.listing_error = e
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self._finish(future)
+                self._report()
+                if on_progress:
+                    on_progress(self.counts)
+        self._report(force=True)
+        return self.counts
+
+
+def progress(message):
+    """Progresso vai para stderr (stdout pode estar silenciado com --quiet)"""
+    print(message, file=sys.stderr, flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Exporta catálogo, players, temporadas e episódios em JSONL')
+    parser.add_argument('-o', '--output', default='export.jsonl')
+    parser.add_argument('--only', action='append', choices=CONTENT_TYPES,
+                        help='Só este tipo (pode repetir; padrão: todos)')
+    parser.add_argument('--since', type=date.fromisoformat, default=None,
+                        help='AAAA-MM-DD: só filmes a partir desse ano e episódios publicados desde a data')
+    parser.add_argument('--workers', type=int, default=4, help='Itens resolvidos em paralelo')
+    parser.add_argument('--rate', type=float, default=None, help='Teto de requisições/s por host')
+    parser.add_argument('--max-episodes', type=int, default=0, help='Episódios por temporada (0 = todos)')
+    parser.add_argument('--token', default=os.environ.get('TOKEN', 'HF2MXRZU'))
+    parser.add_argument('--index', default=SERIES_INDEX_PATH, help='SQLite de temporadas/episódios')
+    parser.add_argument('--restart', action='store_true', help='Ignora checkpoint e saída anteriores')
+    parser.add_argument('--quiet', action='store_true', help='Esconde o log do scraper, só o progresso')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    only = tuple(t for t in CONTENT_TYPES if t in (args.only or CONTENT_TYPES))
+    params = {'only': list(only), 'since': args.since.isoformat() if args.since else None,
+              'max_episodes': args.max_episodes}
+    checkpoint = Checkpoint(f"{args.output}.checkpoint.json", params)
+
+    previous = None if args.restart else checkpoint.load()
+    if previous and previous.get('params') != params:
+        progress(f"✗ {args.output} é de outra exportação ({previous.get('params')}); "
+                 f"use outro --output ou --restart")
+        return 2
+    if previous and previous.get('finished'):
+        progress(f"✓ Exportação em {args.output} já terminou; use --restart para refazer")
+        return 0
+    if not previous:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(args.output)
+        checkpoint.save(finished=False)
+
+    scraper = cnvsweb_scraper.CNVSWebScraper(args.token)
+    if args.rate:
+        # Site, player e os servidores de .mp4 (hosts que só aparecem nas URLs dos vídeos)
+        ratelimit.cap_all_rates(args.rate)
+
+    quiet = open(os.devnull, 'w') if args.quiet else None
+    exporter = None
+    finished = False
+    try:
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            if not scraper.ensure_login():
+                progress("✗ Falha no login. Verifique o token.")
+                return 1
+            exporter = Exporter(scraper, SeriesIndex(args.index), args.output, only,
+                                since=args.since, max_episodes=args.max_episodes)
+            last_save = [0.0]
+
+            def save_progress(counts):
+                if time.time() - last_save[0] >= 5:
+                    last_save[0] = time.time()
+                    checkpoint.save(finished=False, counts=dict(counts), done=len(exporter.done))
+
+            counts = exporter.run(max(1, args.workers), on_progress=save_progress)
+            finished = counts['failed'] == 0 and exporter.listing_error is None
+    finally:
+        if quiet:
+            quiet.close()
+        # Mesmo com erro no meio, o que já foi gravado conta para a próxima execução
+        if exporter is not None:
+            checkpoint.save(finished=finished, counts=dict(exporter.counts), done=len(exporter.done))
+
+    if exporter.listing_error is not None:
+        progress(f"✗ Listagem do catálogo falhou ({exporter.listing_error}); rode de novo para continuar")
+        return 1
+    if finished:
+        progress(f"✓ {len(exporter.done)} itens em {args.output}")
+        return 0
+    progress(f"⚠ {counts['failed']} itens falharam; rode de novo para tentar só eles")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+"""
+Configuração do gunicorn (lida automaticamente do diretório atual)
+
+O app é criado por main:create_app() sem efeitos colaterais; o login e as
+threads de background começam em cada worker, depois do fork. Assim
+--preload carrega o código uma vez no master sem logar nele.
+
+Worker gthread (start.sh): com o worker sync, um único assinante do SSE
+(/api/catalog/changes, que nunca termina) prendia o worker, bloqueava todas
+as outras rotas e era morto a cada --timeout. No gthread o timeout vale para
+o worker parar de responder, não para a duração de uma requisição. Threads
+(GUNICORN_THREADS) acima da soma das vagas e filas dos bulkheads mais os
+assinantes SSE esperados (padrão 128 >= 104 das classes fast/slow/batch).
+"""
+
+
+def post_worker_init(worker):
+    import main
+    main.start_background_services()
@@ -0,0 +1,143 @@
+"""
+Fila de jobs para os endpoints que podem passar do timeout do gunicorn
+
+O POST devolve um job_id na hora; o trabalho roda num pool limitado de
+threads e o cliente consulta GET /api/jobs/<id> para ver status, progresso
+(feitos/total) e os resultados parciais. Jobs terminados ficam guardados por
+JOB_TTL segundos, então consultas repetidas não custam nada.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 20))
+JOB_TTL = float(os.environ.get('JOB_TTL', 900))
+
+
+class Job:
+    def __init__(self, kind, params, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.status = 'queued'
+        self.done = 0
+        self.total = None
+        self.partial = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def report(self, done, total, item=None):
+        """Atualiza o progresso (e guarda o resultado parcial, se houver)"""
+        with self._lock:
+            self.done = done
+            self.total = total
+            if item is not None:
+                self.partial.append(item)
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'type': self.kind,
+                'params': self.params,
+                'status': self.status,
+                'progress': {'done': self.done, 'total': self.total},
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+            if self.status == 'done':
+                data['result'] = self.result
+            else:
+                data['partial_results'] = list(self.partial)
+            if self.error:
+                data['error'] = self.error
+            return data
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobManager:
+    """Registro de jobs + pool de threads limitado"""
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl=JOB_TTL):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._active_by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, params, func):
+        """
+        Agenda func(job, **params). Se já existe um job ativo idêntico, devolve ele.
+        Levanta JobQueueFull se houver jobs demais esperando/rodando.
+        """
+        key = (kind, tuple(sorted(params.items())))
+        with self._lock:
+            self._expire()
+            existing = self._active_by_key.get(key)
+            if existing is not None:
+                return existing
+            active = sum(1 for j in self._jobs.values() if not j.finished)
+            if active >= self.max_pending:
+                raise JobQueueFull(f'{active} jobs na fila')
+            job = Job(kind, params, key)
+            self._jobs[job.id] = job
+            self._active_by_key[key] = job
+        self._pool.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func):
+        with job._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            # Jobs são trabalho em lote: cliques interativos passam na frente no upstream
+            with scheduler.priority('batch'):
+                result = func(job, **job.params)
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job, 'failed', error=str(e))
+        else:
+            self._finish(job, 'done', result=result)
+
+    def _finish(self, job, status, result=None, error=None):
+        # Lock do manager (_expire lê status/finished_at) e do job (to_dict)
+        with self._lock, job._lock:
+            job.result = result
+            job.error = error
+            job.status = status
+            job.finished_at = time.time()
+            if self._active_by_key.get(job.key) is job:
+                del self._active_by_key[job.key]
+
+    def _expire(self):
+        """Remove jobs terminados há mais de ttl segundos (chamar com o lock)"""
+        now = time.time()
+        expired = [jid for jid, j in self._jobs.items()
+                   if j.finished and j.finished_at and now - j.finished_at > self.ttl]
+        for jid in expired:
+            del self._jobs[jid]
@@ -0,0 +1,32 @@
+"""
+Import adiado de módulos pesados
+
+`import main` não deve carregar requests/bs4/lxml: o processo sobe, responde
+/health e /ready e só paga esses imports quando o scraper é criado (na thread
+de inicialização) ou quando uma rota precisa deles. LazyModule é um stand-in
+do módulo que faz o import real no primeiro acesso a um atributo.
+
+    upstream = LazyModule('upstream')
+    ...
+    except upstream.UpstreamUnavailable as e:   # importa só aqui
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """Proxy de um módulo importado no primeiro getattr (import_module já é thread-safe)"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    @property
+    def loaded(self):
+        return self._name in sys.modules
+
+    def __repr__(self):
+        return f"<LazyModule {self._name!r} ({'carregado' if self.loaded else 'não carregado'})>"
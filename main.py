@@ -1,27 +1,80 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from cnvsweb_scraper import CNVSWebScraper, scrape_all_catalog
+from jobs import JobManager, JobQueueFull
+from records import Record
+from catalog_feed import ChangeFeed, CATALOG_REFRESH_SECONDS
+from bulkhead import BulkheadFull, bulkheads
+import bulkhead
+from lazy import LazyModule
+import catalog_feed
+import scheduler
+import timings
 import threading
 import time
 import os
 
+# requests/bs4/lxml só carregam no primeiro uso (import do app sem efeitos
+# colaterais e rápido; veja benchmarks/bench_import.py)
+cnvsweb_scraper = LazyModule('cnvsweb_scraper')
+upstream = LazyModule('upstream')
+transport = LazyModule('transport')
+
+class JSONProvider(DefaultJSONProvider):
+    """Serializa os registros compactos (records.py) como os dicts de antes"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = JSONProvider(app)
 CORS(app)
 
 # Token de acesso (pode vir de variável de ambiente)
 TOKEN = os.environ.get('TOKEN', 'HF2MXRZU')
 
+# Inclui o bloco "_timings" no JSON de todas as respostas (o header
+# Server-Timing é sempre enviado). Também pode ser pedido por requisição
+# com ?debug_timings=1
+DEBUG_TIMINGS = os.environ.get('DEBUG_TIMINGS', '').lower() in ('1', 'true')
+
 # Inicializa o scraper globalmente
 scraper = None
 scraper_ready = False
+# Mais Visto do Dia com resoluções em cache (criado junto com o scraper)
+most_watched_tracker = None
+# Listagens e resoluções da busca em cache (veja search_cache.py)
+search_cache = None
+
+# Jobs em background para os endpoints lentos (veja /api/jobs)
+job_manager = JobManager()
+
+# Temporadas/episódios já raspados (SQLite; veja series_index.py). Aberto
+# junto com o scraper, depois do fork do gunicorn
+series_index = None
+
+# Diffs do catálogo publicados pelo refresher (veja /api/catalog/changes)
+change_feed = ChangeFeed()
+# Índice de prefixos do /api/suggest; trocado inteiro a cada refresh do catálogo
+suggest_index = None
 
 def initialize_scraper():
     """Inicializa o scraper em background"""
-    global scraper, scraper_ready
+    global scraper, scraper_ready, most_watched_tracker, series_index, search_cache
     try:
+        from most_watched import MostWatchedTracker
+        from search_cache import SearchCache
+        from series_index import SeriesIndex
         print("🚀 Inicializando scraper...")
-        scraper = CNVSWebScraper(TOKEN)
-        if scraper.login():
+        series_index = SeriesIndex()
+        scraper = cnvsweb_scraper.CNVSWebScraper(TOKEN)
+        most_watched_tracker = MostWatchedTracker(scraper)
+        search_cache = SearchCache(scraper)
+        # Sessão salva (SESSION_FILE) ainda válida dispensa o login completo
+        if scraper.ensure_login():
             scraper_ready = True
             print("✓ Scraper inicializado com sucesso")
         else:
@@ -31,6 +84,15 @@ def initialize_scraper():
         import traceback
         traceback.print_exc()
 
+def prewarm_connections():
+    """Abre as conexões com o site e o player antes do login e do primeiro refresh"""
+    try:
+        opened = transport.prewarm([cnvsweb_scraper.site_mirrors.current().base_url,
+                                    cnvsweb_scraper.player_mirrors.current().base_url])
+        print(f"🔌 {opened} conexões pré-aquecidas")
+    except Exception as e:
+        print(f"Erro no prewarm das conexões: {e}")
+
 # Thread para manter a sessão ativa
 def keep_session_alive():
     """Mantém a sessão ativa a cada 3 minutos"""
@@ -42,21 +104,151 @@ def keep_session_alive():
         except Exception as e:
             print(f"Erro no keep-alive: {e}")
 
-# Inicia o scraper em background
-init_thread = threading.Thread(target=initialize_scraper, daemon=True)
-init_thread.start()
+# Thread que re-scrapeia o catálogo e publica as mudanças
+def refresh_catalog():
+    """Atualiza o snapshot do catálogo (e o índice do /api/suggest) a cada CATALOG_REFRESH_SECONDS"""
+    global suggest_index
+    from suggest import SuggestIndex
+    while True:
+        try:
+            # strict: se /movies, /tvseries ou /animes falhar, não publica nada neste ciclo
+            # (um [] viraria "todos removidos" agora e "todos adicionados" no próximo)
+            items = cnvsweb_scraper.scrape_all_catalog(content_type='all', strict=True)
+            most_watched = None
+            if scraper and scraper_ready:
+                # [] é falha ao ler a home: None mantém o ranking anterior
+                most_watched = scraper.get_most_watched_today(get_video_urls=False, organize_output=False) or None
+            event = change_feed.update(items, most_watched)
+            # Montado fora e publicado numa atribuição: consultas veem o índice velho ou o novo
+            suggest_index = SuggestIndex(items, change_feed.ranks)
+            if event:
+                print(f"🔄 Catálogo mudou: +{len(event['added'])} -{len(event['removed'])} "
+                      f"~{len(event['moved'])} seção, {len(event['most_watched'])} no ranking")
+        except Exception as e:
+            print(f"Erro ao atualizar catálogo: {e}")
+        time.sleep(CATALOG_REFRESH_SECONDS)
+
+# Login, keep-alive e refresher rodam em threads iniciadas uma vez por
+# processo: nunca no import (nem no master do gunicorn com --preload), e sim
+# no worker (gunicorn.conf.py), no __main__ ou, em último caso, na primeira
+# requisição. Até o login terminar as rotas respondem "inicializando" e
+# /ready devolve 503.
+_services_lock = threading.Lock()
+_services_pid = None
+
+def start_background_services():
+    """Inicia as threads de background neste processo (idempotente; refaz após um fork)"""
+    global _services_pid
+    with _services_lock:
+        if _services_pid == os.getpid():
+            return False
+        _services_pid = os.getpid()
+    # Login passa na frente; refresh e keep-alive usam o upstream com o que sobrar (scheduler.py)
+    services = ((prewarm_connections, 'background'), (initialize_scraper, 'interactive'),
+                (keep_session_alive, 'background'), (refresh_catalog, 'background'))
+    for target, priority in services:
+        threading.Thread(target=scheduler.bound(target, priority), name=target.__name__, daemon=True).start()
+    return True
+
+def create_app():
+    """Factory do app (gunicorn 'main:create_app()'); não inicia nada sozinha"""
+    return app
 
-# Aguarda até 15 segundos para o scraper estar pronto
-print("⏳ Aguardando scraper ficar pronto...")
-for i in range(15):
-    if scraper_ready:
-        print(f"✓ Scraper pronto após {i+1} segundos")
-        break
-    time.sleep(1)
+@app.before_request
+def ensure_background_services():
+    start_background_services()
 
-# Inicia thread de keep-alive
-keep_alive_thread = threading.Thread(target=keep_session_alive, daemon=True)
-keep_alive_thread.start()
+@app.before_request
+def start_timings():
+    timings.start_request()
+
+# Classe de bulkhead de cada rota (veja bulkhead.py). /health, /ready e o
+# stream SSE ficam de fora: probes nunca são recusados e o SSE dura horas.
+ENDPOINT_CLASSES = {
+    'home': 'fast',
+    'catalog': 'fast',
+    'suggest': 'fast',
+    'search_fast': 'fast',
+    'submit_job': 'fast',
+    'get_job': 'fast',
+    'search': 'slow',
+    'get_video_url': 'slow',
+    'get_season_episodes': 'slow',
+    'most_watched': 'batch',
+    'get_series_episodes_with_videos': 'batch',
+}
+# Prioridade das requisições ao upstream feitas pela rota (scheduler.py); o resto é interactive
+BULKHEAD_PRIORITIES = {'batch': 'batch'}
+
+@app.before_request
+def enter_bulkhead():
+    """Ocupa uma vaga da classe da rota; classe e fila cheias -> 429"""
+    name = ENDPOINT_CLASSES.get(request.endpoint)
+    if name is None:
+        return None
+    try:
+        with timings.stage('bulkhead_wait'):
+            admitted = bulkheads[name].acquire()
+    except BulkheadFull as e:
+        response = jsonify({
+            'success': False,
+            'error': f'Muitas requisições {e.name} em andamento. Tente novamente em {e.retry_after} segundos.',
+            'bulkhead': e.name
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    g.bulkhead = (bulkheads[name], admitted)
+    g.priority_token = scheduler.set_priority(BULKHEAD_PRIORITIES.get(name, scheduler.DEFAULT_PRIORITY))
+    return None
+
+@app.teardown_request
+def leave_bulkhead(exc):
+    token = g.pop('priority_token', None)
+    if token is not None:
+        scheduler.reset_priority(token)
+    held = g.pop('bulkhead', None)
+    if held is not None:
+        held[0].release(held[1])
+
+@app.after_request
+def add_server_timing(response):
+    """Anexa o header Server-Timing e, em modo debug, o bloco _timings"""
+    stages, total_ms = timings.stop_request()
+    response.headers['Server-Timing'] = timings.server_timing_header(stages, total_ms)
+
+    wants_debug = DEBUG_TIMINGS or request.args.get('debug_timings') in ('1', 'true')
+    if wants_debug and response.is_json and not response.is_streamed:
+        payload = response.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload['_timings'] = {
+                'total_ms': round(total_ms, 2),
+                'stages': timings.summarize(stages)
+            }
+            response.set_data(app.json.dumps(payload))
+    return response
+
+def upstream_unavailable(e):
+    """Resposta 503 quando o host está com breaker aberto ou fila do rate limiter cheia"""
+    response = jsonify({
+        'success': False,
+        'error': f'Servidor {e.host} indisponível no momento. Tente novamente em {e.retry_after} segundos.',
+        'upstream_host': e.host
+    })
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def negative_result_response(miss, **fields):
+    """404 de um resultado negativo em cache (negative_cache.py), com Retry-After até expirar"""
+    retry_after = miss.retry_after()
+    response = jsonify({
+        'success': False,
+        'error': miss.message,
+        'reason': miss.reason,
+        'retry_after': retry_after,
+        **fields
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 404
 
 @app.route('/')
 def home():
@@ -107,6 +299,16 @@ def home():
                 },
                 'example': '/api/search-fast?q=batman&limit=10'
             },
+            'suggest': {
+                'url': '/api/suggest?q=prefixo',
+                'method': 'GET',
+                'description': '⚡ Autocomplete pelo catálogo em memória (sem acessar o site)',
+                'params': {
+                    'q': 'Obrigatório - Começo de uma palavra do título',
+                    'limit': 'Opcional - Número máximo de sugestões (padrão: 10)'
+                },
+                'example': '/api/suggest?q=vinga'
+            },
             'video_url': {
                 'url': '/api/video-url',
                 'method': 'POST',
@@ -123,9 +325,20 @@ def home():
                 'body': {
                     'watch_link': 'Watch link da série (ex: /watch/breaking-bad)',
                     'max_episodes': 'Opcional - Máximo de episódios a processar (0 = todos)',
-                    'get_video_urls': 'Opcional - Se deve buscar URLs de vídeo (padrão: true)'
+                    'get_video_urls': 'Opcional - Se deve buscar URLs de vídeo (padrão: true)',
+                    'refresh': 'Opcional - Ignora o índice local e busca de novo no site'
                 },
                 'example': 'POST com {"watch_link": "https://cnvsweb.stream/watch/breaking-bad", "max_episodes": 10}'
+            },
+            'jobs': {
+                'url': '/api/jobs',
+                'method': 'POST',
+                'description': '⏳ Roda most-watched ou season-episodes em background; consulte GET /api/jobs/<job_id>',
+                'body': {
+                    'type': 'most-watched | season-episodes',
+                    'watch_link / season_id': 'Obrigatórios para season-episodes'
+                },
+                'example': 'POST com {"type": "season-episodes", "watch_link": "/watch/grey-s-anatomy", "season_id": "7830"}'
             }
         },
         'notes': [
@@ -143,11 +356,65 @@ def health():
     return jsonify({
         'status': 'healthy' if scraper_ready else 'initializing',
         'scraper_ready': scraper_ready,
+        'session_restored': scraper.session_restored if scraper else None,
+        'upstream': upstream.stats() if upstream.loaded else None,
+        'transport': transport.stats() if transport.loaded else None,
+        'catalog_feed': change_feed.stats(),
+        'mp4_stream': dict(scraper.mp4_stream_stats) if scraper else None,
+        'negative_cache': scraper.negative_cache.stats() if scraper else None,
+        'player_strategies': cnvsweb_scraper.player_strategy_stats.snapshot() if cnvsweb_scraper.loaded else None,
+        'most_watched': most_watched_tracker.stats() if most_watched_tracker else None,
+        'series_index': series_index.stats() if series_index else None,
+        'search_cache': search_cache.stats() if search_cache else None,
+        'suggest': suggest_index.stats() if suggest_index else None,
+        'bulkheads': bulkhead.stats(),
         'timestamp': time.time()
     })
 
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 só depois do login (para o balanceador/autoscaler)"""
+    if not scraper_ready:
+        response = jsonify({'ready': False, 'status': 'initializing'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    return jsonify({'ready': True, 'status': 'ready'})
+
 # ========== ENDPOINTS ANTIGOS (mantidos para compatibilidade) ==========
 
+def most_watched_payload(result, limit=None):
+    """Monta o JSON do /api/most-watched (organizado ou lista simples)"""
+    # Se retornou dados organizados
+    if isinstance(result, dict) and 'movies' in result:
+        movies = result['movies']
+        series = result['series']
+        
+        # Aplica limite se especificado
+        if limit and limit > 0:
+            movies = movies[:limit]
+            series = series[:limit]
+        
+        return {
+            'success': True,
+            'summary': {
+                'total': result['summary']['total'],
+                'movies': len(movies),
+                'series': len(series)
+            },
+            'movies': movies,
+            'series': series
+        }
+    
+    # Formato antigo (lista simples)
+    if limit and limit > 0:
+        result = result[:limit]
+    
+    return {
+        'success': True,
+        'count': len(result),
+        'data': result
+    }
+
 @app.route('/api/most-watched')
 def most_watched():
     """Retorna os filmes/séries mais assistidos do dia COM URLs de vídeo - ORGANIZADO"""
@@ -166,42 +433,15 @@ def most_watched():
         print("Extraindo filmes mais assistidos do dia...")
         print("="*50 + "\n")
         
-        result = scraper.get_most_watched_today(
-            get_video_urls=True,
+        # Só resolve os itens novos ou com video_url perto de expirar
+        result = most_watched_tracker.get(
             max_episodes_per_series=max_episodes,
             organize_output=organize
         )
         
-        # Se retornou dados organizados
-        if isinstance(result, dict) and 'movies' in result:
-            movies = result['movies']
-            series = result['series']
-            
-            # Aplica limite se especificado
-            if limit and limit > 0:
-                movies = movies[:limit]
-                series = series[:limit]
-            
-            return jsonify({
-                'success': True,
-                'summary': {
-                    'total': result['summary']['total'],
-                    'movies': len(movies),
-                    'series': len(series)
-                },
-                'movies': movies,
-                'series': series
-            })
-        else:
-            # Formato antigo (lista simples)
-            if limit and limit > 0:
-                result = result[:limit]
-            
-            return jsonify({
-                'success': True,
-                'count': len(result),
-                'data': result
-            })
+        return jsonify(most_watched_payload(result, limit))
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/most-watched: {e}")
         import traceback
@@ -237,12 +477,13 @@ def search():
         print(f"Buscando: {query}")
         print("="*50 + "\n")
         
-        result = scraper.search_movies(
-            query,
-            get_video_urls=True,
-            max_episodes_per_series=max_episodes,
-            organize_output=organize
-        )
+        with timings.stage('cache_search'):
+            result = search_cache.search(
+                query,
+                get_video_urls=True,
+                max_episodes_per_series=max_episodes,
+                organize_output=organize
+            )
         
         # Se retornou dados organizados
         if isinstance(result, dict) and 'movies' in result:
@@ -276,6 +517,8 @@ def search():
                 'count': len(result),
                 'data': result
             })
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/search: {e}")
         import traceback
@@ -307,12 +550,13 @@ def search_fast():
     
     try:
         print(f"\nBusca rápida: {query}")
-        result = scraper.search_movies(
-            query,
-            get_video_urls=False,  # RÁPIDO!
-            max_episodes_per_series=0,
-            organize_output=organize
-        )
+        with timings.stage('cache_search'):
+            result = search_cache.search(
+                query,
+                get_video_urls=False,  # RÁPIDO!
+                max_episodes_per_series=0,
+                organize_output=organize
+            )
         
         # Se retornou dados organizados
         if isinstance(result, dict) and 'movies' in result:
@@ -346,6 +590,8 @@ def search_fast():
                 'count': len(result),
                 'data': result
             })
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/search-fast: {e}")
         import traceback
@@ -355,6 +601,28 @@ def search_fast():
             'error': str(e)
         }), 500
 
+@app.route('/api/suggest')
+def suggest():
+    """Autocomplete: títulos do catálogo cujas palavras começam com q (só memória)"""
+    index = suggest_index
+    if index is None:
+        response = jsonify({
+            'success': False,
+            'error': 'Índice de sugestões ainda está sendo montado. Tente novamente em alguns segundos.'
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), 50)
+    suggestions = index.suggest(query, limit)
+    return jsonify({
+        'success': True,
+        'query': query,
+        'count': len(suggestions),
+        'data': suggestions
+    })
+
 # ========== NOVOS ENDPOINTS OTIMIZADOS ==========
 
 @app.route('/api/catalog')
@@ -380,7 +648,7 @@ def catalog():
 
         print("\n Carregando catalogo: type=" + content_type + " limit=" + str(limit))
 
-        items = scrape_all_catalog(content_type=content_type, limit=limit)
+        items = cnvsweb_scraper.scrape_all_catalog(content_type=content_type, limit=limit)
 
         movies = [i for i in items if i.get('type') == 'movie']
         series = [i for i in items if i.get('type') == 'series']
@@ -401,6 +669,8 @@ def catalog():
             'items': items
         })
 
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print("Erro em /api/catalog: " + str(e))
         import traceback
@@ -410,6 +680,25 @@ def catalog():
             'error': str(e)
         }), 500
 
+@app.route('/api/catalog/changes')
+def catalog_changes():
+    """
+    Stream SSE com os diffs do catálogo a cada atualização do refresher:
+    added (itens completos), removed, moved (troca de seção) e most_watched
+    (mudanças de posição). Reconexões com Last-Event-ID recebem os eventos perdidos.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = Response(stream_with_context(catalog_feed.stream(change_feed, last_event_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 
 @app.route('/api/video-url', methods=['POST'])
 def get_video_url():
@@ -444,11 +733,19 @@ def get_video_url():
         watch_link = watch_link[:-1]
     
     try:
+        # Título que acabou de falhar: 404 direto, sem refazer o scrape
+        miss = scraper.negative_result(watch_link)
+        if miss is not None:
+            print(f"\n⏭ {watch_link}: {miss.reason} em cache")
+            return negative_result_response(miss, watch_link=watch_link)
+
         print(f"\n🎥 Buscando vídeo para: {watch_link}")
         
         # CORREÇÃO: se já é um link de player direto (playcnvs.stream/s/...)
         # pula o get_player_url e vai direto para get_video_mp4_url
         is_direct_player = (
+            watch_link.startswith(scraper.player_base_url) or
+            cnvsweb_scraper.player_mirrors.owns(watch_link) or
             'playcnvs.stream' in watch_link or
             'playmycnvs' in watch_link or
             ('/s/' in watch_link and 'cnvsweb' not in watch_link)
@@ -464,6 +761,9 @@ def get_video_url():
             
             if not player_url:
                 print("✗ Não foi possível encontrar o player")
+                miss = scraper.negative_result(watch_link)
+                if miss is not None:
+                    return negative_result_response(miss, watch_link=watch_link)
                 return jsonify({
                     'success': False,
                     'error': 'Botão ASSISTIR ou player não encontrado na página'
@@ -485,12 +785,19 @@ def get_video_url():
             })
         else:
             print("✗ Não foi possível extrair URL do vídeo")
+            miss = scraper.negative_result(player_url)
+            if miss is not None:
+                # O título também: o próximo pedido nem abre a página do filme
+                scraper.negative_cache.record(scraper.negative_key(watch_link), miss.reason)
+                return negative_result_response(miss, player_url=player_url, watch_link=watch_link)
             return jsonify({
                 'success': False,
                 'error': 'URL do vídeo não encontrada no player',
                 'player_url': player_url
             }), 404
             
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/video-url: {e}")
         import traceback
@@ -532,13 +839,15 @@ def get_series_episodes_with_videos():
     watch_link = data['watch_link']
     max_episodes = data.get('max_episodes', 0)  # 0 = todos
     get_video_urls = data.get('get_video_urls', True)
+    refresh = bool(data.get('refresh', False))
     
     try:
         print(f"\n📺 Buscando episódios para: {watch_link}")
         
-        # ETAPA 1: Extrai lista de episódios
+        # ETAPA 1: Extrai lista de episódios (do índice local, se ainda estiver fresco)
         print("📍 ETAPA 1: Extraindo lista de episódios...")
-        seasons = scraper.get_series_episodes(watch_link)
+        with timings.stage('cache_series_index'):
+            seasons, from_index = series_index.seasons(scraper, watch_link, refresh=refresh)
 
         if not seasons:
             print("✗ Nenhuma temporada encontrada")
@@ -554,9 +863,12 @@ def get_series_episodes_with_videos():
             'watch_link': watch_link,
             'total_seasons': len(seasons),
             'seasons': seasons,
+            'from_index': from_index,
             'note': 'Use /api/season-episodes com o season_id para buscar os episódios de cada temporada'
         })
         
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/series-episodes: {e}")
         import traceback
@@ -567,6 +879,27 @@ def get_series_episodes_with_videos():
         }), 500
 
 
+def resolve_episode_videos(episodes, progress=None):
+    """Preenche video_url de cada episódio (progress(feitos, total, episódio) opcional)"""
+    print(f"📍 Buscando URLs de vídeo para {len(episodes)} episódios...")
+    for idx, episode in enumerate(episodes, 1):
+        try:
+            ep_player_url = episode.get('player_url')
+            if not ep_player_url:
+                continue
+            if ep_player_url.endswith('>'):
+                ep_player_url = ep_player_url[:-1]
+                episode['player_url'] = ep_player_url
+            video_url = scraper.get_video_mp4_url(ep_player_url)
+            if video_url:
+                episode['video_url'] = video_url
+        except Exception as e:
+            print(f"  Erro no episódio {idx}: {e}")
+            continue
+        finally:
+            if progress:
+                progress(idx, len(episodes), episode)
+
 @app.route('/api/season-episodes', methods=['POST'])
 def get_season_episodes():
     """
@@ -591,48 +924,140 @@ def get_season_episodes():
     watch_link = data['watch_link']
     season_id = str(data['season_id'])
     get_video_urls = data.get('get_video_urls', False)
+    refresh = bool(data.get('refresh', False))
 
     try:
         print(f"\n📺 Buscando episódios da temporada {season_id} de: {watch_link}")
 
-        episodes = scraper.get_season_episodes(watch_link, season_id)
+        with timings.stage('cache_series_index'):
+            episodes, from_index = series_index.season_episodes(scraper, watch_link, season_id, refresh=refresh)
 
         if not episodes:
             return jsonify({'success': False, 'error': 'Nenhum episódio encontrado para esta temporada'}), 404
 
         if get_video_urls:
-            print(f"📍 Buscando URLs de vídeo para {len(episodes)} episódios...")
-            for idx, episode in enumerate(episodes, 1):
-                try:
-                    ep_player_url = episode.get('player_url')
-                    if not ep_player_url:
-                        continue
-                    if ep_player_url.endswith('>'):
-                        ep_player_url = ep_player_url[:-1]
-                        episode['player_url'] = ep_player_url
-                    video_url = scraper.get_video_mp4_url(ep_player_url)
-                    if video_url:
-                        episode['video_url'] = video_url
-                    if idx < len(episodes):
-                        time.sleep(0.5)
-                except Exception as e:
-                    print(f"  Erro no episódio {idx}: {e}")
-                    continue
+            resolve_episode_videos(episodes)
 
         return jsonify({
             'success': True,
             'watch_link': watch_link,
             'season_id': season_id,
             'total_episodes': len(episodes),
-            'episodes': episodes
+            'episodes': episodes,
+            'from_index': from_index
         })
 
+    except upstream.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
     except Exception as e:
         print(f"Erro em /api/season-episodes: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ========== JOBS EM BACKGROUND ==========
+
+def run_most_watched_job(job, max_episodes=5, organize=True, limit=None):
+    result = most_watched_tracker.get(
+        max_episodes_per_series=max_episodes,
+        organize_output=organize,
+        progress=job.report
+    )
+    return most_watched_payload(result, limit)
+
+def run_season_episodes_job(job, watch_link, season_id):
+    episodes, _ = series_index.season_episodes(scraper, watch_link, season_id)
+    if not episodes:
+        raise ValueError('Nenhum episódio encontrado para esta temporada')
+    job.report(0, len(episodes))
+    resolve_episode_videos(episodes, progress=job.report)
+    return {
+        'success': True,
+        'watch_link': watch_link,
+        'season_id': season_id,
+        'total_episodes': len(episodes),
+        'episodes': episodes
+    }
+
+JOB_TYPES = {
+    'most-watched': run_most_watched_job,
+    'season-episodes': run_season_episodes_job,
+}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    ⏳ Agenda um job longo e retorna o job_id na hora (202)
+    
+    Body JSON:
+    - type: "most-watched" ou "season-episodes"
+    - most-watched: max_episodes, organize, limit (opcionais)
+    - season-episodes: watch_link e season_id (obrigatórios); resolve sempre as URLs de vídeo
+    """
+    if not scraper_ready:
+        return jsonify({'success': False, 'error': 'Scraper não está pronto.'}), 503
+
+    data = request.get_json(silent=True) or {}
+    job_type = data.get('type')
+    if job_type not in JOB_TYPES:
+        return jsonify({
+            'success': False,
+            'error': 'Campo "type" deve ser um de: ' + ', '.join(JOB_TYPES),
+            'example': '{"type": "season-episodes", "watch_link": "/watch/grey-s-anatomy", "season_id": "7830"}'
+        }), 400
+
+    if job_type == 'most-watched':
+        try:
+            max_episodes = int(data.get('max_episodes', 5))
+            limit = int(data['limit']) if data.get('limit') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'Campos "max_episodes" e "limit" devem ser números inteiros'
+            }), 400
+        # Só booleano de verdade ou "true"/"false" (bool("false") seria True)
+        organize = data.get('organize', True)
+        if isinstance(organize, str) and organize.lower() in ('true', 'false'):
+            organize = organize.lower() == 'true'
+        if not isinstance(organize, bool):
+            return jsonify({'success': False, 'error': 'Campo "organize" deve ser true ou false'}), 400
+        params = {
+            'max_episodes': max_episodes,
+            'organize': organize,
+            'limit': limit
+        }
+    else:
+        watch_link, season_id = data.get('watch_link'), data.get('season_id')
+        if (not isinstance(watch_link, str) or not watch_link.strip()
+                or isinstance(season_id, bool) or not isinstance(season_id, (str, int)) or season_id == ''):
+            return jsonify({
+                'success': False,
+                'error': 'Campos "watch_link" (texto) e "season_id" (texto ou número) são obrigatórios'
+            }), 400
+        params = {'watch_link': data['watch_link'], 'season_id': str(data['season_id'])}
+
+    try:
+        job = job_manager.submit(job_type, params, JOB_TYPES[job_type])
+    except JobQueueFull as e:
+        response = jsonify({'success': False, 'error': f'Fila de jobs cheia ({e}). Tente mais tarde.'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'poll_url': f'/api/jobs/{job.id}'
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Status, progresso e resultados (parciais ou finais) de um job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
 # Tratamento de erros 404
 @app.errorhandler(404)
 def not_found(e):
@@ -642,17 +1067,23 @@ def not_found(e):
         'available_endpoints': [
             '/',
             '/health',
+            '/ready',
             '/api/most-watched',
             '/api/catalog (RÁPIDO)',
+            '/api/catalog/changes (SSE)',
             '/api/search?q=query',
             '/api/search-fast?q=query (RÁPIDO)',
+            '/api/suggest?q=prefixo (RÁPIDO)',
             '/api/video-url (POST - Filmes)',
-            '/api/series-episodes (POST - Séries)'
+            '/api/series-episodes (POST - Séries)',
+            '/api/season-episodes (POST)',
+            '/api/jobs (POST) e /api/jobs/<id>'
         ]
     }), 404
 
 if __name__ == '__main__':
     # Porta configurável para deploy
     port = int(os.environ.get('PORT', 5000))
+    start_background_services()
     print(f"🚀 Servidor rodando em http://0.0.0.0:{port}")
     app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
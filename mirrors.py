@@ -0,0 +1,245 @@
+"""
+Mirrors do site e do player com failover por latência
+
+Cada papel (site, player) tem uma lista de URLs base equivalentes; a primeira
+é a canônica. upstream.request() reescreve toda URL de um mirror para o mirror
+escolhido no momento, então o resto do código continua montando links com a
+URL canônica e os links extraídos das páginas são normalizados de volta para
+ela (canonical()), mantendo índice, caches e JSON estáveis.
+
+Escolha do mirror:
+  - uma thread mede a latência de cada mirror a cada MIRROR_PROBE_SECONDS com
+    um GET leve em probe_path (mesma requisição em todos, comparável);
+  - falha de conexão, timeout ou 5xx no tráfego real conta contra o mirror;
+    MIRROR_FAILURES seguidas o tiram de rotação até um probe passar;
+  - o mirror atual só é trocado se cair ou se outro for MIRROR_SWITCH_MARGIN
+    mais rápido (evita ficar alternando por ruído).
+Com um único mirror por papel nada muda.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+MIRROR_PROBE_SECONDS = float(os.environ.get('MIRROR_PROBE_SECONDS', 30))
+MIRROR_PROBE_TIMEOUT = float(os.environ.get('MIRROR_PROBE_TIMEOUT', 3))
+MIRROR_FAILURES = int(os.environ.get('MIRROR_FAILURES', 2))
+# Outro mirror precisa ser 30% mais rápido (e pelo menos 20ms) para tomar o lugar do atual
+MIRROR_SWITCH_MARGIN = float(os.environ.get('MIRROR_SWITCH_MARGIN', 0.3))
+MIRROR_SWITCH_MIN_MS = float(os.environ.get('MIRROR_SWITCH_MIN_MS', 20))
+# Peso da nova amostra na média móvel da latência do probe
+_EWMA_ALPHA = 0.3
+
+
+def parse_list(value):
+    """'https://a.com, https://b.com/' -> ['https://a.com', 'https://b.com']"""
+    return [url.strip().rstrip('/') for url in (value or '').split(',') if url.strip()]
+
+
+class Mirror:
+    __slots__ = ('base_url', 'origin', 'latency', 'failures', 'healthy', 'probed_at', 'requests')
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        parts = urlsplit(base_url)
+        self.origin = (parts.scheme, parts.netloc)
+        self.latency = None
+        self.failures = 0
+        self.healthy = True
+        self.probed_at = None
+        self.requests = 0
+
+    def snapshot(self):
+        return {
+            'healthy': self.healthy,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'consecutive_failures': self.failures,
+            'requests': self.requests,
+        }
+
+
+class MirrorPool:
+    """Mirrors de um papel; current() é o mirror que recebe o tráfego agora"""
+
+    def __init__(self, role, base_urls, probe_path='/'):
+        self.role = role
+        self.mirrors = [Mirror(url) for url in dict.fromkeys(base_urls)]
+        self.probe_path = probe_path
+        self.switches = 0
+        self._current = self.mirrors[0]
+        self._by_netloc = {m.origin[1]: m for m in self.mirrors}
+        self._lock = threading.Lock()
+        self._prober = None
+
+    @property
+    def canonical_url(self):
+        return self.mirrors[0].base_url
+
+    def owns(self, url):
+        return urlsplit(url).netloc in self._by_netloc
+
+    def current(self):
+        with self._lock:
+            return self._current
+
+    def _pick(self):
+        """Reavalia o mirror atual (chamado com o lock)"""
+        current = self._current
+        healthy = [m for m in self.mirrors if m.healthy]
+        if not healthy:
+            return
+        if not current.healthy:
+            # Sem medição, vale a ordem da lista
+            best = min(healthy, key=lambda m: (m.latency is None, m.latency or 0, self.mirrors.index(m)))
+        else:
+            measured = [m for m in healthy if m.latency is not None]
+            if current.latency is None or not measured:
+                return
+            best = min(measured, key=lambda m: m.latency)
+            gain = current.latency - best.latency
+            if gain < current.latency * MIRROR_SWITCH_MARGIN or gain * 1000 < MIRROR_SWITCH_MIN_MS:
+                return
+        if best is not current:
+            self._current = best
+            self.switches += 1
+            print(f"🔀 Mirror {self.role}: {current.base_url} -> {best.base_url}")
+
+    def candidates(self):
+        """Mirrors para tentar, do atual para os demais saudáveis (e os fora do ar por último)"""
+        with self._lock:
+            current = self._current
+            others = sorted((m for m in self.mirrors if m is not current),
+                            key=lambda m: (not m.healthy, m.latency is None, m.latency or 0))
+        return [current] + others
+
+    def rewrite(self, url, mirror):
+        """Troca esquema e host de uma URL deste pool pelos do mirror"""
+        parts = urlsplit(url)
+        return urlunsplit(mirror.origin + tuple(parts[2:]))
+
+    def share_cookies(self, jar, mirror):
+        """
+        Copia os cookies de sessão de outro mirror para o host do mirror, se
+        ele ainda não tem nenhum (mirrors do mesmo site dividem a sessão)
+        """
+        if not jar:
+            return
+        host = urlsplit(mirror.base_url).hostname
+        domains = {urlsplit(m.base_url).hostname for m in self.mirrors}
+        cookies = [c for c in jar if c.domain.lstrip('.') in domains]
+        if not cookies or any(c.domain.lstrip('.') == host for c in cookies):
+            return
+        for c in cookies:
+            jar.set(c.name, c.value, domain=host, path=c.path, expires=c.expires, secure=c.secure)
+
+    def canonical(self, url):
+        """Link extraído de qualquer mirror -> mesmo link na URL canônica"""
+        if not url or not self.owns(url):
+            return url
+        return self.rewrite(url, self.mirrors[0])
+
+    # ---------- saúde ----------
+
+    def record(self, netloc, ok):
+        """Resultado de uma requisição real a um mirror"""
+        with self._lock:
+            mirror = self._by_netloc.get(netloc)
+            if mirror is None:
+                return
+            mirror.requests += 1
+            if ok:
+                mirror.failures = 0
+                return
+            mirror.failures += 1
+            if mirror.failures >= MIRROR_FAILURES and mirror.healthy:
+                mirror.healthy = False
+                print(f"⚠ Mirror {self.role} fora de rotação: {mirror.base_url}")
+                self._pick()
+
+    def probe(self, session=None):
+        """Mede todos os mirrors uma vez e reavalia o atual"""
+        import requests
+        session = session or requests
+        for mirror in self.mirrors:
+            started = time.monotonic()
+            try:
+                with session.get(mirror.base_url + self.probe_path, timeout=MIRROR_PROBE_TIMEOUT,
+                                 stream=True, allow_redirects=False) as response:
+                    ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.monotonic() - started
+            with self._lock:
+                mirror.probed_at = time.time()
+                if ok:
+                    mirror.latency = elapsed if mirror.latency is None else (
+                        _EWMA_ALPHA * elapsed + (1 - _EWMA_ALPHA) * mirror.latency)
+                    mirror.failures = 0
+                    mirror.healthy = True
+                else:
+                    mirror.healthy = False
+        with self._lock:
+            self._pick()
+
+    def start(self):
+        """Thread de probes (só quando há mais de um mirror)"""
+        if len(self.mirrors) < 2:
+            return
+        with self._lock:
+            if self._prober is not None:
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name=f'mirrors-{self.role}', daemon=True)
+        self._prober.start()
+
+    def _probe_loop(self):
+        # Probes nos pools compartilhados: já deixam conexões abertas com cada mirror
+        import transport
+        session = transport.shared_session()
+        while True:
+            try:
+                self.probe(session)
+            except Exception as e:
+                print(f"Erro no probe dos mirrors {self.role}: {e}")
+            time.sleep(MIRROR_PROBE_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'current': self._current.base_url,
+                'switches': self.switches,
+                'mirrors': {m.base_url: m.snapshot() for m in self.mirrors},
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def register(role, base_urls, probe_path='/'):
+    """Cria (ou substitui) o pool de um papel; a primeira URL é a canônica"""
+    pool = MirrorPool(role, base_urls, probe_path)
+    with _pools_lock:
+        _pools[role] = pool
+    return pool
+
+
+def pool_for(url):
+    """Pool que contém o host da URL (None se não for de nenhum mirror)"""
+    netloc = urlsplit(url).netloc
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        if netloc in pool._by_netloc:
+            return pool
+    return None
+
+
+def canonical(url):
+    pool = pool_for(url) if url else None
+    return pool.canonical(url) if pool else url
+
+
+def stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {role: pool.stats() for role, pool in pools.items() if len(pool.mirrors) > 1}
@@ -0,0 +1,153 @@
+"""
+Mais Visto do Dia incremental
+
+A linha "Mais Visto do Dia" da home muda poucas vezes por dia, mas o
+get_most_watched_today(get_video_urls=True) resolve player e .mp4 de todos
+os itens a cada chamada. O MostWatchedTracker guarda a última resolução de
+cada item (chave: watch_link) e, a cada refresh, baixa só a home e resolve
+apenas os itens novos ou cujo video_url está perto de expirar. O resultado é
+a linha atual (ordem, título, imagem) com as resoluções do cache. Se a
+home falhar (ou vier sem a linha), valem a última linha e o cache anteriores.
+"""
+import os
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+from cnvsweb_scraper import organize_listing
+
+# Validade assumida de um video_url sem expiração explícita na URL
+VIDEO_URL_TTL = float(os.environ.get('MOST_WATCHED_VIDEO_TTL', 3600))
+# Re-resolve quando faltar menos que isso para expirar
+EXPIRY_MARGIN = float(os.environ.get('MOST_WATCHED_EXPIRY_MARGIN', 300))
+
+_RESOLVED_FIELDS = ('player_url', 'video_url', 'episodes')
+_EXPIRY_PARAMS = ('expires', 'expire', 'exp', 'e')
+
+
+def video_url_expiry(video_url, resolved_at):
+    """Expiração do link: parâmetro expires/exp da URL, se houver, senão resolved_at + VIDEO_URL_TTL"""
+    query = parse_qs(urlparse(video_url or '').query)
+    for name in _EXPIRY_PARAMS:
+        value = query.get(name, [''])[0]
+        if value.isdigit() and int(value) > 1_000_000_000:
+            return float(value)
+    return resolved_at + VIDEO_URL_TTL
+
+
+def _item_expiry(item, resolved_at):
+    """Menor expiração entre o vídeo do filme e os episódios da série"""
+    urls = [item.get('video_url')] + [ep.get('video_url') for ep in item.get('episodes') or []]
+    expiries = [video_url_expiry(url, resolved_at) for url in urls if url]
+    return min(expiries) if expiries else resolved_at + VIDEO_URL_TTL
+
+
+def is_resolved(item):
+    """Só guarda no cache o que foi de fato resolvido (falhas tentam de novo na próxima)"""
+    if item.get('is_series'):
+        return bool(item.get('episodes'))
+    return bool(item.get('video_url'))
+
+
+class Resolution:
+    """player_url/video_url/episodes já resolvidos de um card, com a expiração do link"""
+
+    __slots__ = ('fields', 'is_series', 'max_episodes', 'resolved_at', 'expires_at')
+
+    def __init__(self, item, max_episodes):
+        self.fields = {name: item.get(name) for name in _RESOLVED_FIELDS}
+        self.is_series = bool(item.get('is_series'))
+        self.max_episodes = max_episodes
+        self.resolved_at = time.time()
+        self.expires_at = _item_expiry(item, self.resolved_at)
+
+    def usable(self, max_episodes, now):
+        if now >= self.expires_at - EXPIRY_MARGIN:
+            return False
+        # Série resolvida com menos episódios do que o pedido atual
+        if self.is_series and self.max_episodes and (max_episodes == 0 or max_episodes > self.max_episodes):
+            return False
+        return True
+
+    def apply(self, item, max_episodes):
+        item.update(self.fields)
+        episodes = self.fields.get('episodes') or []
+        item['episodes'] = episodes[:max_episodes] if max_episodes > 0 else list(episodes)
+        return item
+
+
+class MostWatchedTracker:
+    """Snapshot do Mais Visto do Dia com as resoluções em cache por watch_link"""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self._cache = {}
+        # Última linha baixada com sucesso (cards crus, sem resolução)
+        self._listing = []
+        self._lock = threading.Lock()
+        self.refreshed_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, max_episodes_per_series=5, organize_output=True, progress=None):
+        """
+        Mesmo retorno de scraper.get_most_watched_today(get_video_urls=True, ...),
+        mas só resolve os itens que não estão no cache (ou estão para expirar).
+        """
+        # Um refresh por vez: chamadas simultâneas esperam e já encontram o cache preenchido
+        with self._lock:
+            try:
+                listing = self.scraper.get_most_watched_today(get_video_urls=False, organize_output=False)
+            except requests.RequestException as e:
+                # Sem linha anterior não há o que servir: o erro (503 do UpstreamUnavailable) sobe
+                if not self._listing:
+                    raise
+                print(f"  ⚠ Falha ao baixar o Mais Visto do Dia: {e}")
+                listing = []
+            fresh = bool(listing)
+            if fresh:
+                self._listing = [dict(item) for item in listing]
+            else:
+                # Home fora do ar não apaga a linha nem as resoluções guardadas
+                if self._listing:
+                    print("  ⚠ Mais Visto do Dia vazio; mantendo a última linha")
+                listing = [dict(item) for item in self._listing]
+            now = time.time()
+            cache = {}
+            items = []
+            for idx, item in enumerate(listing, 1):
+                key = item.get('watch_link')
+                cached = self._cache.get(key)
+                if cached is not None and cached.usable(max_episodes_per_series, now):
+                    cached.apply(item, max_episodes_per_series)
+                    self.hits += 1
+                elif key:
+                    print(f"  ↻ Resolvendo {item['title']}...")
+                    self.scraper.resolve_most_watched_item(item, max_episodes_per_series)
+                    cached = Resolution(item, max_episodes_per_series)
+                    self.misses += 1
+                if key and cached is not None and is_resolved(item):
+                    cache[key] = cached
+                items.append(item)
+                if progress:
+                    progress(idx, len(listing), item)
+            # Itens que saíram da linha deixam o cache junto
+            if listing:
+                self._cache = cache
+            if fresh:
+                self.refreshed_at = now
+
+        if organize_output:
+            return organize_listing(items)
+        return items
+
+    def stats(self):
+        # Sem o lock: ele fica preso durante um refresh inteiro
+        return {
+            'cached_items': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshed_at': self.refreshed_at,
+        }
@@ -0,0 +1,106 @@
+"""
+Cache de resultados negativos (título sem player, player sem .mp4)
+
+Quando a página de um título não tem botão ASSISTIR/iframe, ou o player não
+tem .mp4, a próxima requisição para o mesmo link refazia o scrape inteiro
+(com retentativas e os dumps de debug), e cada cliente que clicava no título
+quebrado pagava isso de novo. Aqui o "não achei" fica guardado por pouco
+tempo (NEGATIVE_CACHE_TTL) com um código de motivo, e o scraper e o
+/api/video-url respondem direto dele até expirar.
+
+Só entra aqui o que é resposta do site: erro de rede, timeout ou breaker
+aberto não são cacheados (esses têm retentativa/503 próprios).
+
+Motivos:
+  - page_not_found:   página do título respondeu 404/410;
+  - no_player:        página carregou mas nenhuma estratégia achou o player;
+  - player_not_found: player respondeu 404/410;
+  - no_video:         player carregou mas nenhum método achou o .mp4.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+NEGATIVE_CACHE_TTL = float(os.environ.get('NEGATIVE_CACHE_TTL', 300))
+NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', 5000))
+
+REASONS = {
+    'page_not_found': 'Página do título não existe mais no site',
+    'no_player': 'Botão ASSISTIR ou player não encontrado na página',
+    'player_not_found': 'Player não existe mais no site',
+    'no_video': 'URL do vídeo não encontrada no player',
+}
+
+
+class NegativeResult:
+    __slots__ = ('reason', 'recorded_at', 'expires_at')
+
+    def __init__(self, reason, ttl):
+        self.reason = reason
+        self.recorded_at = time.time()
+        self.expires_at = self.recorded_at + ttl
+
+    @property
+    def message(self):
+        return REASONS.get(self.reason, self.reason)
+
+    def retry_after(self, now=None):
+        """Segundos até a entrada expirar (valor do header Retry-After)"""
+        return max(1, int(self.expires_at - (now or time.time()) + 0.999))
+
+
+class NegativeCache:
+    """{url: NegativeResult} com TTL e limite LRU"""
+
+    def __init__(self, ttl=NEGATIVE_CACHE_TTL, max_size=NEGATIVE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.recorded = {reason: 0 for reason in REASONS}
+
+    def get(self, url):
+        """Resultado negativo ainda válido para a URL (None se não houver)"""
+        if not url or self.ttl <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if now >= entry.expires_at:
+                del self._entries[url]
+                return None
+            self.hits += 1
+            return entry
+
+    def record(self, url, reason):
+        if not url or self.ttl <= 0:
+            return None
+        entry = NegativeResult(reason, self.ttl)
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.recorded[reason] = self.recorded.get(reason, 0) + 1
+        return entry
+
+    def discard(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            active = [e.reason for e in self._entries.values() if e.expires_at > now]
+        by_reason = {reason: active.count(reason) for reason in REASONS}
+        return {
+            'ttl_seconds': self.ttl,
+            'entries': len(active),
+            'by_reason': by_reason,
+            'hits': self.hits,
+            'recorded': dict(self.recorded),
+        }
@@ -0,0 +1,133 @@
+"""
+Rate limiter adaptativo por host (token bucket + AIMD)
+
+Substitui os time.sleep fixos entre requisições. Cada host do upstream tem um
+bucket compartilhado por todas as threads; a taxa sobe aos poucos enquanto as
+respostas chegam rápidas e 2xx (aumento aditivo de ~RATE_LIMIT_INCREASE req/s
+por segundo) e cai pela metade em 429, 5xx ou timeout (diminuição multiplicativa).
+"""
+import os
+import threading
+import time
+
+INITIAL_RATE = float(os.environ.get('RATE_LIMIT_INITIAL', 10))
+MIN_RATE = float(os.environ.get('RATE_LIMIT_MIN', 0.5))
+MAX_RATE = float(os.environ.get('RATE_LIMIT_MAX', 50))
+BURST = float(os.environ.get('RATE_LIMIT_BURST', 10))
+INCREASE = float(os.environ.get('RATE_LIMIT_INCREASE', 2))
+DECREASE_FACTOR = float(os.environ.get('RATE_LIMIT_DECREASE', 0.5))
+# Resposta mais lenta que isso não conta como "saudável" para aumentar a taxa
+SLOW_SECONDS = float(os.environ.get('RATE_LIMIT_SLOW_SECONDS', 2.0))
+# Espera máxima por uma ficha antes de desistir da requisição
+MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', 10))
+
+
+class AdaptiveRateLimiter:
+    """Token bucket com reserva: quem chega primeiro sai primeiro, sem polling"""
+
+    def __init__(self, host, rate=INITIAL_RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+        self.waited_total = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, max_wait=MAX_WAIT):
+        """
+        Reserva uma ficha e dorme até ela valer.
+        Retorna 0 se conseguiu, ou a espera necessária (s) se ela passaria de max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                self.throttled += 1
+                return wait
+            self.tokens -= 1
+            self.waited_total += wait
+        if wait:
+            time.sleep(wait)
+        return 0
+
+    def on_success(self, latency):
+        if latency > SLOW_SECONDS:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + INCREASE / self.rate)
+
+    def on_overload(self):
+        """429, 5xx ou timeout: corta a taxa (no máximo uma vez por segundo)"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self.last_decrease < 1.0:
+                return
+            self.last_decrease = now
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0.0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'rate': round(self.rate, 2),
+                'tokens': round(self.tokens, 2),
+                'waited_seconds': round(self.waited_total, 2),
+                'throttled': self.throttled,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+# Teto aplicado a todo host, inclusive os que ainda vão aparecer (cap_all_rates)
+_global_cap = None
+
+
+def limiter_for(host):
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveRateLimiter(host)
+            if _global_cap is not None:
+                _apply_cap(limiter, _global_cap)
+        return limiter
+
+
+def _apply_cap(limiter, max_rate):
+    with limiter._lock:
+        limiter.max_rate = max_rate
+        limiter.rate = min(limiter.rate, max_rate)
+        limiter.min_rate = min(limiter.min_rate, max_rate)
+
+
+def cap_rate(host, max_rate):
+    """Teto fixo de req/s para um host (ex.: exportação em massa sem sobrecarregar o site)"""
+    limiter = limiter_for(host)
+    _apply_cap(limiter, max_rate)
+    return limiter
+
+
+def cap_all_rates(max_rate):
+    """Teto fixo de req/s para todos os hosts, inclusive servidores de .mp4 ainda não vistos"""
+    global _global_cap
+    with _limiters_lock:
+        _global_cap = max_rate
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        _apply_cap(limiter, max_rate)
+
+
+def limiter_states():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {l.host: l.snapshot() for l in limiters}
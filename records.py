@@ -0,0 +1,97 @@
+"""
+Registros compactos para itens do catálogo e episódios
+
+Com o catálogo inteiro em memória em cada worker (snapshot do refresher), os
+dicts de cada item viram a maior parte do RSS: cada dict guarda a tabela de
+chaves e uma cópia própria de valores repetidíssimos como 'movie',
+'Queridinhos do BLUECINE', '2023' ou '1h 45Min'. Aqui cada registro usa
+__slots__ (sem __dict__ por instância) e os campos de baixa cardinalidade
+passam por sys.intern, então todos os itens apontam para a mesma string.
+
+Os registros se comportam como Mapping (item['slug'], item.get('type'),
+item['video_url'] = ...) e viram exatamente o JSON de antes via to_dict() /
+json_default(). Veja benchmarks/bench_records.py para a economia por item.
+"""
+import sys
+from collections.abc import Mapping
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record(Mapping):
+    """Base: subclasses declaram _fields (= __slots__) e um __init__ explícito"""
+
+    __slots__ = ()
+    _fields = ()
+    _interned = frozenset()
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, _intern(value) if key in self._interned else value)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+
+class CatalogItem(Record):
+    """Item do /api/catalog (mesmas chaves e ordem do dict antigo)"""
+
+    _fields = ('title', 'slug', 'url', 'poster', 'year', 'duration', 'imdb', 'type', 'section')
+    __slots__ = _fields
+    _interned = frozenset({'year', 'duration', 'imdb', 'type', 'section'})
+
+    def __init__(self, title='', slug='', url='', poster='', year='', duration='', imdb='',
+                 type=None, section=None):
+        self.title = title
+        self.slug = slug
+        self.url = url
+        self.poster = poster
+        self.year = _intern(year)
+        self.duration = _intern(duration)
+        self.imdb = _intern(imdb)
+        self.type = _intern(type)
+        self.section = _intern(section)
+
+
+class Episode(Record):
+    """Episódio de uma temporada (get_season_episodes)"""
+
+    _fields = ('episode_id', 'season', 'season_id', 'title', 'duration', 'published_date',
+               'player_url', 'video_url')
+    __slots__ = _fields
+    _interned = frozenset({'season', 'season_id', 'duration', 'published_date'})
+
+    def __init__(self, episode_id=None, season=None, season_id=None, title=None, duration=None,
+                 published_date=None, player_url=None, video_url=None):
+        self.episode_id = episode_id
+        self.season = _intern(season)
+        self.season_id = _intern(season_id)
+        self.title = title
+        self.duration = _intern(duration)
+        self.published_date = _intern(published_date)
+        self.player_url = player_url
+        self.video_url = video_url
+
+
+def json_default(obj):
+    """default= para json.dumps / provider do Flask: registros viram dict"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
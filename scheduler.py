@@ -0,0 +1,211 @@
+"""
+Escalonador de prioridade das requisições ao upstream
+
+Um clique em /api/video-url disputava a session e as conexões de igual para
+igual com o trabalho em lote (Mais Visto do Dia resolvendo dezenas de
+players, série inteira, jobs, exportação): quem clicava esperava atrás dos
+40 episódios de outra pessoa. Agora toda requisição que passa por
+upstream._send ocupa uma das UPSTREAM_SLOTS vagas do host de destino, e
+quando há fila a próxima vaga vai para:
+
+  1. o pedido mais antigo de qualquer classe que esteja esperando há mais de
+     UPSTREAM_STARVATION_SECONDS (proteção contra inanição);
+  2. senão, a classe escolhida por weighted fair queuing (stride scheduling)
+     com os pesos UPSTREAM_WEIGHT_<CLASSE>: com 8/2/1, a cada 11 vagas
+     disputadas, interactive leva 8, batch 2 e background 1. Classe sem fila
+     não acumula crédito.
+
+Classes: interactive > batch > background. A classe vale para a thread (e o
+contexto) atual: `with scheduler.priority('batch'): ...`; sem nada, é
+interactive. Funções mandadas para outro pool de threads levam a classe (e o
+resto do contexto, como o registro de timings.py) junto com scheduler.bound(fn).
+
+As vagas são por host: um host lento ou estrangulado pelo rate limiter só
+enche a própria fila, e os outros hosts seguem livres. A vaga é pedida
+depois da espera do rate limiter e vale até os headers chegarem; o corpo de
+respostas stream=True é lido fora dela. O padrão de UPSTREAM_SLOTS é um
+quarto das threads do gunicorn (GUNICORN_THREADS), nunca menos de 8.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PRIORITIES = ('interactive', 'batch', 'background')
+DEFAULT_PRIORITY = 'interactive'
+
+UPSTREAM_SLOTS = int(os.environ.get('UPSTREAM_SLOTS',
+                                    max(8, int(os.environ.get('GUNICORN_THREADS', 128)) // 4)))
+UPSTREAM_STARVATION_SECONDS = float(os.environ.get('UPSTREAM_STARVATION_SECONDS', 2.0))
+_DEFAULT_WEIGHTS = {'interactive': 8, 'batch': 2, 'background': 1}
+WEIGHTS = {name: max(0.01, float(os.environ.get(f'UPSTREAM_WEIGHT_{name.upper()}', weight)))
+           for name, weight in _DEFAULT_WEIGHTS.items()}
+
+_current = contextvars.ContextVar('upstream_priority', default=DEFAULT_PRIORITY)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def priority(name):
+    """Classe das requisições feitas dentro do bloco"""
+    token = set_priority(name)
+    try:
+        yield
+    finally:
+        reset_priority(token)
+
+
+def set_priority(name):
+    """Para hooks (before_request/teardown): devolve o token de reset_priority"""
+    if name not in WEIGHTS:
+        raise ValueError(f"prioridade desconhecida: {name}")
+    return _current.set(name)
+
+
+def reset_priority(token):
+    _current.reset(token)
+
+
+def bound(fn, name=None):
+    """fn que roda em outra thread com o contexto atual e a classe atual (ou `name`)"""
+    name = name or current()
+    context = contextvars.copy_context()
+
+    def call(*args, **kwargs):
+        with priority(name):
+            return fn(*args, **kwargs)
+
+    def run(*args, **kwargs):
+        # Uma cópia por chamada: o mesmo Context não entra em duas threads ao mesmo tempo
+        return context.copy().run(call, *args, **kwargs)
+    return run
+
+
+class _Waiter:
+    __slots__ = ('enqueued', 'event')
+
+    def __init__(self):
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+
+
+class _Class:
+    __slots__ = ('name', 'stride', 'pass_', 'queue', 'dispatched', 'promoted', 'waits')
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.stride = 1.0 / weight
+        self.pass_ = 0.0
+        self.queue = deque()
+        self.dispatched = 0
+        self.promoted = 0
+        self.waits = deque(maxlen=512)
+
+
+class PriorityScheduler:
+    def __init__(self, slots=UPSTREAM_SLOTS, weights=None, starvation_seconds=UPSTREAM_STARVATION_SECONDS):
+        self.slots = max(1, slots)
+        self.starvation_seconds = starvation_seconds
+        self.in_use = 0
+        self._classes = {name: _Class(name, weight) for name, weight in (weights or WEIGHTS).items()}
+        # Menor "pass" já despachado: classe que volta a ter fila parte daqui
+        self._virtual_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, name=None):
+        """Espera (se preciso) a vez da classe; retorna os segundos esperados"""
+        cls = self._classes[name or current()]
+        with self._lock:
+            if self.in_use < self.slots and not any(c.queue for c in self._classes.values()):
+                self.in_use += 1
+                self._dispatch(cls, 0.0)
+                return 0.0
+            if not cls.queue:
+                cls.pass_ = max(cls.pass_, self._virtual_time)
+            waiter = _Waiter()
+            cls.queue.append(waiter)
+        # A vaga é passada direto por release() (ninguém fura a fila)
+        waiter.event.wait()
+        return time.monotonic() - waiter.enqueued
+
+    def release(self):
+        with self._lock:
+            waiter = self._next()
+            if waiter is None:
+                self.in_use -= 1
+        if waiter is not None:
+            waiter.event.set()
+
+    @contextmanager
+    def slot(self, name=None):
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _next(self):
+        """Próximo pedido a receber a vaga (chamado com o lock)"""
+        waiting = [c for c in self._classes.values() if c.queue]
+        if not waiting:
+            return None
+        now = time.monotonic()
+        oldest = min(waiting, key=lambda c: c.queue[0].enqueued)
+        if now - oldest.queue[0].enqueued >= self.starvation_seconds:
+            cls = oldest
+            cls.promoted += 1
+        else:
+            cls = min(waiting, key=lambda c: (c.pass_, PRIORITIES.index(c.name)))
+        waiter = cls.queue.popleft()
+        self._dispatch(cls, now - waiter.enqueued)
+        return waiter
+
+    def _dispatch(self, cls, waited):
+        self._virtual_time = cls.pass_
+        cls.pass_ += cls.stride
+        cls.dispatched += 1
+        cls.waits.append(waited)
+
+    def stats(self):
+        with self._lock:
+            classes = {}
+            for c in self._classes.values():
+                waits = sorted(c.waits)
+                classes[c.name] = {
+                    'queued': len(c.queue),
+                    'dispatched': c.dispatched,
+                    'starvation_promotions': c.promoted,
+                    'wait_ms_p95': round(waits[int(len(waits) * 0.95) - 1] * 1000, 1) if waits else 0.0,
+                    'wait_ms_max': round(waits[-1] * 1000, 1) if waits else 0.0,
+                }
+            return {'slots': self.slots, 'in_use': self.in_use,
+                    'weights': {c.name: round(1 / c.stride, 2) for c in self._classes.values()},
+                    'classes': classes}
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def scheduler_for(host):
+    with _schedulers_lock:
+        instance = _schedulers.get(host)
+        if instance is None:
+            instance = _schedulers[host] = PriorityScheduler()
+        return instance
+
+
+def slot(host, name=None):
+    """with scheduler.slot(host): ... -- uma vaga do escalonador do host"""
+    return scheduler_for(host).slot(name)
+
+
+def stats():
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {host: instance.stats() for host, instance in schedulers.items()}
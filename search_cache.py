@@ -0,0 +1,175 @@
+"""
+Cache de resultados da busca (/api/search e /api/search-fast)
+
+Cada busca baixava /search.php de novo e, no /api/search, resolvia player e
+.mp4 de todos os cards. Aqui são dois caches independentes:
+
+  - listagem: cards da busca por query normalizada (sem acento, casefold,
+    espaços colapsados: "Ação  ", "acao" e "AÇÃO" são a mesma entrada), com
+    TTL curto (SEARCH_CACHE_TTL) e LRU de SEARCH_CACHE_SIZE queries;
+  - resoluções: player_url/video_url/episodes por watch_link, com a
+    expiração do próprio link (most_watched.Resolution) e LRU própria. Um
+    filme que aparece em "bat" e em "batman" é resolvido uma vez só.
+
+Prefixos: /search.php devolve os títulos que contêm o termo, então o
+resultado de "batman begins" está contido no de "batman". Se uma query mais
+curta que é prefixo da atual está no cache, com resultado completo (menos de
+SEARCH_SUPERSET_MAX_RESULTS cards, ou seja, não cortado pelo site), a
+resposta sai filtrando esses cards pelo título, sem ir ao site.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from cnvsweb_scraper import organize_listing
+from most_watched import Resolution, is_resolved
+
+SEARCH_CACHE_TTL = float(os.environ.get('SEARCH_CACHE_TTL', 600))
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 500))
+SEARCH_VIDEO_CACHE_SIZE = int(os.environ.get('SEARCH_VIDEO_CACHE_SIZE', 2000))
+# Resultado com esse tanto de cards pode ter sido cortado pelo site: não serve de superset
+SEARCH_SUPERSET_MAX_RESULTS = int(os.environ.get('SEARCH_SUPERSET_MAX_RESULTS', 50))
+# Prefixos mais curtos que isso não respondem por queries maiores ("a", "ba"...)
+SEARCH_SUPERSET_MIN_CHARS = int(os.environ.get('SEARCH_SUPERSET_MIN_CHARS', 3))
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_query(text):
+    """'  Ação   e  AVENTURA ' -> 'acao e aventura'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return _SPACES.sub(' ', stripped.casefold()).strip()
+
+
+class _Listing:
+    __slots__ = ('items', 'stored_at')
+
+    def __init__(self, items):
+        self.items = items
+        self.stored_at = time.time()
+
+    def fresh(self, now):
+        return now - self.stored_at < SEARCH_CACHE_TTL
+
+    @property
+    def complete(self):
+        return len(self.items) < SEARCH_SUPERSET_MAX_RESULTS
+
+
+class SearchCache:
+    """search_movies() com listagens por query normalizada e resoluções por watch_link em cache"""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self._listings = OrderedDict()
+        self._resolutions = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {'hits': 0, 'superset_hits': 0, 'misses': 0,
+                       'video_hits': 0, 'video_misses': 0}
+
+    def search(self, query, get_video_urls=True, max_episodes_per_series=5, organize_output=True):
+        """Mesmo retorno de scraper.search_movies(...)"""
+        items = [self._copy(item) for item in self.listing(query)]
+        if get_video_urls:
+            for item in items:
+                self._resolve(item, max_episodes_per_series)
+        if organize_output:
+            return organize_listing(items)
+        return items
+
+    # ---------- listagem ----------
+
+    def listing(self, query):
+        """Cards da busca: cache exato, superset de um prefixo já buscado ou /search.php"""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            cached = self._get(self._listings, key, now)
+            if cached is not None:
+                self.counts['hits'] += 1
+                return cached.items
+            superset = self._superset(key, now)
+            if superset is not None:
+                items = [item for item in superset.items if key in normalize_query(item['title'])]
+                self._put(self._listings, key, _Listing(items), SEARCH_CACHE_SIZE)
+                self.counts['superset_hits'] += 1
+                return items
+            self.counts['misses'] += 1
+
+        items = self.scraper.search_listing(query)
+        # Lista vazia pode ser falha de parse/rede (search_listing engole): não guarda
+        if items:
+            with self._lock:
+                self._put(self._listings, key, _Listing(items), SEARCH_CACHE_SIZE)
+        return items
+
+    def _superset(self, key, now):
+        """Listagem completa do maior prefixo de key que está no cache (chamado com o lock)"""
+        for end in range(len(key) - 1, SEARCH_SUPERSET_MIN_CHARS - 1, -1):
+            cached = self._get(self._listings, key[:end], now)
+            if cached is not None and cached.complete:
+                return cached
+        return None
+
+    # ---------- resoluções ----------
+
+    def _resolve(self, item, max_episodes):
+        watch_link = item.get('watch_link')
+        if not watch_link:
+            return item
+        now = time.time()
+        with self._lock:
+            cached = self._resolutions.get(watch_link)
+            if cached is not None and cached.usable(max_episodes, now):
+                self._resolutions.move_to_end(watch_link)
+                self.counts['video_hits'] += 1
+                return cached.apply(item, max_episodes)
+            self.counts['video_misses'] += 1
+
+        self.scraper.resolve_search_item(item, max_episodes)
+        if is_resolved(item):
+            with self._lock:
+                self._put(self._resolutions, watch_link, Resolution(item, max_episodes),
+                          SEARCH_VIDEO_CACHE_SIZE)
+        return item
+
+    # ---------- LRU ----------
+
+    @staticmethod
+    def _get(cache, key, now):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if not entry.fresh(now):
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _put(cache, key, entry, max_size):
+        cache[key] = entry
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+    @staticmethod
+    def _copy(item):
+        """Card do cache -> cópia que a resolução pode preencher sem sujar o cache"""
+        copy = dict(item)
+        copy['episodes'] = list(item.get('episodes') or [])
+        return copy
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+            self._resolutions.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, queries=len(self._listings), resolutions=len(self._resolutions),
+                        ttl_seconds=SEARCH_CACHE_TTL)
@@ -0,0 +1,239 @@
+"""
+Índice local (SQLite) de séries -> temporadas -> episódios
+
+/api/series-episodes e /api/season-episodes raspavam o #seasons-view e
+chamavam o ajax/episodes.php a cada requisição, mesmo para séries
+encerradas cuja lista nunca muda. O índice guarda as temporadas e os
+episódios (episode_id, título, duração, data e o id do player) e só volta ao
+upstream quando:
+  - a lista de temporadas passou de SERIES_INDEX_TTL;
+  - é a temporada mais recente da série e passou de LATEST_SEASON_TTL;
+  - o site informa uma contagem de episódios diferente da guardada;
+  - a temporada deixou de ser a mais recente (última atualização completa).
+Temporadas antigas são reconferidas no máximo a cada SEASON_MAX_AGE. Se o
+upstream falhar na hora de atualizar, valem as temporadas/episódios guardados.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from records import Episode
+
+SERIES_INDEX_PATH = os.environ.get('SERIES_INDEX_PATH', 'series_index.db')
+SERIES_INDEX_TTL = float(os.environ.get('SERIES_INDEX_TTL', 6 * 3600))
+LATEST_SEASON_TTL = float(os.environ.get('LATEST_SEASON_TTL', 3600))
+SEASON_MAX_AGE = float(os.environ.get('SEASON_MAX_AGE', 30 * 86400))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS series (
+    slug TEXT PRIMARY KEY,
+    watch_link TEXT NOT NULL,
+    refreshed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seasons (
+    season_id TEXT PRIMARY KEY,
+    series_slug TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    season_name TEXT NOT NULL,
+    selected INTEGER NOT NULL DEFAULT 0,
+    episode_count_hint INTEGER,
+    episode_count INTEGER,
+    episodes_refreshed_at REAL
+);
+CREATE INDEX IF NOT EXISTS seasons_by_series ON seasons (series_slug, position);
+CREATE TABLE IF NOT EXISTS episodes (
+    season_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    episode_id TEXT,
+    title TEXT,
+    duration TEXT,
+    published_date TEXT,
+    player_id TEXT,
+    player_url TEXT,
+    PRIMARY KEY (season_id, position)
+);
+'''
+
+_PLAYER_ID = re.compile(r'/s/(\d+)')
+# "1ª Temporada (10 episódios)" -> 10, quando o site mostra a contagem no select
+_COUNT_HINT = re.compile(r'(\d+)\s*epis', re.IGNORECASE)
+# Posição de temporada pedida direto, antes de a lista da série ser baixada
+# (store_seasons corrige). Não entra no MAX(position) das outras, mas ela
+# mesma conta como a mais recente (TTL curto): pode ser a que está no ar
+_UNKNOWN_POSITION = -1
+
+
+def series_slug(watch_link):
+    """https://cnvsweb.stream/watch/breaking-bad e /watch/breaking-bad -> breaking-bad"""
+    return urlparse(watch_link).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def player_id_from_url(player_url):
+    match = _PLAYER_ID.search(player_url or '')
+    return match.group(1) if match else None
+
+
+class SeriesIndex:
+    """Acesso ao SQLite; uma conexão compartilhada protegida por lock"""
+
+    def __init__(self, path=SERIES_INDEX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- temporadas ----------
+
+    def seasons(self, scraper, watch_link, refresh=False):
+        """Temporadas da série ({season_id, season_name, selected}); (lista, veio_do_índice)"""
+        slug = series_slug(watch_link)
+        if not refresh:
+            stored = self._stored_seasons(slug, fresh_only=True)
+            if stored:
+                self.hits += 1
+                return stored, True
+        self.misses += 1
+        seasons = scraper.get_series_episodes(watch_link)
+        if seasons:
+            self.store_seasons(watch_link, seasons)
+            return seasons, False
+        # Upstream falhou: a lista guardada (mesmo vencida) é melhor que nada
+        stored = self._stored_seasons(slug, fresh_only=False)
+        if stored:
+            print(f"⚠ Temporadas de {slug} não vieram do site; usando as do índice")
+            return stored, True
+        return seasons, False
+
+    def _stored_seasons(self, slug, fresh_only):
+        with self._lock:
+            row = self._conn.execute('SELECT refreshed_at FROM series WHERE slug = ?', (slug,)).fetchone()
+            if not row or (fresh_only and time.time() - row['refreshed_at'] > SERIES_INDEX_TTL):
+                return None
+            rows = self._conn.execute(
+                'SELECT season_id, season_name, selected FROM seasons WHERE series_slug = ? ORDER BY position',
+                (slug,)).fetchall()
+        return [{'season_id': r['season_id'], 'season_name': r['season_name'], 'selected': bool(r['selected'])}
+                for r in rows]
+
+    def store_seasons(self, watch_link, seasons):
+        """Grava a lista de temporadas; se surgiu temporada nova, a antiga 'mais recente' é reconferida"""
+        slug = series_slug(watch_link)
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute(
+                'SELECT season_id, position FROM seasons WHERE series_slug = ? ORDER BY position',
+                (slug,)).fetchall()
+            old_ids = [r['season_id'] for r in old]
+            old_latest = [r['season_id'] for r in old if r['position'] != _UNKNOWN_POSITION][-1:]
+            new_ids = [s['season_id'] for s in seasons]
+            if old_latest and old_latest[0] != new_ids[-1]:
+                self._conn.execute('UPDATE seasons SET episodes_refreshed_at = NULL WHERE season_id = ?',
+                                   (old_latest[0],))
+            self._conn.execute('INSERT OR REPLACE INTO series (slug, watch_link, refreshed_at) VALUES (?, ?, ?)',
+                               (slug, watch_link, now))
+            for position, season in enumerate(seasons):
+                hint = _COUNT_HINT.search(season['season_name'])
+                self._conn.execute(
+                    'INSERT INTO seasons (season_id, series_slug, position, season_name, selected, episode_count_hint) '
+                    'VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(season_id) DO UPDATE SET series_slug = excluded.series_slug, '
+                    'position = excluded.position, season_name = excluded.season_name, '
+                    'selected = excluded.selected, episode_count_hint = excluded.episode_count_hint',
+                    (season['season_id'], slug, position, season['season_name'], int(bool(season.get('selected'))),
+                     int(hint.group(1)) if hint else None))
+            gone = set(old_ids) - set(new_ids)
+            for season_id in gone:
+                self._conn.execute('DELETE FROM seasons WHERE season_id = ?', (season_id,))
+                self._conn.execute('DELETE FROM episodes WHERE season_id = ?', (season_id,))
+
+    # ---------- episódios ----------
+
+    def season_episodes(self, scraper, watch_link, season_id, refresh=False):
+        """Episódios da temporada (Episode); (lista, veio_do_índice)"""
+        season_id = str(season_id)
+        if not refresh and self._season_fresh(series_slug(watch_link), season_id):
+            episodes = self._stored_episodes(season_id)
+            if episodes:
+                self.hits += 1
+                return episodes, True
+        self.misses += 1
+        episodes, complete = scraper.get_season_episodes(watch_link, season_id, with_status=True)
+        if episodes and complete:
+            self.store_episodes(watch_link, season_id, episodes)
+            return episodes, False
+        if episodes:
+            # Alguma página falhou: não grava como atual; vale o que tiver mais episódios
+            print(f"⚠ Temporada {season_id} veio incompleta do site; índice não atualizado")
+            stored = self._stored_episodes(season_id)
+            if len(stored) > len(episodes):
+                return stored, True
+            return episodes, False
+        # Upstream falhou: os episódios guardados (mesmo vencidos) são melhores que nada
+        stored = self._stored_episodes(season_id)
+        if stored:
+            print(f"⚠ Episódios da temporada {season_id} não vieram do site; usando os do índice")
+            return stored, True
+        return episodes, False
+
+    def _season_fresh(self, slug, season_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT s.series_slug, s.position, s.episode_count, s.episode_count_hint, s.episodes_refreshed_at, '
+                '       s.position = (SELECT MAX(position) FROM seasons '
+                '                     WHERE series_slug = s.series_slug AND position != ?) AS latest '
+                'FROM seasons s WHERE s.season_id = ?', (_UNKNOWN_POSITION, season_id)).fetchone()
+        if not row or row['series_slug'] != slug or row['episodes_refreshed_at'] is None:
+            return False
+        age = time.time() - row['episodes_refreshed_at']
+        if row['latest'] or row['position'] in (None, _UNKNOWN_POSITION):
+            return age <= LATEST_SEASON_TTL
+        if row['episode_count_hint'] is not None and row['episode_count_hint'] != row['episode_count']:
+            return False
+        return age <= SEASON_MAX_AGE
+
+    def _stored_episodes(self, season_id):
+        with self._lock:
+            season = self._conn.execute('SELECT season_name FROM seasons WHERE season_id = ?',
+                                        (season_id,)).fetchone()
+            rows = self._conn.execute('SELECT * FROM episodes WHERE season_id = ? ORDER BY position',
+                                      (season_id,)).fetchall()
+        if not season:
+            return []
+        return [Episode(episode_id=r['episode_id'], season=season['season_name'], season_id=season_id,
+                        title=r['title'], duration=r['duration'], published_date=r['published_date'],
+                        player_url=r['player_url'], video_url=None)
+                for r in rows]
+
+    def store_episodes(self, watch_link, season_id, episodes):
+        slug = series_slug(watch_link)
+        season_name = episodes[0]['season'] if episodes else f"Temporada {season_id}"
+        now = time.time()
+        with self._lock, self._conn:
+            # Temporada pedida direto, sem passar por /api/series-episodes
+            self._conn.execute(
+                'INSERT OR IGNORE INTO seasons (season_id, series_slug, position, season_name) VALUES (?, ?, ?, ?)',
+                (season_id, slug, _UNKNOWN_POSITION, season_name))
+            self._conn.execute('DELETE FROM episodes WHERE season_id = ?', (season_id,))
+            self._conn.executemany(
+                'INSERT INTO episodes (season_id, position, episode_id, title, duration, published_date, '
+                'player_id, player_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(season_id, position, ep['episode_id'], ep['title'], ep['duration'], ep['published_date'],
+                  player_id_from_url(ep['player_url']), ep['player_url'])
+                 for position, ep in enumerate(episodes)])
+            self._conn.execute('UPDATE seasons SET episode_count = ?, episodes_refreshed_at = ? WHERE season_id = ?',
+                               (len(episodes), now, season_id))
+
+    def stats(self):
+        with self._lock:
+            counts = {table: self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                      for table in ('series', 'seasons', 'episodes')}
+        return dict(counts, hits=self.hits, misses=self.misses, path=self.path)
@@ -1,2 +1,6 @@
 #!/bin/bash
-gunicorn api_server:app --bind 0.0.0.0:$PORT --workers 1 --timeout 120
+# gthread: cada requisição ocupa uma thread, não o worker inteiro. O SSE de
+# /api/catalog/changes fica aberto por horas e os bulkheads (bulkhead.py) só
+# limitam algo se houver requisições concorrentes no mesmo processo.
+gunicorn 'main:create_app()' --bind 0.0.0.0:$PORT --workers 1 \
+    --worker-class gthread --threads ${GUNICORN_THREADS:-128} --timeout 120
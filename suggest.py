@@ -0,0 +1,116 @@
+"""
+Autocomplete (/api/suggest) servido só da memória
+
+O campo de busca chamava /api/search-fast a cada rajada de teclas: uma ida ao
+site por sugestão. Aqui um índice de prefixos é montado a partir do catálogo
+que o refresher já baixa (scrape_all_catalog) e consultado com bisect num
+array ordenado de chaves, sem tocar na rede.
+
+Chaves de cada item (todas com normalize_query: sem acento, casefold):
+  - o título e cada sufixo dele que começa numa palavra ("vingadores
+    ultimato" também é achado por "ultimato");
+  - o slug.
+Hífens contam como espaço nas chaves e na consulta.
+
+Ordem das sugestões: posição no Mais Visto do Dia, depois a posição da seção
+na página do tipo (seções do topo são as de destaque), depois a posição do
+item dentro da seção. O índice é imutável: o refresher monta um novo e troca
+a referência de uma vez, então uma consulta nunca vê um índice pela metade.
+"""
+import heapq
+import os
+import time
+from bisect import bisect_left
+
+from search_cache import normalize_query
+
+SUGGEST_LIMIT = int(os.environ.get('SUGGEST_LIMIT', 10))
+# Respostas memorizadas por índice (o índice não muda, então não expiram)
+SUGGEST_MEMO_SIZE = int(os.environ.get('SUGGEST_MEMO_SIZE', 2048))
+
+_UNRANKED = float('inf')
+_SUGGESTION_FIELDS = ('title', 'slug', 'type', 'year', 'poster', 'section', 'url')
+
+
+def _normalize(text):
+    """normalize_query com hífen como espaço ("Spider-Man" e "spider-man" = "spider man")"""
+    return normalize_query((text or '').replace('-', ' '))
+
+
+def _keys(item):
+    words = _normalize(item.get('title')).split(' ')
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    keys.add(_normalize(item.get('slug')))
+    keys.discard('')
+    return keys
+
+
+class SuggestIndex:
+    """Array ordenado de (chave, item) sobre um snapshot do catálogo"""
+
+    def __init__(self, items, ranks=None):
+        """items: scrape_all_catalog(); ranks: {slug: posição} do Mais Visto (catalog_feed.ranking_index)"""
+        ranks = ranks or {}
+        section_order = {}
+        section_counts = {}
+        self.suggestions = []
+        self._scores = []
+        seen = set()
+        pairs = []
+        for item in items:
+            key = (item.get('type'), item.get('slug'))
+            if not key[1] or key in seen:
+                continue
+            seen.add(key)
+            section = (item.get('type'), item.get('section'))
+            if section not in section_order:
+                # Ordem da seção dentro da página do tipo
+                section_order[section] = sum(1 for t, _ in section_order if t == section[0])
+            position = section_counts[section] = section_counts.get(section, -1) + 1
+            idx = len(self.suggestions)
+            self.suggestions.append({name: item.get(name) for name in _SUGGESTION_FIELDS})
+            self._scores.append((ranks.get(item.get('slug'), _UNRANKED), section_order[section], position, idx))
+            pairs.extend((k, idx) for k in _keys(item))
+
+        pairs.sort()
+        self._keys = [k for k, _ in pairs]
+        self._owners = [idx for _, idx in pairs]
+        self._memo = {}
+        self.built_at = time.time()
+        self.queries = 0
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Até `limit` sugestões cujo título (ou slug) tem uma palavra começando com query"""
+        self.queries += 1
+        prefix = _normalize(query)
+        if not prefix:
+            return []
+        memo_key = (prefix, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        matches = set()
+        start = bisect_left(self._keys, prefix)
+        for pos in range(start, len(self._keys)):
+            if not self._keys[pos].startswith(prefix):
+                break
+            matches.add(self._owners[pos])
+        best = heapq.nsmallest(limit, (self._scores[idx] for idx in matches))
+        result = [self.suggestions[score[-1]] for score in best]
+
+        if len(self._memo) >= SUGGEST_MEMO_SIZE:
+            self._memo.clear()
+        self._memo[memo_key] = result
+        return result
+
+    def stats(self):
+        return {
+            'items': len(self.suggestions),
+            'keys': len(self._keys),
+            'queries': self.queries,
+            'built_at': self.built_at,
+        }
@@ -0,0 +1,104 @@
+"""
+Medição de tempo por etapa de cada requisição (Server-Timing)
+
+O registro de etapas fica num contextvar ativado no começo de cada
+requisição do Flask. Etapas que rodam em outras threads (páginas de
+episódios em paralelo, hedge do upstream) entram no mesmo registro desde
+que a thread rode com uma cópia do contexto de quem pediu
+(scheduler.bound ou contextvars.copy_context()). Fora de uma requisição
+(threads de background, CLI) o registro não está ativo e as medições são
+simplesmente ignoradas; o que uma thread atrasada medir depois de
+stop_request também é descartado.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+class _Recorder:
+    __slots__ = ('stages', 'started', 'active', 'lock')
+
+    def __init__(self):
+        self.stages = []
+        self.started = time.perf_counter()
+        self.active = True
+        self.lock = threading.Lock()
+
+
+_current = contextvars.ContextVar('timings_recorder', default=None)
+
+
+def start_request():
+    """Ativa o registro de etapas para o contexto atual"""
+    _current.set(_Recorder())
+
+
+def stop_request():
+    """
+    Desativa o registro e retorna (etapas, total_ms)
+    etapas: lista de (nome, duracao_ms) na ordem em que terminaram
+    """
+    recorder = _current.get()
+    _current.set(None)
+    if recorder is None:
+        return [], 0.0
+    with recorder.lock:
+        recorder.active = False
+        stages = list(recorder.stages)
+    return stages, (time.perf_counter() - recorder.started) * 1000
+
+
+def is_active():
+    recorder = _current.get()
+    return recorder is not None and recorder.active
+
+
+def record(name, duration_ms):
+    """Registra uma etapa já medida"""
+    recorder = _current.get()
+    if recorder is None:
+        return
+    with recorder.lock:
+        if recorder.active:
+            recorder.stages.append((name, duration_ms))
+
+
+@contextmanager
+def stage(name):
+    """Mede o bloco como uma etapa: with stage('player_fetch'): ..."""
+    if not is_active():
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - t0) * 1000)
+
+
+def summarize(stages):
+    """
+    Agrupa etapas repetidas (ex: mp4_fetch de cada episódio)
+    Retorna dict {nome: {'ms': soma, 'count': n}} preservando a ordem
+    """
+    summary = {}
+    for name, ms in stages:
+        entry = summary.setdefault(name, {'ms': 0.0, 'count': 0})
+        entry['ms'] += ms
+        entry['count'] += 1
+    for entry in summary.values():
+        entry['ms'] = round(entry['ms'], 2)
+    return summary
+
+
+def server_timing_header(stages, total_ms):
+    """Monta o valor do header Server-Timing"""
+    parts = []
+    for name, entry in summarize(stages).items():
+        part = f"{name};dur={entry['ms']:.2f}"
+        if entry['count'] > 1:
+            part += f';desc="x{entry["count"]}"'
+        parts.append(part)
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ', '.join(parts)
@@ -0,0 +1,117 @@
+"""
+Transporte HTTP compartilhado (pools de conexão por host)
+
+As funções de módulo (_page_fetch, listagens do catálogo) chamavam
+requests.get direto: cada página abria uma conexão TCP+TLS nova e não
+aproveitava nada da session do CNVSWebScraper. Aqui existe um único
+HTTPAdapter (um PoolManager do urllib3) montado em todas as sessions, então
+scraper, catálogo e probes dos mirrors reutilizam as mesmas conexões
+keep-alive, com até HTTP_POOL_MAXSIZE conexões por host.
+
+  - session():        Session nova (cookies próprios) sobre os pools compartilhados;
+  - shared_session(): Session sem cookies para as páginas públicas;
+  - prewarm(urls):    abre conexões com os hosts em background no startup;
+  - CNVSWEB_HTTP2=1:  HTTP/2 (ALPN) pelo suporte experimental do urllib3 >= 2.3,
+                      se o pacote h2 estiver instalado; senão segue em HTTP/1.1.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Conexões mantidas por host e quantos hosts ficam com pool aberto
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 16))
+POOL_HOSTS = int(os.environ.get('HTTP_POOL_HOSTS', 16))
+# Conexões abertas por host no prewarm (0 desliga)
+PREWARM_CONNECTIONS = int(os.environ.get('HTTP_PREWARM_CONNECTIONS', 2))
+PREWARM_TIMEOUT = float(os.environ.get('HTTP_PREWARM_TIMEOUT', 5))
+HTTP2 = os.environ.get('CNVSWEB_HTTP2', '').lower() in ('1', 'true')
+
+
+def _enable_http2():
+    if not HTTP2:
+        return False
+    try:
+        import urllib3.http2
+        urllib3.http2.inject_into_urllib3()
+        return True
+    except ImportError as e:
+        print(f"⚠ HTTP/2 indisponível ({e}); usando HTTP/1.1")
+        return False
+
+
+http2_enabled = _enable_http2()
+adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE)
+
+_shared = None
+_shared_lock = threading.Lock()
+_prewarm_stats = {'hosts': 0, 'connections': 0, 'failures': 0}
+
+
+def session():
+    """requests.Session usando os pools de conexão compartilhados"""
+    s = requests.Session()
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    return s
+
+
+def shared_session():
+    """Session das páginas públicas; não guarda cookies (como o requests.get de antes)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = session()
+            _shared.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        return _shared
+
+
+def _open_connection(url):
+    try:
+        with shared_session().head(url, timeout=PREWARM_TIMEOUT, allow_redirects=False, stream=True):
+            return True
+    except requests.RequestException:
+        return False
+
+
+def prewarm(base_urls, connections=PREWARM_CONNECTIONS):
+    """
+    Abre `connections` conexões simultâneas com cada host (handshake TCP+TLS
+    pago no startup); elas voltam para o pool e atendem as próximas requisições.
+    """
+    base_urls = list(dict.fromkeys(u.rstrip('/') for u in base_urls if u))
+    if not base_urls or connections <= 0:
+        return 0
+    targets = [f"{url}/" for url in base_urls for _ in range(connections)]
+    with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='prewarm') as pool:
+        results = list(pool.map(_open_connection, targets))
+    opened = sum(results)
+    _prewarm_stats['hosts'] += len(base_urls)
+    _prewarm_stats['connections'] += opened
+    _prewarm_stats['failures'] += len(results) - opened
+    return opened
+
+
+def stats():
+    """Pools abertos (conexões criadas, requisições, ociosas) para o /health"""
+    hosts = {}
+    manager = adapter.poolmanager
+    for key in list(manager.pools.keys()):
+        pool = manager.pools.get(key)
+        if pool is None:
+            continue
+        hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+            'connections_opened': pool.num_connections,
+            'requests': pool.num_requests,
+            # A fila do pool começa cheia de None (vagas ainda sem conexão)
+            'idle': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+        }
+    return {
+        'http2': http2_enabled,
+        'pool_maxsize': POOL_MAXSIZE,
+        'prewarm': dict(_prewarm_stats),
+        'hosts': hosts,
+    }
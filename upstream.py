@@ -0,0 +1,443 @@
+"""
+Caminho central das requisições ao upstream (cnvsweb.stream, playcnvs.stream,
+servidores de mp4)
+
+Toda requisição passa por request(): aplica timeouts de conexão/leitura e um
+circuit breaker por host. Com o breaker aberto a chamada falha na hora com
+CircuitOpenError em vez de prender uma thread do Flask esperando o host.
+Antes de sair, a requisição também espera a vez no rate limiter adaptativo
+do host (ratelimit.py) e depois no escalonador de prioridade do host
+(scheduler.py).
+
+request_resilient() acrescenta, para GETs idempotentes, retentativas com
+backoff exponencial com jitter e hedging opcional (uma segunda requisição
+idêntica se a primeira não respondeu até o p95 observado do host). Ambos
+gastam do mesmo orçamento global de retentativas, então numa queda do host
+a carga extra fica limitada a uma fração do tráfego normal.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+
+import mirrors
+import ratelimit
+import scheduler
+
+# Timeouts padrão (segundos) aplicados quando a chamada não informa outro
+CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 15))
+
+# Falhas seguidas que abrem o breaker e tempo até deixar uma requisição de teste passar
+BREAKER_FAILURES = int(os.environ.get('BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', 30))
+
+# Retentativas (conexão/timeout/5xx) e hedging para GETs idempotentes
+RETRIES = int(os.environ.get('UPSTREAM_RETRIES', 2))
+RETRY_BACKOFF = float(os.environ.get('UPSTREAM_RETRY_BACKOFF', 0.2))
+HEDGE_ENABLED = os.environ.get('UPSTREAM_HEDGE', '').lower() in ('1', 'true')
+# Atraso do hedge enquanto não há amostras suficientes para um p95
+HEDGE_DEFAULT_DELAY = float(os.environ.get('UPSTREAM_HEDGE_DELAY', 1.0))
+# Threads só para os hedges (a requisição principal não passa por esse pool)
+HEDGE_WORKERS = int(os.environ.get('UPSTREAM_HEDGE_WORKERS', 8))
+# Cada requisição normal deposita RETRY_BUDGET_RATIO fichas; cada retentativa/hedge gasta 1
+RETRY_BUDGET_RATIO = float(os.environ.get('RETRY_BUDGET_RATIO', 0.1))
+RETRY_BUDGET_CAP = float(os.environ.get('RETRY_BUDGET_CAP', 20))
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """O host não deve ser chamado agora; a requisição nem foi enviada (API responde 503)"""
+
+    reason = 'indisponível'
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = max(1, int(round(retry_after)))
+        super().__init__(f"{host} {self.reason} (tente em {self.retry_after}s)")
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """Host com o circuit breaker aberto"""
+
+    reason = 'com circuit breaker aberto'
+
+
+class RateLimitedError(UpstreamUnavailable):
+    """A fila do rate limiter do host passou da espera máxima"""
+
+    reason = 'com fila de requisições cheia'
+
+
+class CircuitBreaker:
+    """
+    Breaker clássico de três estados:
+      closed    -> requisições normais; falhas seguidas >= failure_threshold abre
+      open      -> falha na hora até passar reset_timeout
+      half_open -> deixa uma requisição de teste; sucesso fecha, falha reabre
+    """
+
+    def __init__(self, host, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SECONDS):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.total_failures = 0
+        self.total_rejected = 0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Levanta CircuitOpenError se a requisição não deve sair"""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == 'open' and elapsed >= self.reset_timeout:
+                self.state = 'half_open'
+                self.trial_in_flight = False
+            if self.state == 'half_open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            self.total_rejected += 1
+            raise CircuitOpenError(self.host, self.reset_timeout - elapsed)
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release(self):
+        """Libera a vaga de teste sem mudar o estado (erro que não é culpa do host)"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trial_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = 0
+            if self.state == 'open':
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'total_failures': self.total_failures,
+                'total_rejected': self.total_rejected,
+                'retry_in': round(retry_in, 1),
+            }
+
+
+class RetryBudget:
+    """Orçamento global de retentativas (fichas depositadas pelo tráfego normal)"""
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, cap=RETRY_BUDGET_CAP):
+        self.ratio = ratio
+        self.cap = cap
+        self.balance = cap
+        self.spent = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.cap, self.balance + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.balance >= 1:
+                self.balance -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+    def snapshot(self):
+        with self._lock:
+            return {'balance': round(self.balance, 2), 'spent': self.spent, 'denied': self.denied}
+
+
+class LatencyWindow:
+    """Últimas latências de um host, para estimar o p95 do hedging"""
+
+    def __init__(self, size=200, min_samples=20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+retry_budget = RetryBudget()
+_latencies = {}
+_hedge_stats = {'fired': 0, 'won': 0}
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+# Event avisado por _send quando a requisição sai de fato (depois do rate limiter e da vaga)
+_sent_signal = contextvars.ContextVar('upstream_sent_signal', default=None)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def breaker_states():
+    """Estado de todos os breakers, para o /health"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.host: b.snapshot() for b in breakers}
+
+
+def latency_for(host):
+    with _breakers_lock:
+        window = _latencies.get(host)
+        if window is None:
+            window = _latencies[host] = LatencyWindow()
+        return window
+
+
+def stats():
+    """Breakers, orçamento de retentativas e hedging, para o /health"""
+    with _breakers_lock:
+        windows = dict(_latencies)
+        hedge_counts = dict(_hedge_stats)
+    p95 = {host: w.p95() for host, w in windows.items()}
+    return {
+        'breakers': breaker_states(),
+        'rate_limits': ratelimit.limiter_states(),
+        'mirrors': mirrors.stats(),
+        'scheduler': scheduler.stats(),
+        'retry_budget': retry_budget.snapshot(),
+        'hedging': dict(hedge_counts, enabled=HEDGE_ENABLED,
+                        p95_ms={h: round(v * 1000, 1) for h, v in p95.items() if v is not None}),
+    }
+
+
+def request(session, method, url, **kwargs):
+    """
+    Envia a requisição pela session com timeout (conexão, leitura) e circuit breaker.
+    Falhas de conexão, timeouts e respostas 5xx contam como falha do host.
+
+    URL de um host com mirrors (mirrors.py) vai para o mirror escolhido; se a
+    requisição nem chegou a sair (breaker aberto, fila cheia, conexão recusada)
+    tenta o próximo mirror. Timeout de leitura e 5xx só contam contra o mirror
+    (a retentativa, em request_resilient, já cai no próximo se ele sair de rotação).
+    """
+    pool = mirrors.pool_for(url)
+    if pool is None or len(pool.mirrors) < 2:
+        return _send(session, method, url, **kwargs)
+
+    pool.start()
+    # session pode ser o próprio módulo requests (páginas sem login)
+    jar = session.cookies if isinstance(session, requests.Session) else None
+    error = None
+    for mirror in pool.candidates():
+        pool.share_cookies(jar, mirror)
+        netloc = mirror.origin[1]
+        try:
+            response = _send(session, method, pool.rewrite(url, mirror), **kwargs)
+        except UpstreamUnavailable as e:
+            error = e
+            continue
+        except requests.ConnectionError as e:
+            pool.record(netloc, ok=False)
+            error = e
+            continue
+        except requests.Timeout:
+            pool.record(netloc, ok=False)
+            raise
+        pool.record(netloc, ok=response.status_code < 500)
+        return response
+    raise error
+
+
+def _send(session, method, url, **kwargs):
+    """Uma tentativa em um host: rate limiter, breaker, timeouts e latência"""
+    host = urlparse(url).netloc
+    breaker = breaker_for(host)
+    breaker.before_request()
+
+    if kwargs.get('timeout') is None:
+        kwargs['timeout'] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    limiter = ratelimit.limiter_for(host)
+    wait = limiter.acquire()
+    if wait:
+        breaker.release()
+        raise RateLimitedError(host, wait)
+
+    # Vaga do host (scheduler.py) só depois do rate limiter: quem dorme na fila
+    # dele não segura vaga, e a latência conta a partir do envio
+    with scheduler.slot(host):
+        sent = _sent_signal.get()
+        if sent is not None:
+            sent.set()
+        started = time.monotonic()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.record_failure()
+            limiter.on_overload()
+            raise
+        except Exception:
+            breaker.release()
+            raise
+
+    latency = time.monotonic() - started
+    latency_for(host).add(latency)
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    if response.status_code == 429 or response.status_code >= 500:
+        limiter.on_overload()
+    elif response.status_code < 400:
+        limiter.on_success(latency)
+    return response
+
+
+def _count_hedge(key):
+    with _breakers_lock:
+        _hedge_stats[key] += 1
+
+
+def _close_quietly(future):
+    """Fecha a resposta do perdedor do hedge (devolve a conexão sem ler o corpo)"""
+    try:
+        future.result().close()
+    except Exception:
+        pass
+
+
+def _start_primary(session, method, url, sent, **kwargs):
+    """
+    Requisição principal do hedge numa thread própria, fora do _hedge_pool:
+    principais não disputam as HEDGE_WORKERS vagas, e quem chamou fica livre
+    para devolver o hedge se ele responder primeiro. A thread leva o contexto
+    de quem pediu (prioridade do scheduler, registro de timings).
+    """
+    future = Future()
+
+    def run():
+        _sent_signal.set(sent)
+        try:
+            future.set_result(request(session, method, url, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            sent.set()
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name='hedge-primary', daemon=True).start()
+    return future
+
+
+def _hedged(session, method, url, **kwargs):
+    """Dispara a requisição e, se não responder até o p95 do host, uma segunda idêntica"""
+    host = urlparse(url).netloc
+    delay = latency_for(host).p95() or HEDGE_DEFAULT_DELAY
+    # stream=True para o perdedor poder ser fechado sem baixar o corpo
+    kwargs['stream'] = True
+
+    sent = threading.Event()
+    primary = _start_primary(session, method, url, sent, **kwargs)
+    pending = {primary}
+    # O prazo do hedge conta a partir do envio: a espera no rate limiter e na
+    # vaga do host não é lentidão do host
+    sent.wait()
+    done, _ = wait(pending, timeout=delay)
+    hedged = False
+    if not done and retry_budget.try_spend():
+        # Threads do pool levam a prioridade (e os timings) de quem pediu
+        pending.add(_hedge_pool.submit(contextvars.copy_context().run, request, session, method, url, **kwargs))
+        hedged = True
+        _count_hedge('fired')
+
+    error, fallback = None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if response.status_code >= 500 and pending:
+                fallback = response
+                continue
+            for loser in pending:
+                loser.add_done_callback(_close_quietly)
+            if fallback is not None and fallback is not response:
+                fallback.close()
+            if hedged and future is not primary:
+                _count_hedge('won')
+            return response
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+def request_resilient(session, method, url, retries=None, hedge=None, **kwargs):
+    """
+    request() com retentativas (conexão, timeout, 5xx) e hedging opcional.
+    Só para requisições idempotentes. Retentativas e hedges gastam do
+    retry_budget; sem saldo, devolve o último erro/resposta na hora.
+    """
+    retries = RETRIES if retries is None else retries
+    hedge = HEDGE_ENABLED if hedge is None else hedge
+    retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        try:
+            if hedge:
+                response = _hedged(session, method, url, **kwargs)
+            else:
+                response = request(session, method, url, **kwargs)
+            if response.status_code < 500:
+                return response
+            failure = None
+        except UpstreamUnavailable:
+            raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response, failure = None, e
+
+        if attempt >= retries or not retry_budget.try_spend():
+            if failure is not None:
+                raise failure
+            return response
+        if response is not None:
+            response.close()
+        # Backoff exponencial com jitter completo
+        time.sleep(random.uniform(0, RETRY_BACKOFF * (2 ** attempt)))
+        attempt += 1